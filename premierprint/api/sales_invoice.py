@@ -91,7 +91,8 @@ def _is_inter_company_pi_exists(sales_invoice_name):
     Purchase Invoice allaqachon yaratilganligini tekshirish.
     
     ERPNext inter-company tranzaksiyalarida Purchase Invoice
-    `inter_company_invoice_reference` fieldida Sales Invoice nomini saqlaydi.
+    `inter_company_invoice_reference` fieldida Sales Invoice nomini saqlaydi
+    (add_inter_company_reference_fields patch ushbu ustunga index qo'shadi).
     
     Args:
         sales_invoice_name: Sales Invoice nomi
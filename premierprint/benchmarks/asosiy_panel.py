@@ -0,0 +1,515 @@
+"""
+Asosiy panel Submit Benchmark
+=============================
+Seeds a synthetic data set (company, warehouses, raw / service / finished
+items with opening stock, customer, supplier, Sales Order, Purchase Orders)
+and runs every operation_type through insert -> submit -> cancel at several
+row counts. Each phase records wall time, query count, query time and rows
+read / written into a JSON report with stable keys, so two runs can be
+compared:
+
+	bench --site <site> benchmark-asosiy-panel --sizes 10,100,1000
+	bench --site <site> benchmark-asosiy-panel --compare before.json
+
+Only runs on sites with `allow_tests` set — it commits real documents.
+Seeded masters are prefixed with BENCH_PREFIX and reused by later runs.
+
+Inter-company delivery (internal customer) is not covered: its second half
+runs in background jobs (services/inter_company.py).
+"""
+
+import json
+import os
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, now, nowdate
+
+BENCH_PREFIX = "PPB"
+DEFAULT_SIZES = (10, 100, 1000)
+OPENING_QTY = 100000
+OPENING_RATE = 1000
+STOCK_ENTRY_CHUNK = 500
+
+# Submit order; cancel runs in reverse (Производство consumes what Расход moved to WIP)
+OPERATIONS = (
+	"Запрос материалов",
+	"Приход на склад",
+	"Перемещения",
+	"Списание материалов",
+	"Отгрузка товаров",
+	"Расход по заказу",
+	"Услуги по заказу",
+	"Производство",
+)
+
+PHASES = ("insert", "submit", "cancel")
+
+
+# ============================================================
+# ENTRY POINT
+# ============================================================
+
+def run(sizes=DEFAULT_SIZES, operations=None, company=None, output=None):
+	"""
+	Seed (if needed) and benchmark Asosiy panel submit paths.
+
+	Args:
+		sizes     : Row counts per panel
+		operations: operation_type values to run (default: all OPERATIONS)
+		company   : Use an existing company instead of the seeded one
+		output    : Report path (default: <site>/benchmarks/asosiy_panel-<timestamp>.json)
+
+	Returns:
+		dict: The report ({"meta": ..., "results": [...]}) with "path" set
+	"""
+	if not frappe.conf.allow_tests:
+		frappe.throw(_("Benchmarks create and cancel real documents. Enable allow_tests in site config first."))
+
+	sizes = sorted({cint(size) for size in sizes if cint(size) > 0})
+	operations = [op for op in OPERATIONS if not operations or op in operations]
+
+	ctx = seed(max(sizes), company=company)
+	frappe.db.commit()
+
+	results = []
+	for size in sizes:
+		ctx.purchase_order = _make_purchase_order(ctx, size)
+		frappe.db.commit()
+
+		submitted = []
+		for operation_type in operations:
+			panel = None
+			for phase in ("insert", "submit"):
+				result, panel = _run_phase(ctx, operation_type, size, phase, panel)
+				results.append(result)
+				if result["error"]:
+					break
+			else:
+				submitted.append((operation_type, panel))
+
+		for operation_type, panel in reversed(submitted):
+			result, _panel = _run_phase(ctx, operation_type, size, "cancel", panel)
+			results.append(result)
+
+	report = {
+		"meta": {
+			"site": frappe.local.site,
+			"started": now(),
+			"company": ctx.company,
+			"sizes": sizes,
+			"operations": operations,
+			"versions": {app: frappe.get_attr(f"{app}.__version__") for app in ("frappe", "erpnext", "premierprint")},
+		},
+		"results": results,
+	}
+
+	path = output or frappe.get_site_path("benchmarks", "asosiy_panel-{0}.json".format(time.strftime("%Y%m%d-%H%M%S")))
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	with open(path, "w", encoding="utf-8") as f:
+		json.dump(report, f, indent=1, ensure_ascii=False, sort_keys=True)
+
+	report["path"] = path
+	return report
+
+
+def compare_reports(baseline, current):
+	"""
+	Pair results of two reports by (operation_type, rows, phase).
+
+	Returns:
+		list[dict]: operation_type, rows, phase, wall_ms / queries before and
+		after, and wall_ratio (current / baseline)
+	"""
+	before = {_result_key(row): row for row in baseline["results"]}
+
+	rows = []
+	for row in current["results"]:
+		old = before.get(_result_key(row))
+		if not old:
+			continue
+		rows.append({
+			"operation_type": row["operation_type"],
+			"rows": row["rows"],
+			"phase": row["phase"],
+			"wall_ms_before": old["wall_ms"],
+			"wall_ms_after": row["wall_ms"],
+			"wall_ratio": round(row["wall_ms"] / old["wall_ms"], 2) if old["wall_ms"] else None,
+			"queries_before": old["queries"],
+			"queries_after": row["queries"],
+		})
+	return rows
+
+
+def _result_key(row):
+	return (row["operation_type"], row["rows"], row["phase"])
+
+
+# ============================================================
+# MEASUREMENT
+# ============================================================
+
+class QueryCounter:
+	"""Counts frappe.db.sql calls, their time and rows while active."""
+
+	WRITE_VERBS = ("insert", "update", "delete", "replace")
+
+	def __init__(self):
+		self.queries = 0
+		self.query_ms = 0.0
+		self.rows_read = 0
+		self.rows_written = 0
+
+	def __enter__(self):
+		self._sql = frappe.db.sql
+		frappe.db.sql = self._counted_sql
+		return self
+
+	def __exit__(self, *exc):
+		frappe.db.sql = self._sql
+
+	def _counted_sql(self, query, *args, **kwargs):
+		start = time.perf_counter()
+		result = self._sql(query, *args, **kwargs)
+		self.query_ms += (time.perf_counter() - start) * 1000
+		self.queries += 1
+
+		verb = str(query).lstrip().split(None, 1)[0].lower() if str(query).strip() else ""
+		if verb in self.WRITE_VERBS:
+			cursor = getattr(frappe.db, "_cursor", None)
+			self.rows_written += max(getattr(cursor, "rowcount", 0) or 0, 0)
+		elif isinstance(result, (list, tuple)):
+			self.rows_read += len(result)
+
+		return result
+
+
+def _run_phase(ctx, operation_type, size, phase, panel):
+	result = {
+		"operation_type": operation_type,
+		"rows": size,
+		"phase": phase,
+		"panel": panel.name if panel else None,
+		"wall_ms": 0.0,
+		"queries": 0,
+		"query_ms": 0.0,
+		"rows_read": 0,
+		"rows_written": 0,
+		"error": None,
+	}
+
+	counter = QueryCounter()
+	start = time.perf_counter()
+	try:
+		with counter:
+			if phase == "insert":
+				panel = frappe.get_doc(BUILDERS[operation_type](ctx, size))
+				panel.insert()
+			elif phase == "submit":
+				panel.submit()
+			else:
+				panel.reload()
+				panel.cancel()
+		result["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+		frappe.db.commit()
+	except Exception as e:
+		result["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+		result["error"] = str(e) or e.__class__.__name__
+		frappe.db.rollback()
+	finally:
+		frappe.clear_messages()
+
+	result.update(
+		panel=panel.name if panel else None,
+		queries=counter.queries,
+		query_ms=round(counter.query_ms, 1),
+		rows_read=counter.rows_read,
+		rows_written=counter.rows_written,
+	)
+	return result, panel
+
+
+# ============================================================
+# PANEL BUILDERS (operation_type -> Asosiy panel dict for N rows)
+# ============================================================
+
+def _panel(ctx, operation_type, items, **fields):
+	return {
+		"doctype": "Asosiy panel",
+		"operation_type": operation_type,
+		"company": ctx.company,
+		"posting_date": nowdate(),
+		"items": items,
+		**fields,
+	}
+
+
+def _raw_rows(ctx, size, rate=OPENING_RATE, **extra):
+	return [
+		{"item_code": item_code, "qty": 1, "uom": "Nos", "rate": rate, "amount": rate, "is_stock_item": 1, **extra}
+		for item_code in ctx.raw_items[:size]
+	]
+
+
+def _build_material_request(ctx, size):
+	return _panel(ctx, "Запрос материалов", _raw_rows(ctx, size), from_warehouse=ctx.stores)
+
+
+def _build_purchase_receipt(ctx, size):
+	items = [
+		{
+			"item_code": line.item_code,
+			"qty": line.qty,
+			"uom": "Nos",
+			"rate": line.rate,
+			"amount": flt(line.qty) * flt(line.rate),
+			"is_stock_item": 1,
+			"purchase_order": ctx.purchase_order,
+			"purchase_order_item": line.name,
+		}
+		for line in frappe.get_all(
+			"Purchase Order Item",
+			filters={"parent": ctx.purchase_order},
+			fields=["name", "item_code", "qty", "rate"],
+			order_by="idx",
+		)
+	]
+	return _panel(
+		ctx, "Приход на склад", items,
+		supplier=ctx.supplier, from_warehouse=ctx.stores, currency=ctx.currency, exchange_rate=1,
+	)
+
+
+def _build_transfer(ctx, size):
+	return _panel(ctx, "Перемещения", _raw_rows(ctx, size), from_warehouse=ctx.stores, to_warehouse=ctx.transit)
+
+
+def _build_issue(ctx, size):
+	return _panel(ctx, "Списание материалов", _raw_rows(ctx, size), from_warehouse=ctx.stores)
+
+
+def _build_delivery(ctx, size):
+	return _panel(
+		ctx, "Отгрузка товаров", _raw_rows(ctx, size, rate=OPENING_RATE * 1.5),
+		customer=ctx.customer, from_warehouse=ctx.stores, price_list=ctx.selling_price_list, currency=ctx.currency,
+	)
+
+
+def _build_rasxod(ctx, size):
+	return _panel(
+		ctx, "Расход по заказу", _raw_rows(ctx, size),
+		from_warehouse=ctx.stores, to_warehouse=ctx.wip,
+		sales_order=ctx.sales_order, sales_order_item=ctx.sales_order_item,
+	)
+
+
+def _build_service(ctx, size):
+	items = [
+		{"item_code": item_code, "qty": 1, "uom": "Nos", "rate": 100, "amount": 100, "is_stock_item": 0}
+		for item_code in ctx.service_items[:size]
+	]
+	return _panel(
+		ctx, "Услуги по заказу", items,
+		supplier=ctx.supplier, finished_good=ctx.finished_good, production_qty=1,
+		currency=ctx.currency, exchange_rate=1,
+		sales_order=ctx.sales_order, sales_order_item=ctx.sales_order_item,
+	)
+
+
+def _build_production(ctx, size):
+	return _panel(
+		ctx, "Производство", _raw_rows(ctx, size, is_wip_item=1),
+		finished_good=ctx.finished_good, production_qty=1,
+		from_warehouse=ctx.wip, to_warehouse=ctx.finished_goods,
+		sales_order=ctx.sales_order, sales_order_item=ctx.sales_order_item,
+	)
+
+
+BUILDERS = {
+	"Запрос материалов": _build_material_request,
+	"Приход на склад": _build_purchase_receipt,
+	"Перемещения": _build_transfer,
+	"Списание материалов": _build_issue,
+	"Отгрузка товаров": _build_delivery,
+	"Расход по заказу": _build_rasxod,
+	"Услуги по заказу": _build_service,
+	"Производство": _build_production,
+}
+
+
+# ============================================================
+# SEED
+# ============================================================
+
+def seed(size, company=None):
+	"""
+	Create (or reuse) the benchmark masters for panels of up to `size` rows.
+
+	Returns:
+		frappe._dict: company, currency, warehouses, item lists, customer,
+		supplier, selling_price_list, sales_order, sales_order_item
+	"""
+	company = company or _ensure_company()
+	abbr, currency = frappe.db.get_value("Company", company, ["abbr", "default_currency"])
+
+	ctx = frappe._dict(company=company, currency=currency)
+	ctx.stores = _ensure_warehouse(f"{BENCH_PREFIX} Stores", company, abbr)
+	ctx.transit = _ensure_warehouse(f"{BENCH_PREFIX} Transit", company, abbr)
+	ctx.wip = _ensure_warehouse(f"{BENCH_PREFIX} WIP", company, abbr)
+	ctx.finished_goods = _ensure_warehouse(f"{BENCH_PREFIX} Finished Goods", company, abbr)
+
+	ctx.raw_items = _ensure_items("RM", size, is_stock_item=1)
+	ctx.service_items = _ensure_items("SRV", size, is_stock_item=0)
+	ctx.finished_good = _ensure_items("FG", 1, is_stock_item=1)[0]
+	_ensure_opening_stock(ctx)
+
+	ctx.customer = _ensure_party("Customer", "customer_name", f"{BENCH_PREFIX} Bench Customer", {
+		"customer_group": _first_leaf("Customer Group"),
+		"territory": _first_leaf("Territory"),
+	})
+	ctx.supplier = _ensure_party("Supplier", "supplier_name", f"{BENCH_PREFIX} Bench Supplier", {
+		"supplier_group": _first_leaf("Supplier Group"),
+	})
+	ctx.selling_price_list = frappe.db.get_value("Price List", {"selling": 1, "enabled": 1}, "name")
+
+	ctx.sales_order, ctx.sales_order_item = _ensure_sales_order(ctx)
+	return ctx
+
+
+def _ensure_company():
+	company = f"{BENCH_PREFIX} Bench Company"
+	if not frappe.db.exists("Company", company):
+		frappe.get_doc({
+			"doctype": "Company",
+			"company_name": company,
+			"abbr": BENCH_PREFIX,
+			"default_currency": "UZS",
+			"country": "Uzbekistan",
+			"create_chart_of_accounts_based_on": "Standard Template",
+			"chart_of_accounts": "Standard",
+		}).insert()
+	return company
+
+
+def _ensure_warehouse(warehouse_name, company, abbr):
+	name = f"{warehouse_name} - {abbr}"
+	if not frappe.db.exists("Warehouse", name):
+		frappe.get_doc({"doctype": "Warehouse", "warehouse_name": warehouse_name, "company": company}).insert()
+	return name
+
+
+def _ensure_items(kind, count, is_stock_item):
+	from premierprint.utils.bulk_create import create_records
+
+	codes = [f"{BENCH_PREFIX}-{kind}-{i:04d}" for i in range(1, count + 1)]
+	existing = set(frappe.get_all("Item", filters={"name": ["in", codes]}, pluck="name"))
+	rows = [
+		{
+			"item_code": code,
+			"item_name": code,
+			"item_group": _first_leaf("Item Group"),
+			"stock_uom": "Nos",
+			"is_stock_item": is_stock_item,
+			"valuation_rate": OPENING_RATE if is_stock_item else 0,
+		}
+		for code in codes
+		if code not in existing
+	]
+	if rows:
+		result = create_records("Item", rows)
+		if result["errors"]:
+			frappe.throw(_("Benchmark item seeding failed: {0}").format(result["errors"][0]["error"]))
+	return codes
+
+
+def _ensure_opening_stock(ctx):
+	stocked = set(
+		frappe.get_all(
+			"Bin",
+			filters={"warehouse": ctx.stores, "item_code": ["in", ctx.raw_items], "actual_qty": [">", 0]},
+			pluck="item_code",
+		)
+	)
+	missing = [code for code in ctx.raw_items if code not in stocked]
+
+	for start in range(0, len(missing), STOCK_ENTRY_CHUNK):
+		se = frappe.new_doc("Stock Entry")
+		se.stock_entry_type = "Material Receipt"
+		se.purpose = "Material Receipt"
+		se.company = ctx.company
+		for item_code in missing[start : start + STOCK_ENTRY_CHUNK]:
+			se.append("items", {
+				"item_code": item_code,
+				"qty": OPENING_QTY,
+				"uom": "Nos",
+				"basic_rate": OPENING_RATE,
+				"t_warehouse": ctx.stores,
+			})
+		se.insert()
+		se.submit()
+
+
+def _ensure_party(doctype, title_field, title, extra):
+	name = frappe.db.get_value(doctype, {title_field: title}, "name")
+	if not name:
+		name = frappe.get_doc({"doctype": doctype, title_field: title, **extra}).insert().name
+	return name
+
+
+def _ensure_sales_order(ctx):
+	soi = frappe.db.sql(
+		"""
+		SELECT soi.parent, soi.name
+		FROM `tabSales Order Item` soi
+		INNER JOIN `tabSales Order` so ON so.name = soi.parent
+		WHERE so.docstatus = 1 AND so.customer = %(customer)s AND so.company = %(company)s
+			AND soi.item_code = %(item_code)s
+		ORDER BY so.creation DESC
+		LIMIT 1
+		""",
+		{"customer": ctx.customer, "company": ctx.company, "item_code": ctx.finished_good},
+	)
+	if soi:
+		return soi[0]
+
+	so = frappe.get_doc({
+		"doctype": "Sales Order",
+		"customer": ctx.customer,
+		"company": ctx.company,
+		"transaction_date": nowdate(),
+		"delivery_date": add_days(nowdate(), 30),
+		"selling_price_list": ctx.selling_price_list,
+		"items": [{
+			"item_code": ctx.finished_good,
+			"qty": 1000000,
+			"rate": 1,
+			"warehouse": ctx.finished_goods,
+			"delivery_date": add_days(nowdate(), 30),
+		}],
+	}).insert()
+	so.submit()
+	return so.name, so.items[0].name
+
+
+def _make_purchase_order(ctx, size):
+	po = frappe.get_doc({
+		"doctype": "Purchase Order",
+		"supplier": ctx.supplier,
+		"company": ctx.company,
+		"transaction_date": nowdate(),
+		"schedule_date": add_days(nowdate(), 7),
+		"set_warehouse": ctx.stores,
+		"items": [
+			{"item_code": item_code, "qty": 1, "rate": OPENING_RATE, "warehouse": ctx.stores, "schedule_date": add_days(nowdate(), 7)}
+			for item_code in ctx.raw_items[:size]
+		],
+	}).insert()
+	po.submit()
+	return po.name
+
+
+def _first_leaf(doctype):
+	return frappe.db.get_value(doctype, {"is_group": 0}, "name", order_by="creation asc") or frappe.db.get_value(
+		doctype, {}, "name", order_by="lft asc"
+	)
@@ -0,0 +1,197 @@
+"""
+Bench commands for Premier Print.
+
+Frappe picks up the `commands` list below, so every command here is available as
+`bench --site <site> <command>`.
+"""
+
+import sys
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("reprocess-transport-lcv")
+@click.option("--dry-run", is_flag=True, default=False, help="Only list PIs missing their Transport LCV")
+@click.option("--chunk-size", default=20, type=int, help="Purchase Invoices per background job")
+@click.option("--company", default=None, help="Limit to one company")
+@click.option("--from-date", default=None, help="PI posting date from (YYYY-MM-DD)")
+@click.option("--to-date", default=None, help="PI posting date to (YYYY-MM-DD)")
+@click.option("--limit", default=None, type=int, help="Maximum number of PIs to pick up")
+@click.option("--now", is_flag=True, default=False, help="Process in this process instead of enqueuing")
+@pass_context
+def reprocess_transport_lcv(context, dry_run, chunk_size, company, from_date, to_date, limit, now):
+	"""Create missing Transport LCVs for submitted Purchase Invoices."""
+	import frappe
+
+	from premierprint.services import lcv_backlog
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		frappe.set_user("Administrator")
+		candidates = lcv_backlog.get_pis_missing_transport_lcv(
+			company=company, from_date=from_date, to_date=to_date, limit=limit
+		)
+		click.echo(f"{len(candidates)} Purchase Invoice(s) without Transport LCV")
+		for row in candidates:
+			click.echo(
+				f"  {row.name}\t{row.company}\t{row.posting_date}\t"
+				f"{row.custom_transport_cost} {row.custom_lcv_currency or ''}"
+			)
+
+		if dry_run or not candidates:
+			return
+
+		if now:
+			batch_id = frappe.generate_hash(length=10)
+			results = lcv_backlog.process_chunk(batch_id, [row.name for row in candidates])
+			for pi_name, result in results.items():
+				click.echo(f"{pi_name}\t{result['status']}\t{result.get('lcv') or result.get('error') or ''}")
+			return
+
+		result = lcv_backlog.reprocess_missing_lcvs(
+			chunk_size=chunk_size, company=company, from_date=from_date, to_date=to_date, limit=limit
+		)
+		frappe.db.commit()
+		click.echo(
+			f"Batch {result['batch_id']}: {result['count']} PI(s) in {result['chunks']} job(s) enqueued. "
+			f"Check progress with premierprint.services.lcv_backlog.get_reprocess_status"
+		)
+	finally:
+		frappe.destroy()
+
+
+@click.command("rebuild-last-sales-price")
+@click.option("--item", "items", multiple=True, help="Only rebuild these item codes (repeatable)")
+@pass_context
+def rebuild_last_sales_price(context, items):
+	"""Recompute the Last Sales Price index from submitted Sales Invoices."""
+	import frappe
+
+	from premierprint.utils.pricing import rebuild_last_sales_prices
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		frappe.set_user("Administrator")
+		count = rebuild_last_sales_prices(item_codes=list(items) or None)
+		frappe.db.commit()
+		click.echo(f"Last Sales Price: {count} row(s)")
+	finally:
+		frappe.destroy()
+
+
+@click.command("backfill-cbu-rates")
+@click.option("--from-date", required=True, help="First date to fill (YYYY-MM-DD)")
+@click.option("--to-date", default=None, help="Last date to fill (default: today)")
+@pass_context
+def backfill_cbu_rates(context, from_date, to_date):
+	"""Load missing CBU exchange rates into Currency Exchange."""
+	import frappe
+
+	from premierprint.services.cbu_rates import backfill_rates
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		frappe.set_user("Administrator")
+		result = backfill_rates(from_date, to_date)
+		click.echo(f"{len(result['dates'])} missing date(s), {result['rows']} Currency Exchange row(s) written")
+		for date, error in result["failed"].items():
+			click.echo(f"  {date}\t{error}")
+	finally:
+		frappe.destroy()
+
+
+@click.command("benchmark-asosiy-panel")
+@click.option("--sizes", default="10,100,1000", help="Comma separated row counts per panel")
+@click.option("--operation", "operations", multiple=True, help="Only this operation_type (repeatable)")
+@click.option("--company", default=None, help="Use an existing company instead of the seeded one")
+@click.option("--output", default=None, help="Report path (default: <site>/benchmarks/asosiy_panel-<timestamp>.json)")
+@click.option("--compare", "compare_with", default=None, help="Earlier report to compare against")
+@pass_context
+def benchmark_asosiy_panel(context, sizes, operations, company, output, compare_with):
+	"""Time Asosiy panel insert/submit/cancel per operation type and row count (allow_tests sites only)."""
+	import json
+
+	import frappe
+
+	from premierprint.benchmarks import asosiy_panel
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		frappe.set_user("Administrator")
+		report = asosiy_panel.run(
+			sizes=[size for size in sizes.split(",") if size.strip()],
+			operations=list(operations) or None,
+			company=company,
+			output=output,
+		)
+
+		for row in report["results"]:
+			click.echo(
+				f"{row['operation_type']}\t{row['rows']}\t{row['phase']}\t{row['wall_ms']} ms\t"
+				f"{row['queries']} q\t{row['rows_written']} w\t{row['error'] or ''}"
+			)
+		click.echo(f"Report: {report['path']}")
+
+		if compare_with:
+			with open(compare_with, encoding="utf-8") as f:
+				baseline = json.load(f)
+			click.echo("")
+			for row in asosiy_panel.compare_reports(baseline, report):
+				click.echo(
+					f"{row['operation_type']}\t{row['rows']}\t{row['phase']}\t"
+					f"{row['wall_ms_before']} -> {row['wall_ms_after']} ms (x{row['wall_ratio']})\t"
+					f"{row['queries_before']} -> {row['queries_after']} q"
+				)
+	finally:
+		frappe.destroy()
+
+
+@click.command("verify-query-plans")
+@click.option("--min-rows", default=1000, type=int, help="Ignore scans estimated below this many rows")
+@click.option("--create-indexes", is_flag=True, default=False, help="Create missing index pack indexes first")
+@pass_context
+def verify_query_plans(context, min_rows, create_indexes):
+	"""EXPLAIN premierprint's hot queries and report full table / index scans."""
+	import frappe
+
+	from premierprint.utils import query_audit
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		if create_indexes:
+			for index in query_audit.ensure_indexes():
+				click.echo(f"Created {index}")
+
+		issues = 0
+		for row in query_audit.verify_query_plans(min_rows=min_rows):
+			flag = "SCAN" if row["issue"] else "ok"
+			issues += bool(row["issue"])
+			click.echo(
+				f"{flag}\t{row['label']}\t{row['table']}\t{row['type']}\t{row['key'] or '-'}\t"
+				f"{row['rows']}\t{row['issue'] or ''}"
+			)
+		click.echo(f"{issues} issue(s)")
+		if issues:
+			sys.exit(1)
+	finally:
+		frappe.destroy()
+
+
+commands = [
+	reprocess_transport_lcv,
+	rebuild_last_sales_price,
+	backfill_cbu_rates,
+	benchmark_asosiy_panel,
+	verify_query_plans,
+]
@@ -70,21 +70,75 @@ fixtures = [
 # Python eventlar
 doc_events = {
     "Sales Order": {
-        "validate": "premierprint.utils.sales_order.set_naming_series"
+        "validate": "premierprint.utils.sales_order.set_naming_series",
+        "on_submit": "premierprint.utils.stock_entry.clear_recent_sales_orders",
+        "on_cancel": "premierprint.utils.stock_entry.clear_recent_sales_orders",
+        "on_update_after_submit": "premierprint.utils.stock_entry.clear_recent_sales_orders"
     },
     "Delivery Note": {
         "on_submit": "premierprint.utils.invoicing.on_delivery_note_submit"
     },
+    "Sales Invoice": {
+        "on_submit": "premierprint.utils.pricing.update_last_sales_price",
+        "on_cancel": "premierprint.utils.pricing.on_sales_invoice_cancel"
+    },
     "Purchase Invoice": {
         "validate": "premierprint.services.lcv_trigger.validate",
         "on_submit": [
             "premierprint.services.lcv_trigger.on_submit",
-            "premierprint.utils.invoicing.on_purchase_invoice_submit"
+            "premierprint.utils.invoicing.on_purchase_invoice_submit",
+            "premierprint.utils.open_po_lines.on_receipt_change"
         ],
-        "on_cancel": "premierprint.services.lcv_trigger.on_cancel"
+        "on_cancel": [
+            "premierprint.services.lcv_trigger.on_cancel",
+            "premierprint.utils.open_po_lines.on_receipt_change"
+        ]
     },
     "Purchase Receipt": {
-        "on_submit": "premierprint.utils.invoicing.on_purchase_receipt_submit"
+        "on_submit": [
+            "premierprint.utils.invoicing.on_purchase_receipt_submit",
+            "premierprint.utils.open_po_lines.on_receipt_change"
+        ],
+        "on_cancel": "premierprint.utils.open_po_lines.on_receipt_change"
+    },
+    # Open Purchase Order Line (utils/open_po_lines.py)
+    "Purchase Order": {
+        "on_submit": "premierprint.utils.open_po_lines.on_purchase_order_change",
+        "on_cancel": "premierprint.utils.open_po_lines.on_purchase_order_change",
+        "on_update_after_submit": "premierprint.utils.open_po_lines.on_purchase_order_change"
+    },
+    # Company accounting context cache (services/company_context.py)
+    "Company": {
+        "on_update": "premierprint.services.company_context.clear_company_context",
+        "on_trash": "premierprint.services.company_context.clear_company_context"
+    },
+    "Account": {
+        "on_update": "premierprint.services.company_context.clear_company_context",
+        "after_rename": "premierprint.services.company_context.clear_company_context",
+        "on_trash": "premierprint.services.company_context.clear_company_context"
+    },
+    "Item": {
+        "on_update": [
+            "premierprint.services.company_context.clear_company_context",
+            "premierprint.utils.stock_entry.clear_bom_explosion_cache"
+        ],
+        "after_rename": [
+            "premierprint.services.company_context.clear_company_context",
+            "premierprint.utils.stock_entry.clear_bom_explosion_cache"
+        ],
+        "on_trash": [
+            "premierprint.services.company_context.clear_company_context",
+            "premierprint.utils.stock_entry.clear_bom_explosion_cache"
+        ]
+    },
+    "BOM": {
+        "on_submit": "premierprint.utils.stock_entry.clear_bom_explosion_cache",
+        "on_cancel": "premierprint.utils.stock_entry.clear_bom_explosion_cache"
+    },
+    "Supplier": {
+        "after_insert": "premierprint.services.company_context.clear_company_context",
+        "after_rename": "premierprint.services.company_context.clear_company_context",
+        "on_trash": "premierprint.services.company_context.clear_company_context"
     }
 }
 
@@ -242,12 +296,22 @@ override_doctype_class = {
 
 # Scheduled Tasks
 # ---------------
-# Temporarily disabled - utils.py was removed
-# scheduler_events = {
-#     "hourly": [
-#         "premierprint.utils.utils.update_cbu_exchange_rate"
-#     ],
-# }
+scheduler_events = {
+    "hourly": [
+        # CBU kurslari (barcha valyutalar), see services/cbu_rates.py
+        "premierprint.services.cbu_rates.update_rates"
+    ],
+    "daily": [
+        # Optional, see Premier Print Settings > Consolidate Inter-Company Invoices
+        "premierprint.utils.invoicing.consolidate_inter_company_invoices"
+    ],
+    "cron": {
+        # Inter-Company Transfer: re-queue pending / failed / unblocked chains
+        "*/10 * * * *": [
+            "premierprint.services.inter_company.advance_pending_transfers"
+        ]
+    }
+}
 
 
 # DocType-specific Client Scripts
@@ -308,12 +372,13 @@ patches = [
 
 # Request Events
 # ----------------
-# before_request = ["premierprint.utils.before_request"]
+# ERPNext monkey patches: applied once per process (utils/monkey_patches.py)
+before_request = ["premierprint.utils.monkey_patches.apply_patches"]
 # after_request = ["premierprint.utils.after_request"]
 
 # Job Events
 # ----------
-# before_job = ["premierprint.utils.before_job"]
+before_job = ["premierprint.utils.monkey_patches.apply_patches"]
 # after_job = ["premierprint.utils.after_job"]
 
 # User Data Protection
@@ -6,14 +6,22 @@ from erpnext.selling.doctype.customer.customer import Customer
 
 
 class CustomCustomer(Customer):
+    def before_naming(self):
+        """
+        Keep a numeric ID set beforehand (utils/bulk_create reserves a block);
+        set_new_name clears self.name before autoname runs.
+        """
+        if self.name and str(self.name).isdigit():
+            self.flags.preset_name = str(self.name)
+
     def autoname(self):
         """
         Override ERPNext's autoname to use simple numeric IDs: 1, 2, 3, 4...
         """
-        # Get next ID from our custom function
-        from premierprint.utils.naming import get_next_customer_id
+        # Atomic counter (tabSeries) — see utils/naming.allocate_ids
+        from premierprint.utils.naming import allocate_customer_id
 
-        next_id = get_next_customer_id()
+        next_id = self.flags.preset_name or allocate_customer_id()
         self.name = next_id
 
         # Set customer_name if not provided
@@ -12,9 +12,8 @@ class CustomItem(Item):
         """
         # If item_code is empty or has temporary value, set it
         if not self.item_code or self.item_code.startswith("new-item") or self.item_code.startswith("ITEM-"):
-            from premierprint.utils.naming import get_next_item_id
-            next_id = get_next_item_id()
-            self.item_code = next_id
+            from premierprint.utils.naming import allocate_item_id
+            self.item_code = allocate_item_id()
 
         super(CustomItem, self).validate()
 
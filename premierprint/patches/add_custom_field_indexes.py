@@ -0,0 +1,25 @@
+"""
+Composite indexes on the custom / reference fields premierprint filters on.
+
+The index list lives in utils/query_audit.INDEX_PACK (with the query each one
+serves); `bench verify-query-plans` checks the plans against it.
+
+  Stock Entry (custom_sales_order, purpose, docstatus)
+      -> WIP material transfers of a Sales Order (production costing)
+  Stock Entry (custom_sales_order_item, docstatus)
+      -> per-line lookups, when the field is installed
+  Purchase Invoice Item (custom_sales_order_item, custom_sales_order, parent)
+      -> service costs of a Sales Order line
+  Landed Cost Voucher (custom_purchase_invoice, docstatus)
+      -> Transport LCV of a Purchase Invoice (lcv_trigger / transport_lcv / backlog)
+  Asosiy panel (sales_order, sales_order_item, operation_type, docstatus)
+      -> service panels of a Sales Order line
+  Payment Entry (reference_no, docstatus), Journal Entry (cheque_no, docstatus)
+      -> Kassa cancellation of its linked entries
+"""
+
+from premierprint.utils.query_audit import ensure_indexes
+
+
+def execute():
+    ensure_indexes()
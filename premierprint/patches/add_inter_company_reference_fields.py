@@ -0,0 +1,80 @@
+"""
+Indexed inter-company reference fields + backfill.
+
+Duplicate detection used to scan Sales Invoice.remarks with LIKE and the
+unindexed Purchase Invoice.bill_no. This patch creates the indexed link fields,
+indexes ERPNext's inter_company_invoice_reference (SI <-> PI pairing) and fills
+the new fields for existing documents.
+"""
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from premierprint.setup.custom_fields import INTER_COMPANY_REFERENCE_CUSTOM_FIELDS
+
+
+def _backfill_sales_invoice_dn_ref():
+    # Internal SI rows created from a DN carry delivery_note on the item
+    frappe.db.sql(
+        """
+        UPDATE `tabSales Invoice` si
+        INNER JOIN (
+            SELECT parent, MIN(delivery_note) AS delivery_note
+            FROM `tabSales Invoice Item`
+            WHERE IFNULL(delivery_note, '') != ''
+            GROUP BY parent
+        ) sii ON sii.parent = si.name
+        SET si.custom_delivery_note_ref = sii.delivery_note
+        WHERE si.is_internal_customer = 1
+          AND IFNULL(si.custom_delivery_note_ref, '') = ''
+        """
+    )
+
+
+def _backfill_purchase_invoice_pr_ref():
+    # bill_no held the Purchase Receipt name for auto-created PIs
+    frappe.db.sql(
+        """
+        UPDATE `tabPurchase Invoice` pi
+        INNER JOIN `tabPurchase Receipt` pr ON pr.name = pi.bill_no
+        SET pi.custom_purchase_receipt_ref = pr.name
+        WHERE pi.is_internal_supplier = 1
+          AND IFNULL(pi.custom_purchase_receipt_ref, '') = ''
+        """
+    )
+
+
+def _backfill_purchase_receipt_dn_ref():
+    if frappe.db.has_column("Purchase Receipt", "inter_company_reference"):
+        frappe.db.sql(
+            """
+            UPDATE `tabPurchase Receipt`
+            SET custom_delivery_note_ref = inter_company_reference
+            WHERE IFNULL(inter_company_reference, '') != ''
+              AND IFNULL(custom_delivery_note_ref, '') = ''
+            """
+        )
+
+    if frappe.db.table_exists("Inter-Company Transfer"):
+        frappe.db.sql(
+            """
+            UPDATE `tabPurchase Receipt` pr
+            INNER JOIN `tabInter-Company Transfer` t ON t.purchase_receipt = pr.name
+            SET pr.custom_delivery_note_ref = t.delivery_note
+            WHERE IFNULL(pr.custom_delivery_note_ref, '') = ''
+            """
+        )
+
+
+def execute():
+    create_custom_fields(INTER_COMPANY_REFERENCE_CUSTOM_FIELDS, update=True)
+
+    for doctype in ("Sales Invoice", "Purchase Invoice"):
+        frappe.db.add_index(doctype, ["inter_company_invoice_reference"])
+
+    _backfill_sales_invoice_dn_ref()
+    _backfill_purchase_invoice_pr_ref()
+    _backfill_purchase_receipt_dn_ref()
+
+    for doctype in ("Sales Invoice", "Purchase Invoice", "Purchase Receipt"):
+        frappe.clear_cache(doctype=doctype)
@@ -0,0 +1,23 @@
+"""
+Composite indexes for utils/pricing.py price history queries.
+
+  Sales Invoice Item (item_code, docstatus, parent)
+      -> item filter + join key without touching the row
+  Sales Invoice (customer, docstatus, posting_date)
+      -> per-customer history / keyset pages in posting_date order
+"""
+
+import frappe
+
+
+def execute():
+    frappe.db.add_index(
+        "Sales Invoice Item",
+        ["item_code", "docstatus", "parent"],
+        index_name="item_code_docstatus_parent_index",
+    )
+    frappe.db.add_index(
+        "Sales Invoice",
+        ["customer", "docstatus", "posting_date"],
+        index_name="customer_docstatus_posting_date_index",
+    )
@@ -0,0 +1,19 @@
+"""
+FULLTEXT index for the Sales Order link search (utils/stock_entry.get_sales_order_query).
+
+  Sales Order (name, customer_name, title)
+      -> MATCH ... AGAINST instead of leading-wildcard LIKE over every submitted order
+"""
+
+import frappe
+
+INDEX_NAME = "so_search_fulltext"
+
+
+def execute():
+    if frappe.db.has_index("tabSales Order", INDEX_NAME):
+        return
+
+    frappe.db.sql_ddl(
+        f"ALTER TABLE `tabSales Order` ADD FULLTEXT INDEX `{INDEX_NAME}` (name, customer_name, title)"
+    )
@@ -0,0 +1,14 @@
+"""
+Stock Entry.custom_reversal_of (indexed): set on entries posted by Asosiy
+panel's Reverse mode, so the WIP ledger can leave reversed production out.
+"""
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from premierprint.setup.custom_fields import WIP_LEDGER_CUSTOM_FIELDS
+
+
+def execute():
+    create_custom_fields(WIP_LEDGER_CUSTOM_FIELDS, update=True)
+    frappe.clear_cache(doctype="Stock Entry")
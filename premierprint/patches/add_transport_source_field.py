@@ -0,0 +1,29 @@
+"""
+Purchase Invoice.custom_transport_source_pi (indexed): the source PI a Carrier
+PI was created for, so a re-run of the transport pipeline reuses it.
+
+Existing Carrier PIs are matched on the remark the pipeline writes
+("Transport charge for Purchase Invoice: <name>").
+"""
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from premierprint.setup.custom_fields import TRANSPORT_LCV_CUSTOM_FIELDS
+
+
+def execute():
+    create_custom_fields(TRANSPORT_LCV_CUSTOM_FIELDS, update=True)
+
+    frappe.db.sql(
+        """
+        UPDATE `tabPurchase Invoice` carrier
+        INNER JOIN `tabPurchase Invoice` source
+            ON source.name = TRIM(SUBSTRING_INDEX(carrier.remarks, 'Transport charge for Purchase Invoice: ', -1))
+        SET carrier.custom_transport_source_pi = source.name
+        WHERE carrier.remarks LIKE 'Transport charge for Purchase Invoice: %%'
+          AND IFNULL(carrier.custom_transport_source_pi, '') = ''
+        """
+    )
+
+    frappe.clear_cache(doctype="Purchase Invoice")
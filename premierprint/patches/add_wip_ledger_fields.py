@@ -0,0 +1,122 @@
+"""
+Stock Entry.custom_sales_order_item (indexed) for the per-line WIP ledger.
+
+Production Repack entries created before this only set the standard
+sales_order field; copy it to custom_sales_order so the ledger sees what they
+consumed.
+
+Legacy 'Расход по заказу' transfers and production Repacks are then tagged with
+their Sales Order Item: from the Asosiy panel that created them (linked
+document, or "Asosiy Panel: <name>" in the remarks) or, for Repacks, from
+"Sales Order Item: <name>" in the remarks. An order is only tagged when every
+one of its legacy entries resolves to a line of it. Otherwise all of them stay
+order-level: a tagged Repack next to an untagged transfer would let the other
+lines see the transfer without its consumption.
+"""
+
+import re
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from premierprint.setup.custom_fields import WIP_LEDGER_CUSTOM_FIELDS
+
+PANEL_REMARK = re.compile(r"Asosiy Panel: ([^|]+)")
+LINE_REMARK = re.compile(r"Sales Order Item: ([^|]+)")
+
+
+def execute():
+    create_custom_fields(WIP_LEDGER_CUSTOM_FIELDS, update=True)
+
+    frappe.db.sql(
+        """
+        UPDATE `tabStock Entry`
+        SET custom_sales_order = sales_order
+        WHERE purpose = 'Repack'
+          AND IFNULL(sales_order, '') != ''
+          AND IFNULL(custom_sales_order, '') = ''
+          AND remarks LIKE '%%Asosiy Panel:%%'
+        """
+    )
+
+    entries = frappe.db.sql(
+        """
+        SELECT se.name, se.purpose, se.custom_sales_order AS sales_order, se.remarks,
+            (
+                SELECT p.name FROM `tabAsosiy panel` p
+                WHERE p.linked_document_type = 'Stock Entry' AND p.linked_document_name = se.name
+                LIMIT 1
+            ) AS panel
+        FROM `tabStock Entry` se
+        WHERE se.docstatus = 1
+          AND se.purpose IN ('Material Transfer', 'Repack')
+          AND IFNULL(se.custom_sales_order, '') != ''
+          AND IFNULL(se.custom_sales_order_item, '') = ''
+        """,
+        as_dict=True,
+    )
+    if not entries:
+        return
+
+    orders = tuple({entry.sales_order for entry in entries})
+    order_lines = {
+        (row.parent, row.name)
+        for row in frappe.get_all(
+            "Sales Order Item", filters={"parent": ["in", orders]}, fields=["name", "parent"]
+        )
+    }
+    panel_lines = {
+        row.name: (row.sales_order, row.sales_order_item)
+        for row in frappe.get_all(
+            "Asosiy panel",
+            filters={"sales_order": ["in", orders]},
+            fields=["name", "sales_order", "sales_order_item"],
+        )
+    }
+
+    for entry in entries:
+        entry.line = resolve_line(entry, panel_lines, order_lines)
+
+    for name, line in plan_line_tags(entries).items():
+        frappe.db.set_value("Stock Entry", name, "custom_sales_order_item", line, update_modified=False)
+
+    frappe.clear_cache(doctype="Stock Entry")
+
+
+def resolve_line(entry, panel_lines, order_lines):
+    """Sales Order Item of a legacy entry, or None when it cannot be told."""
+    candidates = []
+    panel = entry.panel
+    if not panel:
+        match = PANEL_REMARK.search(entry.remarks or "")
+        panel = match.group(1).strip() if match else None
+    if panel in panel_lines:
+        sales_order, line = panel_lines[panel]
+        if sales_order == entry.sales_order:
+            candidates.append(line)
+
+    if entry.purpose == "Repack":
+        match = LINE_REMARK.search(entry.remarks or "")
+        if match:
+            candidates.append(match.group(1).strip())
+
+    for line in candidates:
+        if (entry.sales_order, line) in order_lines:
+            return line
+    return None
+
+
+def plan_line_tags(entries):
+    """
+    {stock_entry: sales_order_item} for orders whose legacy entries all resolve
+    to a line (entry.line); orders with any unresolved entry are left out.
+    """
+    by_order = {}
+    for entry in entries:
+        by_order.setdefault(entry.sales_order, []).append(entry)
+
+    tags = {}
+    for order_entries in by_order.values():
+        if all(entry.line for entry in order_entries):
+            tags.update({entry.name: entry.line for entry in order_entries})
+    return tags
@@ -0,0 +1,10 @@
+"""
+Fill `Last Sales Price` from the Sales Invoices submitted before the index
+existed; afterwards it is kept current on Sales Invoice submit / cancel.
+"""
+
+from premierprint.utils.pricing import rebuild_last_sales_prices
+
+
+def execute():
+    rebuild_last_sales_prices()
@@ -0,0 +1,19 @@
+"""
+Fill `Open Purchase Order Line` for existing Purchase Orders.
+
+  Open Purchase Order Line (supplier, company, transaction_date)
+      -> Asosiy panel PO selection: supplier + company filter in date order
+"""
+
+import frappe
+
+from premierprint.utils.open_po_lines import rebuild_open_po_lines
+
+
+def execute():
+    frappe.db.add_index(
+        "Open Purchase Order Line",
+        ["supplier", "company", "transaction_date"],
+        index_name="supplier_company_transaction_date_index",
+    )
+    rebuild_open_po_lines()
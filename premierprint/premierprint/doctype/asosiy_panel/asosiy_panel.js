@@ -43,6 +43,8 @@ frappe.ui.form.on("Asosiy panel", {
         // Render custom buttons
         frm.trigger("render_custom_buttons");
 
+        frm.trigger("show_backdated_impact");
+
         // Stock Ledger button - only shown for submitted documents
         if (frm.doc.docstatus === 1) {
             frm.add_custom_button(__('Stock Ledger'), function () {
@@ -57,6 +59,142 @@ frappe.ui.form.on("Asosiy panel", {
         }
     },
 
+    posting_date(frm) {
+        frm.trigger("show_backdated_impact");
+    },
+
+    show_backdated_impact(frm) {
+        // Repost cost of a backdated submit (utils/repost_impact.py)
+        if (frm.doc.docstatus !== 0 || !frm.doc.posting_date || !(frm.doc.items || []).length
+            || frm.doc.posting_date >= frappe.datetime.get_today()) {
+            return;
+        }
+
+        frappe.call({
+            method: "premierprint.premierprint.doctype.asosiy_panel.asosiy_panel.estimate_backdated_impact",
+            args: { doc: frm.doc },
+            callback(r) {
+                const impact = r.message;
+                if (!impact || !impact.rows) return;
+
+                frm._backdated_impact = impact;
+                frm.dashboard.set_headline_alert(
+                    __("Backdated: submit reposts {0} later stock ledger rows ({1} items, ~{2} s){3}",
+                        [impact.rows, impact.items, impact.estimated_seconds,
+                         impact.run_in_background ? __(", runs in background") : ""]),
+                    impact.requires_confirmation ? "orange" : "blue"
+                );
+            },
+        });
+    },
+
+    before_submit(frm) {
+        if (frm.doc.confirm_backdated_repost) return;
+
+        return new Promise((resolve) => {
+            frappe.call({
+                method: "premierprint.premierprint.doctype.asosiy_panel.asosiy_panel.estimate_backdated_impact",
+                args: { doc: frm.doc },
+                callback(r) {
+                    const impact = r.message;
+                    if (!impact || !impact.requires_confirmation) {
+                        resolve();
+                        return;
+                    }
+
+                    let confirmed = false;
+                    const dialog = frappe.confirm(
+                        __("Posting date is in the past. Submitting reposts {0} later stock ledger rows ({1} items, ~{2} s). Continue?",
+                            [impact.rows, impact.items, impact.estimated_seconds]),
+                        () => {
+                            confirmed = true;
+                            frm.doc.confirm_backdated_repost = 1;
+                            resolve();
+                        },
+                        () => {
+                            frappe.validated = false;
+                            resolve();
+                        }
+                    );
+                    dialog.onhide = () => {
+                        if (!confirmed) {
+                            frappe.validated = false;
+                            resolve();
+                        }
+                    };
+                },
+            });
+        });
+    },
+
+    before_cancel(frm) {
+        // Show the repost cost of cancelling and let the user choose Cancel / Reverse
+        return new Promise((resolve) => {
+            frappe.call({
+                method: "premierprint.premierprint.doctype.asosiy_panel.asosiy_panel.get_cancellation_impact",
+                args: { name: frm.doc.name },
+                callback(r) {
+                    const impact = r.message || {};
+                    if (!impact.rows) {
+                        resolve();
+                        return;
+                    }
+
+                    const details = (impact.details || [])
+                        .map((d) => `<tr><td>${frappe.utils.escape_html(d.item_code)}</td>
+                            <td>${frappe.utils.escape_html(d.warehouse)}</td>
+                            <td class="text-right">${d.sle_count}</td></tr>`)
+                        .join("");
+
+                    let chosen = false;
+                    const dialog = new frappe.ui.Dialog({
+                        title: __("Bekor qilish ta'siri"),
+                        fields: [{
+                            fieldtype: "HTML",
+                            options: `<p>${__("Cancel reposts {0} later stock ledger rows ({1} items, ~{2} s).",
+                                [impact.rows, impact.items, impact.estimated_seconds])}</p>
+                                <p>${__("Reverse posts mirror documents at today's date and reposts nothing.")}</p>
+                                <table class="table table-bordered table-condensed">
+                                    <thead><tr><th>${__("Item")}</th><th>${__("Warehouse")}</th>
+                                    <th class="text-right">${__("Later SLEs")}</th></tr></thead>
+                                    <tbody>${details}</tbody>
+                                </table>`,
+                        }],
+                        primary_action_label: __("Reverse"),
+                        primary_action() {
+                            choose("Reverse");
+                        },
+                        secondary_action_label: __("Cancel (repost)"),
+                        secondary_action() {
+                            choose("Cancel");
+                        },
+                    });
+
+                    function choose(mode) {
+                        chosen = true;
+                        dialog.hide();
+                        frappe.call({
+                            method: "premierprint.premierprint.doctype.asosiy_panel.asosiy_panel.set_cancellation_mode",
+                            args: { name: frm.doc.name, mode: mode },
+                            callback() {
+                                frm.doc.cancellation_mode = mode;
+                                resolve();
+                            },
+                        });
+                    }
+
+                    dialog.onhide = () => {
+                        if (!chosen) {
+                            frappe.validated = false;
+                            resolve();
+                        }
+                    };
+                    dialog.show();
+                },
+            });
+        });
+    },
+
     render_custom_buttons(frm) {
         // Remove existing Purchase Order button to prevent duplicates
         if (frm.custom_buttons && frm.custom_buttons["Get Items From"]) {
@@ -316,6 +454,12 @@ frappe.ui.form.on("Asosiy panel", {
         frm.set_value('to_warehouse', '');
         frm.trigger('set_warehouse_filters');
     },
+    production_qty(frm) {
+        // Batch share depends on the produced quantity (partial production)
+        if (frm.doc.operation_type === 'Производство' && frm.doc.sales_order_item && frm.doc.from_warehouse) {
+            frm.trigger('fetch_production_data');
+        }
+    },
     from_warehouse(frm) {
         // From Warehouse o'zgarganda production mode uchun fetch qilish
         if (frm.doc.operation_type === 'Производство' && frm.doc.from_warehouse) {
@@ -812,7 +956,9 @@ frappe.ui.form.on("Asosiy panel", {
             args: {
                 sales_order_item: frm.doc.sales_order_item,
                 wip_warehouse: frm.doc.from_warehouse,
-                company: frm.doc.company
+                company: frm.doc.company,
+                finished_good: frm.doc.finished_good,
+                production_qty: frm.doc.production_qty
             },
             freeze: true,
             freeze_message: __('Fetching materials and service costs...'),
@@ -887,6 +1033,12 @@ frappe.ui.form.on("Asosiy panel", {
                     if (purchase_invoices.length > 0) {
                         msg_parts.push(__('Purchase Invoices: {0}', [purchase_invoices.join(', ')]));
                     }
+                    let share = r.message.production_share;
+                    if (share && share.fraction < 1) {
+                        msg_parts.push(__('Batch: {0} of {1} still to produce ({2}% of WIP and services)', [
+                            frm.doc.production_qty, share.remaining_qty, Math.round(share.fraction * 100)
+                        ]));
+                    }
 
                     frappe.show_alert({
                         message: msg_parts.join('<br>'),
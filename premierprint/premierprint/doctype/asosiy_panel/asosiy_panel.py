@@ -3,6 +3,17 @@ from frappe.model.document import Document
 from frappe import _
 from frappe.utils import nowdate, flt
 
+from premierprint.services.company_context import get_company_context
+from premierprint.services.inter_company import cancel_transfers_for_panel
+from premierprint.services.wip_ledger import (
+    get_production_share,
+    get_service_balance,
+    get_wip_balance,
+    lock_sales_order_item,
+)
+from premierprint.utils.instrumentation import phase, profile, span
+from premierprint.utils.timeline import add_comment
+
 # Operation Type Mapping (Russian → DocType Purpose)
 TYPE_MAP = {
     "Запрос материалов": "Material Request",
@@ -17,11 +28,92 @@ TYPE_MAP = {
 
 PURCHASE_RECEIPT_OPERATION = "Приход на склад"
 
+# Linked documents that cancellation_mode "Reverse" mirrors at today's date
+# instead of cancelling (cancelling a backdated one reposts every later SLE)
+REVERSIBLE_DOCTYPES = ("Stock Entry", "Delivery Note", "Purchase Receipt")
+REVERSED_PURPOSE = {
+    "Material Issue": "Material Receipt",
+    "Material Receipt": "Material Issue",
+    "Material Transfer": "Material Transfer",
+    "Repack": "Repack",
+    "Manufacture": "Repack",
+}
+
+# Operations whose generated documents post Stock Ledger Entries
+STOCK_MOVING_OPERATIONS = (
+    "Приход на склад",
+    "Списание материалов",
+    "Перемещения",
+    "Отгрузка товаров",
+    "Расход по заказу",
+    "Производство",
+)
+
 
 def normalize_operation_type(value):
     return (value or "").strip().replace("A", "А").replace("a", "а")
 
 class Asosiypanel(Document):
+    @frappe.whitelist()
+    def submit(self):
+        # Large backdated reposts: submit in a background job (Premier Print Settings)
+        impact = self._get_backdated_impact()
+        if impact and impact["run_in_background"]:
+            self._check_backdated_repost()
+            self.save()
+            frappe.msgprint(
+                _("Orqa sanali hujjat {0} ta keyingi qatorni qayta hisoblaydi (~{1} s). "
+                  "Submit fon rejimida bajariladi.").format(impact["rows"], impact["estimated_seconds"]),
+                indicator='blue',
+                alert=True
+            )
+            # Private action: execute_action would otherwise call submit() again and re-queue
+            return self.queue_action("_submit_now", timeout=3600)
+
+        return self._submit_now()
+
+    def _submit_now(self):
+        """Submit without background routing (also the queued job's action)."""
+        # Per-phase timings when Submit Profiling is on (utils/instrumentation.py)
+        with profile("Asosiy panel: {0}".format(self.operation_type), doc=self):
+            return super().submit()
+
+    @phase("before_submit")
+    def before_submit(self):
+        self._check_backdated_repost()
+
+    def _get_stock_keys(self):
+        """(item_code, warehouse) pairs the generated documents post SLEs for."""
+        warehouses = [w for w in (self.from_warehouse, self.to_warehouse) if w]
+        keys = {(row.item_code, w) for row in self.items for w in warehouses}
+        if normalize_operation_type(self.operation_type) == 'Производство' and self.finished_good:
+            keys.add((self.finished_good, self.to_warehouse))
+        return keys
+
+    def _get_backdated_impact(self):
+        """Repost estimate of a backdated stock-moving submit (None when not backdated)."""
+        if "backdated_impact" not in self.flags:
+            from premierprint.utils.repost_impact import estimate_posting_impact
+
+            self.flags.backdated_impact = None
+            if normalize_operation_type(self.operation_type) in STOCK_MOVING_OPERATIONS:
+                self.flags.backdated_impact = estimate_posting_impact(self._get_stock_keys(), self.posting_date)
+        return self.flags.backdated_impact
+
+    def _check_backdated_repost(self):
+        impact = self._get_backdated_impact()
+        if impact and impact["requires_confirmation"] and not self.confirm_backdated_repost:
+            frappe.throw(
+                _("Posting Date {0} o'tgan sana: submit {1} ta keyingi ombor qatorini "
+                  "({2} ta mahsulot, ~{3} s) qayta hisoblashga olib keladi. "
+                  "Davom etish uchun tasdiqlang.").format(
+                    frappe.format_value(self.posting_date, {'fieldtype': 'Date'}),
+                    impact["rows"], impact["items"], impact["estimated_seconds"]
+                ),
+                title=_("Orqa sana bilan o'tkazish")
+            )
+
+    @phase("validate")
     def validate(self):
         """Validate document before saving."""
         operation_type = normalize_operation_type(self.operation_type)
@@ -36,6 +128,8 @@ class Asosiypanel(Document):
                 frappe.throw(_("From Warehouse (WIP) is required for Production"))
             if not self.to_warehouse:
                 frappe.throw(_("To Warehouse (Finished Goods Store) is required for Production"))
+            if self.docstatus == 1 and self.sales_order_item:
+                self._reserve_wip_materials()
         
         # Validations for usluga_po_zakasu (service logging)
         if operation_type == 'Услуги по заказу':
@@ -87,6 +181,73 @@ class Asosiypanel(Document):
         if previous_supplier:
             self.supplier = previous_supplier
 
+    def _reserve_wip_materials(self):
+        """Lock the Sales Order Item and cap the panel at this batch's share.
+
+        A concurrent production panel for the same line waits on the lock, then
+        sees the balance left by the first one: the balance queries run as
+        locking reads, past the transaction's older snapshot
+        (services/wip_ledger.py). Each batch takes production_qty / qty still to produce of the remaining WIP
+        and service balance; the last batch takes all of it. Rows above the
+        share are reduced, rows with nothing left are dropped.
+        """
+        lock_sales_order_item(self.sales_order_item)
+        share = get_production_share(
+            self.sales_order, self.sales_order_item, self.finished_good, self.production_qty, lock=True
+        )
+        balance = {
+            (row.item_code, row.uom): row
+            for row in get_wip_balance(self.sales_order, self.sales_order_item, self.from_warehouse, lock=True)
+        }
+
+        adjusted = []
+        for item in [row for row in self.items if row.is_wip_item]:
+            row = balance.get((item.item_code, item.uom))
+            allowed = flt(flt(row.qty) * share.fraction, item.precision("qty")) if row else 0
+            if flt(item.qty) <= allowed:
+                continue
+            adjusted.append(_("{0}: {1} → {2}").format(item.item_code, flt(item.qty), allowed))
+            if allowed <= 0:
+                self.remove(item)
+            else:
+                item.qty = allowed
+                item.amount = flt(allowed * flt(item.rate), item.precision("amount"))
+
+        service_items = [row for row in self.items if not row.is_wip_item and not row.is_stock_item]
+        service_total = sum(flt(row.amount) for row in service_items)
+        if service_total:
+            allowed_service = get_service_balance(self.sales_order, self.sales_order_item, lock=True).remaining * share.fraction
+            if service_total > allowed_service + 0.01:
+                ratio = allowed_service / service_total
+                for row in service_items:
+                    row.amount = flt(flt(row.amount) * ratio, row.precision("amount"))
+                    row.rate = flt(row.amount / flt(row.qty), row.precision("rate")) if flt(row.qty) else row.amount
+                adjusted.append(_("Xizmatlar: {0} → {1}").format(
+                    flt(service_total, 2), flt(allowed_service, 2)
+                ))
+
+        if not adjusted:
+            return
+
+        if not any(row.is_wip_item for row in self.items) and not any(
+            not row.is_wip_item and not row.is_stock_item and flt(row.amount) for row in self.items
+        ):
+            frappe.throw(
+                _("Sales Order Item {0} uchun WIP materiallari va xizmatlar boshqa ishlab chiqarish "
+                  "panellari tomonidan allaqachon sarflangan.").format(self.sales_order_item),
+                title=_("WIP materiallari qolmagan")
+            )
+
+        self.total_quantity = sum(flt(row.qty) for row in self.items)
+        self.total_amount = sum(flt(row.amount) for row in self.items)
+        frappe.msgprint(
+            _("Partiya ulushi ({0} / {1}) va WIP qoldig'i bo'yicha kamaytirildi:<br>{2}").format(
+                flt(self.production_qty), flt(share.remaining_qty), '<br>'.join(adjusted)
+            ),
+            indicator='orange',
+            alert=True
+        )
+
     def _validate_material_request(self):
         if not self.from_warehouse:
             frappe.throw(_("From Warehouse (Requesting Warehouse) is required for Material Request"))
@@ -145,7 +306,7 @@ class Asosiypanel(Document):
             return
         
         # Get company's base currency
-        company_currency = frappe.db.get_value("Company", self.company, "default_currency")
+        company_currency = get_company_context(self.company).default_currency
         
         # If foreign currency, ensure exchange rate is valid
         if currency != company_currency:
@@ -194,6 +355,7 @@ class Asosiypanel(Document):
                     exc=frappe.ValidationError
                 )
 
+    @phase("on_submit")
     def on_submit(self):
         """Handle document submission based on operation type."""
         if self.operation_type == 'Отгрузка товаров':
@@ -248,6 +410,11 @@ class Asosiypanel(Document):
         4. Report results to the user
         """
         cancelled_docs = []
+        # (doctype, original, reversal) when cancellation_mode is "Reverse"
+        self._reversed_docs = []
+
+        # Stop background Inter-Company Transfer hops before unwinding the chain
+        cancel_transfers_for_panel(self.name)
 
         # =====================================================================
         # PHASE 1: Cancel explicitly tracked linked documents
@@ -285,6 +452,11 @@ class Asosiypanel(Document):
         if self.linked_document_type_2 and self.linked_document_name_2:
             already_processed.add((self.linked_document_type_2, self.linked_document_name_2))
 
+        # Reversal entries reference this panel in their remarks too
+        for dt, original, reversal in self._reversed_docs:
+            already_processed.add((dt, original))
+            already_processed.add((dt, reversal))
+
         # DocTypes to scan for orphaned references
         SCAN_DOCTYPES = [
             "Stock Entry",
@@ -307,6 +479,16 @@ class Asosiypanel(Document):
         # =====================================================================
         # PHASE 3: User feedback and audit trail
         # =====================================================================
+        if self._reversed_docs:
+            frappe.msgprint(
+                _("↩️ Teskari hujjatlar (bugungi sana bilan):<br>{0}").format('<br>'.join(
+                    f"<a href='/app/{dt.lower().replace(' ', '-')}/{reversal}'>{dt}: {reversal}</a> ← {original}"
+                    for dt, original, reversal in self._reversed_docs
+                )),
+                indicator='orange',
+                alert=True
+            )
+
         if cancelled_docs:
             doc_links = []
             for dt, dn in cancelled_docs:
@@ -320,16 +502,20 @@ class Asosiypanel(Document):
                 indicator='orange',
                 alert=True
             )
-        else:
+        elif not self._reversed_docs:
             frappe.msgprint(
                 _("ℹ️ Bog'langan hujjatlar topilmadi. Faqat Asosiy panel bekor qilindi."),
                 indicator='blue',
                 alert=True
             )
 
-        self.add_comment('Info', _('Asosiy panel bekor qilindi. Bog\'langan hujjatlar: {0}').format(
+        add_comment(self, 'Info', _('Asosiy panel bekor qilindi. Bog\'langan hujjatlar: {0}').format(
             ', '.join([f'{dt} {dn}' for dt, dn in cancelled_docs]) or _('Yo\'q')
         ))
+        if self._reversed_docs:
+            add_comment(self, 'Info', _('Teskari hujjatlar: {0}').format(
+                ', '.join(f'{dt} {reversal} ← {original}' for dt, original, reversal in self._reversed_docs)
+            ))
 
     def _find_linked_docs_by_reference(self, doctype):
         """Search for documents of a given DocType that reference this Asosiy panel.
@@ -403,7 +589,19 @@ class Asosiypanel(Document):
 
         doc = frappe.get_doc(doctype, docname)
 
-        if doc.docstatus == 1:
+        if doc.docstatus == 1 and self.cancellation_mode == "Reverse" and doctype in REVERSIBLE_DOCTYPES:
+            # Submitted → mirror at today's date (no backdated repost)
+            try:
+                reversal = self._reverse_linked_doc(doc)
+                self._reversed_docs.append((doctype, docname, reversal))
+            except Exception as e:
+                frappe.throw(
+                    _("<b>{0} {1}</b> uchun teskari hujjat yaratib bo'lmadi:<br>{2}").format(
+                        doctype, docname, str(e)
+                    ),
+                    title=_("Teskari hujjat xatosi")
+                )
+        elif doc.docstatus == 1:
             # Submitted → Cancel
             try:
                 doc.flags.ignore_permissions = True
@@ -434,6 +632,78 @@ class Asosiypanel(Document):
                 )
         # docstatus == 2 → Already cancelled, skip silently
 
+    def _reverse_linked_doc(self, doc):
+        """Post a mirror of a submitted stock document at today's date.
+
+        Stock Entry rows are mirrored (issued ↔ received, transfers swapped) at
+        the original valuation rates; Delivery Notes and Purchase Receipts get
+        a full return. The original stays submitted, so no SLE before today is
+        touched and no Repost Item Valuation is queued.
+
+        Returns are stock-only: the invoicing submit hooks skip is_return
+        documents, so no Sales / Purchase Invoice is raised for them. An invoice
+        already made for the original stays as it is; settle it with a credit /
+        debit note if needed.
+
+        Returns:
+            str: Name of the submitted reversal document
+        """
+        remarks = _("Reversal of {0} {1} | Asosiy Panel: {2}").format(doc.doctype, doc.name, self.name)
+
+        if doc.doctype == "Stock Entry":
+            reversal = self._make_reverse_stock_entry(doc)
+        elif doc.doctype == "Delivery Note":
+            from erpnext.stock.doctype.delivery_note.delivery_note import make_sales_return
+            reversal = make_sales_return(doc.name)
+        else:
+            from erpnext.stock.doctype.purchase_receipt.purchase_receipt import make_purchase_return
+            reversal = make_purchase_return(doc.name)
+
+        reversal.posting_date = nowdate()
+        reversal.set_posting_time = 0
+        reversal.remarks = remarks
+        reversal.flags.ignore_permissions = True
+        with span("reversal.insert"):
+            reversal.insert()
+        with span("reversal.submit"):
+            reversal.submit()
+        return reversal.name
+
+    def _make_reverse_stock_entry(self, original):
+        purpose = REVERSED_PURPOSE.get(original.purpose)
+        if not purpose:
+            frappe.throw(_("Stock Entry purpose {0} cannot be reversed").format(original.purpose))
+
+        se = frappe.new_doc("Stock Entry")
+        se.purpose = purpose
+        se.stock_entry_type = purpose
+        se.company = original.company
+        se.custom_sales_order = original.get("custom_sales_order")
+        se.custom_sales_order_item = original.get("custom_sales_order_item")
+        se.custom_reversal_of = original.name
+
+        for row in original.items:
+            reversed_row = {
+                "item_code": row.item_code,
+                "item_name": row.item_name,
+                "qty": row.qty,
+                "uom": row.uom,
+                "conversion_factor": row.conversion_factor,
+                "s_warehouse": row.t_warehouse,
+                "t_warehouse": row.s_warehouse,
+            }
+            if row.s_warehouse and not row.t_warehouse:
+                # Consumed / issued before → received back at its original cost.
+                # Repack needs a finished good; manual rate keeps the cost as is.
+                reversed_row.update({
+                    "basic_rate": row.valuation_rate,
+                    "set_basic_rate_manually": 1,
+                    "is_finished_item": 1 if purpose == "Repack" else 0,
+                })
+            se.append("items", reversed_row)
+
+        return se
+
     def create_rasxod_material_transfer(self):
         """Create Stock Entry (Material Transfer) for rasxod_po_zakasu operation.
         
@@ -472,8 +742,10 @@ class Asosiypanel(Document):
             })
         
         se.flags.ignore_permissions = True
-        se.insert()
-        se.submit()
+        with span("se.insert"):
+            se.insert()
+        with span("se.submit"):
+            se.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Stock Entry', se.name)
@@ -484,7 +756,7 @@ class Asosiypanel(Document):
             alert=True
         )
         
-        self.add_comment('Info', _('Rasxod (Material Transfer) {0} created for Sales Order {1}').format(
+        add_comment(self, 'Info', _('Rasxod (Material Transfer) {0} created for Sales Order {1}').format(
             f'<a href="/app/stock-entry/{se.name}">{se.name}</a>',
             self.sales_order
         ))
@@ -501,7 +773,7 @@ class Asosiypanel(Document):
             frappe.throw(_("Supplier is required for service cost operations"))
         
         # Create Purchase Invoice
-        company_currency = frappe.db.get_value("Company", self.company, "default_currency")
+        company_currency = get_company_context(self.company).default_currency
         doc_currency = getattr(self, 'currency', None) or company_currency
         doc_exchange_rate = flt(getattr(self, 'exchange_rate', None)) or 1.0
         
@@ -528,7 +800,7 @@ class Asosiypanel(Document):
                 "expense_account"
             )
             if not expense_account:
-                expense_account = frappe.db.get_value("Company", self.company, "default_expense_account")
+                expense_account = get_company_context(self.company).default_expense_account
             
             pi_item = pi.append('items', {
                 'item_code': item.item_code,
@@ -551,8 +823,10 @@ class Asosiypanel(Document):
         
         # Insert and submit
         pi.flags.ignore_permissions = True
-        pi.insert()
-        pi.submit()
+        with span("pi.insert"):
+            pi.insert()
+        with span("pi.submit"):
+            pi.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Purchase Invoice', pi.name)
@@ -588,7 +862,7 @@ class Asosiypanel(Document):
             alert=True
         )
         
-        self.add_comment('Info', _('Purchase Invoice {0} created: {1} {2} (Base: {3} {4}) for SO {5}').format(
+        add_comment(self, 'Info', _('Purchase Invoice {0} created: {1} {2} (Base: {3} {4}) for SO {5}').format(
             f'<a href="/app/purchase-invoice/{pi.name}">{pi.name}</a>',
             frappe.format_value(total_amount, {'fieldtype': 'Currency'}),
             doc_currency,
@@ -606,7 +880,9 @@ class Asosiypanel(Document):
         3. Produces finished goods
         4. Maintains full traceability to Purchase Invoices
         
-        The items table is auto-populated by frontend via get_all_costs_for_production.
+        The items table is auto-populated by frontend via get_all_costs_for_production
+        with this batch's share of the WIP / service balance; validate caps it again
+        under the Sales Order Item lock (_reserve_wip_materials).
         """
         # ========================================
         # VALIDATION PHASE
@@ -658,9 +934,12 @@ class Asosiypanel(Document):
         se.company = self.company
         se.posting_date = self.posting_date
         
-        # Link to Sales Order for traceability
+        # Link to Sales Order for traceability; custom_* feed the WIP ledger
         if self.sales_order:
             se.sales_order = self.sales_order
+            se.custom_sales_order = self.sales_order
+        if self.sales_order_item:
+            se.custom_sales_order_item = self.sales_order_item
         
         # Build comprehensive remarks with Purchase Invoice traceability
         remarks_parts = [_("Production for Sales Order: {0}").format(self.sales_order)]
@@ -705,7 +984,7 @@ class Asosiypanel(Document):
         
         if total_service_cost > 0:
             # Get default expense account
-            default_expense_account = frappe.db.get_value("Company", self.company, "stock_adjustment_account")
+            default_expense_account = get_company_context(self.company).stock_adjustment_account
             if not default_expense_account:
                 frappe.throw(_("Please set Stock Adjustment Account in Company {0}").format(self.company))
             
@@ -761,8 +1040,10 @@ class Asosiypanel(Document):
         # EXECUTION PHASE
         # ========================================
         se.flags.ignore_permissions = True
-        se.insert()
-        se.submit()
+        with span("se.insert"):
+            se.insert()
+        with span("se.submit"):
+            se.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Stock Entry', se.name)
@@ -770,7 +1051,7 @@ class Asosiypanel(Document):
         # ========================================
         # USER FEEDBACK WITH TRACEABILITY
         # ========================================
-        company_currency = frappe.db.get_value("Company", self.company, "default_currency")
+        company_currency = get_company_context(self.company).default_currency
         
         # Build detailed feedback message
         msg_parts = []
@@ -815,7 +1096,7 @@ class Asosiypanel(Document):
         if purchase_invoices:
             comment_parts.append(_('PIs: {0}').format(', '.join(sorted(purchase_invoices))))
         
-        self.add_comment('Info', ' | '.join(comment_parts))
+        add_comment(self, 'Info', ' | '.join(comment_parts))
 
     def _get_wip_materials_for_production(self):
         """Query materials currently in WIP warehouse for this Sales Order.
@@ -927,7 +1208,7 @@ class Asosiypanel(Document):
         # Add all service costs as a single additional_cost entry
         if total_service_cost > 0:
             se.append('additional_costs', {
-                'expense_account': frappe.db.get_value("Company", self.company, "stock_adjustment_account"),
+                'expense_account': get_company_context(self.company).stock_adjustment_account,
                 'description': _("Service Costs from Asosiy Panel"),
                 'amount': total_service_cost
             })
@@ -944,8 +1225,10 @@ class Asosiypanel(Document):
         })
         
         se.flags.ignore_permissions = True
-        se.insert()
-        se.submit()
+        with span("se.insert"):
+            se.insert()
+        with span("se.submit"):
+            se.submit()
         
         # User feedback with link
         frappe.msgprint(
@@ -954,19 +1237,18 @@ class Asosiypanel(Document):
             alert=True
         )
         
-        self.add_comment('Info', _('Production Stock Entry {0} created').format(
+        add_comment(self, 'Info', _('Production Stock Entry {0} created').format(
             f'<a href="/app/stock-entry/{se.name}">{se.name}</a>'
         ))
 
     def create_delivery_note(self):
-        """Create Delivery Note and handle 2-stage Inter-Company automation.
+        """Create Delivery Note; for internal customers start an Inter-Company Transfer.
         
-        STAGE 1 (This method):
-        1. Source Company: Delivery Note (DN) - Submit
+        This method only submits the Delivery Note (source company). The rest of
+        the chain runs in background jobs (premierprint.services.inter_company):
         2. Target Company: Purchase Receipt (PR) - DRAFT (manual checkpoint)
-        
-        STAGE 2 (via hooks.py - Purchase Receipt on_submit):
-        3. Target Company: Purchase Invoice (PI) - Auto-submit when PR is submitted
+        3. Target Company: Purchase Invoice (PI) - once the PR is submitted
+        4. Source Company: Sales Invoice (SI) - paired with the PI
         """
         self.validate_stock()
         
@@ -980,7 +1262,7 @@ class Asosiypanel(Document):
         dn.customer = self.customer
         dn.company = self.company
         dn.posting_date = self.posting_date
-        dn.currency = getattr(self, 'currency', None) or frappe.db.get_value('Company', self.company, 'default_currency')
+        dn.currency = getattr(self, 'currency', None) or get_company_context(self.company).default_currency
         dn.selling_price_list = self.price_list
         dn.set_warehouse = self.from_warehouse
         
@@ -994,51 +1276,46 @@ class Asosiypanel(Document):
                 'warehouse': self.from_warehouse
             })
         
+        is_transfer = bool(is_internal and self.target_company and self.target_warehouse)
+        if is_transfer:
+            # Picked up by invoicing.on_delivery_note_submit -> inter_company.start_transfer
+            dn.flags.inter_company_transfer = {
+                'target_company': self.target_company,
+                'target_warehouse': self.target_warehouse,
+                'asosiy_panel': self.name,
+            }
+        
         dn.flags.ignore_permissions = True
-        dn.insert()
-        dn.submit()
+        with span("dn.insert"):
+            dn.insert()
+        with span("dn.submit"):
+            dn.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Delivery Note', dn.name)
         
-        self.add_comment('Info', _('1. Delivery Note {0} created and submitted').format(
+        add_comment(self, 'Info', _('1. Delivery Note {0} created and submitted').format(
             f'<a href="/app/delivery-note/{dn.name}">{dn.name}</a>'
         ))
         
-        # ============================================================
-        # INTERNAL CUSTOMER: 2-Stage Inter-Company Automation
-        # ============================================================
-        if is_internal and self.target_company and self.target_warehouse:
-            try:
-                # STAGE 1, STEP 2: Create Purchase Receipt as DRAFT in Target Company
-                pr = self._create_purchase_receipt_from_dn(dn)
-                
-                # Success message - inform user about next steps
-                frappe.msgprint(
-                    _("<b>STAGE 1 Complete!</b><br><br>"
-                      "<b>Source Company ({0}):</b><br>"
-                      "• Delivery Note: <a href='/app/delivery-note/{1}'>{1}</a> ✅ Submitted<br><br>"
-                      "<b>Target Company ({2}):</b><br>"
-                      "• Purchase Receipt: <a href='/app/purchase-receipt/{3}'>{3}</a> 📝 Draft<br><br>"
-                      "<hr>"
-                      "<b>Keyingi qadam:</b> Purchase Receipt ni ko'rib chiqing va submit qiling. "
-                      "Purchase Invoice avtomatik yaratiladi.").format(
-                        self.company, dn.name,
-                        self.target_company, pr.name
-                    ),
-                    indicator='blue',
-                    title=_("Inter-Company: Manual Checkpoint")
-                )
-                
-            except Exception as e:
-                frappe.log_error(
-                    title=_("Inter-Company Transaction Error"),
-                    message=frappe.get_traceback()
-                )
-                frappe.throw(
-                    _("Error in Inter-Company automation: {0}").format(str(e)),
-                    title=_("Transaction Failed")
-                )
+        if is_transfer:
+            transfer = frappe.db.get_value(
+                'Inter-Company Transfer', {'delivery_note': dn.name}, 'name'
+            )
+            frappe.msgprint(
+                _("<b>Source Company ({0}):</b><br>"
+                  "• Delivery Note: <a href='/app/delivery-note/{1}'>{1}</a> ✅ Submitted<br><br>"
+                  "<b>Target Company ({2}):</b><br>"
+                  "• Inter-Company Transfer: <a href='/app/inter-company-transfer/{3}'>{3}</a> ⏳ Queued<br><br>"
+                  "<hr>"
+                  "<b>Keyingi qadam:</b> Purchase Receipt draft holatda yaratiladi — uni ko'rib chiqing va submit qiling. "
+                  "Purchase Invoice va Sales Invoice avtomatik yaratiladi.").format(
+                    self.company, dn.name,
+                    self.target_company, transfer
+                ),
+                indicator='blue',
+                title=_("Inter-Company: Manual Checkpoint")
+            )
         else:
             # Non-internal customer - just show DN created
             frappe.msgprint(
@@ -1047,62 +1324,6 @@ class Asosiypanel(Document):
                 alert=True
             )
 
-    def _create_purchase_receipt_from_dn(self, dn):
-        """Create Purchase Receipt in Target Company as DRAFT.
-        
-        STAGE 1: Creates PR as draft for manual review.
-        STAGE 2: When user submits PR, Purchase Invoice is auto-created via hooks.
-        
-        Maps items from DN to PR with correct warehouse mapping.
-        """
-        # Find Supplier in Target Company that represents Source Company
-        supplier_name = frappe.db.get_value(
-            "Supplier", 
-            {"represents_company": self.company, "is_internal_supplier": 1}, 
-            "name"
-        )
-        
-        if not supplier_name:
-            frappe.throw(
-                _("Please setup an Internal Supplier in {0} that represents {1}").format(
-                    self.target_company, self.company
-                )
-            )
-        
-        pr = frappe.new_doc('Purchase Receipt')
-        pr.company = self.target_company
-        pr.supplier = supplier_name
-        pr.posting_date = self.posting_date
-        pr.currency = getattr(self, 'currency', None) or frappe.db.get_value('Company', self.target_company, 'default_currency')
-        pr.set_warehouse = self.target_warehouse
-        
-        # Map items from DN
-        for dn_item in dn.items:
-            pr.append('items', {
-                'item_code': dn_item.item_code,
-                'item_name': dn_item.item_name,
-                'qty': dn_item.qty,
-                'uom': dn_item.uom,
-                'rate': dn_item.rate,
-                'warehouse': self.target_warehouse,
-                'received_qty': dn_item.qty
-            })
-        
-        pr.flags.ignore_permissions = True
-        pr.insert()
-        # DO NOT SUBMIT - Leave as Draft for manual review (STAGE 2)
-        # pr.submit()
-        
-        # Store as secondary linked doc for cancellation tracking
-        self._store_linked_doc('Purchase Receipt', pr.name, secondary=True)
-        
-        self.add_comment('Info', _('2. Purchase Receipt {0} created as DRAFT (Target Company: {1}). Please review and submit manually.').format(
-            f'<a href="/app/purchase-receipt/{pr.name}">{pr.name}</a>',
-            self.target_company
-        ))
-        
-        return pr
-
     def create_stock_entry(self, purpose):
         if purpose == 'Material Issue':
              self.validate_stock()
@@ -1129,13 +1350,15 @@ class Asosiypanel(Document):
             })
             
         se.flags.ignore_permissions = True
-        se.insert()
-        se.submit()
+        with span("se.insert"):
+            se.insert()
+        with span("se.submit"):
+            se.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Stock Entry', se.name)
         
-        self.add_comment('Info', _('Stock Entry {0} created').format(
+        add_comment(self, 'Info', _('Stock Entry {0} created').format(
              f'<a href="/app/stock-entry/{se.name}">{se.name}</a>'
         ))
 
@@ -1184,8 +1407,10 @@ class Asosiypanel(Document):
                     },
                 )
 
-            mr_doc.insert(ignore_permissions=True)
-            mr_doc.submit()
+            with span("mr_doc.insert"):
+                mr_doc.insert(ignore_permissions=True)
+            with span("mr_doc.submit"):
+                mr_doc.submit()
             
             # Store reference for cancellation tracking
             self._store_linked_doc('Material Request', mr_doc.name)
@@ -1201,11 +1426,11 @@ class Asosiypanel(Document):
                 alert=True,
             )
 
-            self.add_comment("Info", _("Material Request {0} created").format(mr_link))
+            add_comment(self, "Info", _("Material Request {0} created").format(mr_link))
 
             try:
                 ap_link = f"<a href='/app/asosiy-panel/{self.name}'>{self.name}</a>"
-                mr_doc.add_comment("Info", _("Created from Asosiy panel {0}").format(ap_link))
+                add_comment(mr_doc, "Info", _("Created from Asosiy panel {0}").format(ap_link))
             except Exception:
                 pass
 
@@ -1262,8 +1487,10 @@ class Asosiypanel(Document):
 
                 pr_doc.append("items", pr_item)
 
-            pr_doc.insert(ignore_permissions=True)
-            pr_doc.submit()
+            with span("pr_doc.insert"):
+                pr_doc.insert(ignore_permissions=True)
+            with span("pr_doc.submit"):
+                pr_doc.submit()
             
             # Store reference for cancellation tracking
             self._store_linked_doc('Purchase Receipt', pr_doc.name)
@@ -1275,11 +1502,11 @@ class Asosiypanel(Document):
                 alert=True,
             )
 
-            self.add_comment("Info", _("Purchase Receipt {0} created").format(pr_link))
+            add_comment(self, "Info", _("Purchase Receipt {0} created").format(pr_link))
 
             try:
                 ap_link = f"<a href='/app/asosiy-panel/{self.name}'>{self.name}</a>"
-                pr_doc.add_comment("Info", _("Created from Asosiy panel {0}").format(ap_link))
+                add_comment(pr_doc, "Info", _("Created from Asosiy panel {0}").format(ap_link))
             except Exception:
                 pass
 
@@ -1291,7 +1518,7 @@ class Asosiypanel(Document):
         si = frappe.new_doc('Sales Invoice')
         si.customer = self.customer
         si.company = self.company
-        si.currency = getattr(self, 'currency', None) or frappe.db.get_value('Company', self.company, 'default_currency')
+        si.currency = getattr(self, 'currency', None) or get_company_context(self.company).default_currency
         si.selling_price_list = self.price_list
         si.posting_date = self.posting_date
         si.due_date = self.payment_due_date
@@ -1306,13 +1533,15 @@ class Asosiypanel(Document):
             })
             
         si.flags.ignore_permissions = True
-        si.insert()
-        si.submit()
+        with span("si.insert"):
+            si.insert()
+        with span("si.submit"):
+            si.submit()
         
         # Store reference for cancellation tracking
         self._store_linked_doc('Sales Invoice', si.name)
         
-        self.add_comment('Info', _('Sales Invoice {0} created').format(
+        add_comment(self, 'Info', _('Sales Invoice {0} created').format(
             f'<a href="/app/sales-invoice/{si.name}">{si.name}</a>'
         ))
 
@@ -1608,10 +1837,10 @@ def get_any_available_price(item_code, preferred_price_list, currency=None):
 def get_items_from_purchase_orders(source_names):
     """Fetch PENDING items from selected Purchase Order(s) for Asosiy panel.
     
-    For each PO item, calculates:
+    Reads Open Purchase Order Line, which keeps per PO item:
         pending_qty = flt(qty) - flt(received_qty)
     
-    Only items with pending_qty > 0 are returned.
+    Only items with pending_qty > 0 exist there.
     Example: PO has 50 units, 20 already received → returns 30.
     """
     import json
@@ -1625,38 +1854,30 @@ def get_items_from_purchase_orders(source_names):
     if not source_names:
         frappe.throw(_("No Purchase Orders selected"))
     
+    # Open Purchase Order Line: only lines with pending qty (utils/open_po_lines.py)
     po_items = frappe.db.sql("""
         SELECT
-            poi.item_code,
-            poi.item_name,
-            poi.qty,
-            poi.received_qty,
-            poi.uom,
-            poi.stock_uom,
-            poi.rate,
-            poi.parent  AS purchase_order,
-            poi.name    AS purchase_order_item
-        FROM `tabPurchase Order Item` poi
-        INNER JOIN `tabPurchase Order` po ON po.name = poi.parent
-        WHERE po.docstatus = 1
-          AND po.name IN %(names)s
-        ORDER BY poi.parent, poi.idx
+            line.item_code,
+            line.item_name,
+            line.pending_qty,
+            line.uom,
+            line.rate,
+            line.purchase_order,
+            line.purchase_order_item
+        FROM `tabOpen Purchase Order Line` line
+        WHERE line.purchase_order IN %(names)s
+        ORDER BY line.purchase_order, line.po_idx
     """, {"names": source_names}, as_dict=True)
     
     items = []
     for row in po_items:
-        pending_qty = flt(row.qty) - flt(row.received_qty)
-        
-        # Skip fully received items
-        if pending_qty <= 0:
-            continue
-        
+        pending_qty = flt(row.pending_qty)
         rate = flt(row.rate)
         items.append({
             "item_code": row.item_code,
             "item_name": row.item_name,
             "qty": pending_qty,
-            "uom": row.uom or row.stock_uom,
+            "uom": row.uom,
             "rate": rate,
             "amount": flt(pending_qty * rate),
             "purchase_order": row.purchase_order,
@@ -1679,37 +1900,35 @@ def get_purchase_orders_for_selection(doctype, txt, searchfield, start, page_len
     if not supplier or not company:
         return []
     
+    # Indexed read over Open Purchase Order Line (supplier, company, transaction_date);
+    # PO status is checked here because Close / Hold do not fire doc_events
     query = """
         SELECT 
-            po.name,
-            po.supplier,
-            po.transaction_date,
+            line.purchase_order,
+            line.supplier,
+            line.transaction_date,
             po.grand_total,
             GROUP_CONCAT(
                 DISTINCT CONCAT(
-                    poi.item_name, 
-                    ' (qoldiq: ', ROUND(poi.qty - poi.received_qty, 2), '/', ROUND(poi.qty, 2), ')'
+                    line.item_name, 
+                    ' (qoldiq: ', ROUND(line.pending_qty, 2), '/', ROUND(line.qty, 2), ')'
                 ) 
-                ORDER BY poi.idx 
+                ORDER BY line.po_idx 
                 SEPARATOR ', '
             ) as items_summary
         FROM 
-            `tabPurchase Order` po
+            `tabOpen Purchase Order Line` line
         INNER JOIN 
-            `tabPurchase Order Item` poi ON poi.parent = po.name
-                AND poi.qty > poi.received_qty
+            `tabPurchase Order` po ON po.name = line.purchase_order
         WHERE 
-            po.docstatus = 1
-            AND po.supplier = %(supplier)s
-            AND po.company = %(company)s
+            line.supplier = %(supplier)s
+            AND line.company = %(company)s
             AND po.status NOT IN ('Completed', 'Closed', 'Cancelled')
-            AND (po.name LIKE %(txt)s OR po.supplier LIKE %(txt)s)
+            AND (line.purchase_order LIKE %(txt)s OR line.supplier LIKE %(txt)s)
         GROUP BY 
-            po.name
-        HAVING
-            SUM(poi.qty - poi.received_qty) > 0
+            line.purchase_order
         ORDER BY 
-            po.transaction_date DESC
+            line.transaction_date DESC
         LIMIT 
             %(start)s, %(page_len)s
     """
@@ -1748,7 +1967,7 @@ def get_purchase_order_meta(po_name):
 
 
 @frappe.whitelist()
-def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None):
+def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None, finished_good=None, production_qty=None):
     """Advanced aggregator: Fetch all materials and service costs for production.
     
     This method fetches:
@@ -1759,6 +1978,8 @@ def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None):
         sales_order_item: Sales Order Item name to fetch costs for
         wip_warehouse: WIP Warehouse to fetch materials from
         company: Company name (for currency conversion)
+        finished_good, production_qty: When given, materials and services are
+            scaled to this batch's share (services/wip_ledger.get_production_share)
         
     Returns:
         dict: {
@@ -1785,40 +2006,15 @@ def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None):
     if not company:
         company = frappe.db.get_value('Sales Order', sales_order, 'company')
     
-    company_currency = frappe.db.get_value('Company', company, 'default_currency')
+    company_currency = get_company_context(company).default_currency
     
     # ========================================
     # PART 1: Fetch WIP Materials
     # ========================================
-    # Find all Stock Entry Details where:
-    # - Items are transferred TO the WIP warehouse
-    # - Linked to the Sales Order via custom_sales_order field
-    # - Stock Entry is submitted
-    
-    materials_sql = """
-        SELECT 
-            sed.item_code,
-            sed.item_name,
-            SUM(sed.qty) as qty,
-            sed.uom,
-            AVG(sed.valuation_rate) as rate,
-            SUM(sed.qty * sed.valuation_rate) as amount,
-            sed.description,
-            GROUP_CONCAT(DISTINCT se.name SEPARATOR ', ') as source_entries
-        FROM `tabStock Entry Detail` sed
-        INNER JOIN `tabStock Entry` se ON sed.parent = se.name
-        WHERE se.docstatus = 1
-            AND se.custom_sales_order = %(sales_order)s
-            AND sed.t_warehouse = %(wip_warehouse)s
-            AND se.purpose = 'Material Transfer'
-        GROUP BY sed.item_code, sed.item_name, sed.uom, sed.description
-        ORDER BY sed.item_code
-    """
-    
-    materials_data = frappe.db.sql(materials_sql, {
-        'sales_order': sales_order,
-        'wip_warehouse': wip_warehouse
-    }, as_dict=True)
+    # Remaining balance of the Sales Order Item in the WIP warehouse:
+    # 'Расход по заказу' transfers in, minus earlier production / reversals
+    # (services/wip_ledger.py)
+    materials_data = get_wip_balance(sales_order, sales_order_item, wip_warehouse)
     
     # Prepare materials list with flags
     materials = []
@@ -1908,6 +2104,28 @@ def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None):
         total_service_cost += base_amount
         purchase_invoices.add(svc.purchase_invoice)
     
+    # ========================================
+    # PART 3: Batch share (partial production)
+    # ========================================
+    share = None
+    if finished_good and flt(production_qty) > 0:
+        share = get_production_share(sales_order, sales_order_item, finished_good, production_qty)
+        service_balance = get_service_balance(sales_order, sales_order_item)
+        service_factor = share.fraction * (
+            service_balance.remaining / service_balance.total if service_balance.total else 0
+        )
+
+        for material in materials:
+            material['qty'] = flt(material['qty'] * share.fraction, 6)
+            material['amount'] = flt(material['qty'] * material['rate'])
+        for service in services:
+            service['amount'] = flt(service['amount'] * service_factor)
+            service['rate'] = flt(service['amount'] / service['qty']) if service['qty'] else service['amount']
+
+        services = [service for service in services if service['amount'] > 0]
+        total_material_cost = sum(material['amount'] for material in materials)
+        total_service_cost = sum(service['amount'] for service in services)
+
     # ========================================
     # Return Combined Results
     # ========================================
@@ -1918,7 +2136,8 @@ def get_all_costs_for_production(sales_order_item, wip_warehouse, company=None):
         'total_service_cost': total_service_cost,
         'purchase_invoices': list(purchase_invoices),
         'has_data': len(materials) > 0 or len(services) > 0,
-        'company_currency': company_currency
+        'company_currency': company_currency,
+        'production_share': share
     }
 
 @frappe.whitelist()
@@ -1935,3 +2154,52 @@ def get_item_valuation_rate(item_code, warehouse, posting_date=None, posting_tim
         "valuation_rate", order_by="posting_date desc, posting_time desc, creation desc")
         
     return flt(rate) if rate else 0.0
+
+@frappe.whitelist()
+def get_cancellation_impact(name):
+    """Repost cost of cancelling a submitted panel, for the Cancel / Reverse choice.
+
+    Counts the later SLEs that cancelling the panel's stock documents would
+    revalue. Reverse mode posts at today's date and reposts nothing.
+    """
+    from premierprint.utils.repost_impact import estimate_voucher_impact
+
+    doc = frappe.get_doc("Asosiy panel", name)
+    doc.check_permission("cancel")
+
+    vouchers = set()
+    for doctype, docname in (
+        (doc.linked_document_type, doc.linked_document_name),
+        (doc.linked_document_type_2, doc.linked_document_name_2),
+    ):
+        if doctype in REVERSIBLE_DOCTYPES and docname:
+            vouchers.add(docname)
+    for doctype in REVERSIBLE_DOCTYPES:
+        vouchers.update(doc._find_linked_docs_by_reference(doctype))
+
+    impact = estimate_voucher_impact(sorted(vouchers))
+    impact["vouchers"] = sorted(vouchers)
+    impact["cancellation_mode"] = doc.cancellation_mode or "Cancel"
+    return impact
+
+
+@frappe.whitelist()
+def set_cancellation_mode(name, mode):
+    if mode not in ("Cancel", "Reverse"):
+        frappe.throw(_("Invalid cancellation mode: {0}").format(mode))
+
+    doc = frappe.get_doc("Asosiy panel", name)
+    doc.check_permission("cancel")
+    doc.db_set("cancellation_mode", mode)
+
+
+@frappe.whitelist()
+def estimate_backdated_impact(doc):
+    """Repost estimate shown in the form before submitting a backdated panel."""
+    import json
+
+    if isinstance(doc, str):
+        doc = json.loads(doc)
+    panel = frappe.get_doc(doc)
+    panel.check_permission("submit" if not panel.is_new() else "create")
+    return panel._get_backdated_impact()
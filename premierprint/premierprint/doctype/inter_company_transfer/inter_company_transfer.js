@@ -0,0 +1,28 @@
+// Copyright (c) 2026, Munisa and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Inter-Company Transfer", {
+	refresh(frm) {
+		if (!["Completed", "Cancelled"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Advance"), () => {
+				frappe.call({
+					method: "premierprint.services.inter_company.advance_transfers",
+					args: { names: [frm.doc.name] },
+					callback() {
+						frappe.show_alert({ message: __("Queued"), indicator: "blue" });
+						frm.reload_doc();
+					},
+				});
+			});
+		}
+
+		if (frm.doc.status === "Waiting" && frm.doc.purchase_receipt) {
+			frm.set_intro(
+				__("Waiting for Purchase Receipt {0} to be submitted.", [frm.doc.purchase_receipt.bold()]),
+				"orange"
+			);
+		} else if (frm.doc.status === "Failed" && frm.doc.last_error) {
+			frm.set_intro(frm.doc.last_error, "red");
+		}
+	},
+});
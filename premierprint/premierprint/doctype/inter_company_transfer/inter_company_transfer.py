@@ -0,0 +1,11 @@
+# Copyright (c) 2026, Munisa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class InterCompanyTransfer(Document):
+	"""State of one DN → PR → PI → SI chain; advanced by premierprint.services.inter_company."""
+
+	pass
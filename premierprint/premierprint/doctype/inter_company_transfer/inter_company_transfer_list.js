@@ -0,0 +1,70 @@
+// Copyright (c) 2026, Munisa and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Inter-Company Transfer"] = {
+	add_fields: ["status", "current_hop"],
+
+	get_indicator(doc) {
+		const colors = {
+			Pending: "gray",
+			Queued: "blue",
+			Waiting: "orange",
+			Completed: "green",
+			Failed: "red",
+			Cancelled: "gray",
+		};
+		return [__(doc.status), colors[doc.status] || "gray", "status,=," + doc.status];
+	},
+
+	onload(listview) {
+		listview.page.add_action_item(__("Advance"), () => {
+			const names = listview.get_checked_items(true);
+			frappe.call({
+				method: "premierprint.services.inter_company.advance_transfers",
+				args: { names },
+				callback(r) {
+					frappe.show_alert({
+						message: __("{0} transfer(s) queued", [(r.message || []).length]),
+						indicator: "blue",
+					});
+					listview.refresh();
+				},
+			});
+		});
+
+		listview.page.add_inner_button(__("Stuck Chains"), () => {
+			frappe.call({
+				method: "premierprint.services.inter_company.get_stuck_transfers",
+				callback(r) {
+					const rows = (r.message || [])
+						.map(
+							(t) => `<tr>
+								<td><a href="/app/inter-company-transfer/${t.name}">${t.name}</a></td>
+								<td>${__(t.status)}</td>
+								<td>${__(t.current_hop || "")}</td>
+								<td>${t.attempts || 0}</td>
+								<td>${frappe.datetime.comment_when(t.modified)}</td>
+								<td>${frappe.utils.escape_html(t.last_error || "")}</td>
+							</tr>`
+						)
+						.join("");
+
+					frappe.msgprint({
+						title: __("Stuck Inter-Company Chains"),
+						wide: true,
+						message: rows
+							? `<table class="table table-bordered">
+								<thead><tr>
+									<th>${__("Transfer")}</th><th>${__("Status")}</th>
+									<th>${__("Hop")}</th><th>${__("Attempts")}</th>
+									<th>${__("Last Change")}</th><th>${__("Error")}</th>
+								</tr></thead>
+								<tbody>${rows}</tbody>
+							</table>`
+							: __("No stuck transfers"),
+					});
+				},
+			});
+		});
+	},
+};
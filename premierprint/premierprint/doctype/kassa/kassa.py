@@ -6,8 +6,16 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, getdate
 
+from premierprint.utils.instrumentation import phase, profile, span
+
 
 class Kassa(Document):
+    @frappe.whitelist()
+    def submit(self):
+        with profile("Kassa: {0}".format(self.transaction_type), doc=self):
+            return super().submit()
+
+    @phase("validate")
     def validate(self):
         self.set_default_company()
         # kassa (visible) → cash_account (hidden) mirror — must run first
@@ -25,6 +33,7 @@ class Kassa(Document):
         self.validate_amount()
         self.validate_currency()
 
+    @phase("on_submit")
     def on_submit(self):
         if self.transaction_type in ["Приход", "Расход"]:
             if self.party_type in ["Customer", "Supplier", "Employee", "Shareholder"]:
@@ -87,8 +96,10 @@ class Kassa(Document):
         pe.reference_date = self.date
         pe.remarks = self.remarks or f"Payment for {self.name}"
         pe.flags.ignore_permissions = True
-        pe.insert()
-        pe.submit()
+        with span("pe.insert"):
+            pe.insert()
+        with span("pe.submit"):
+            pe.submit()
         frappe.msgprint(_("Payment Entry {0} создан").format(
             frappe.utils.get_link_to_form("Payment Entry", pe.name)
         ))
@@ -159,8 +170,10 @@ class Kassa(Document):
                 "debit_in_account_currency": flt(self.amount), "debit": flt(self.amount)})
 
         je.flags.ignore_permissions = True
-        je.insert()
-        je.submit()
+        with span("je.insert"):
+            je.insert()
+        with span("je.submit"):
+            je.submit()
         frappe.msgprint(_("Journal Entry {0} для дивидендов создан").format(
             frappe.utils.get_link_to_form("Journal Entry", je.name)
         ))
@@ -207,8 +220,10 @@ class Kassa(Document):
                 "debit_in_account_currency": flt(self.amount), "debit": flt(self.amount)})
 
         je.flags.ignore_permissions = True
-        je.insert()
-        je.submit()
+        with span("je.insert"):
+            je.insert()
+        with span("je.submit"):
+            je.submit()
         frappe.msgprint(_("Journal Entry {0} для расходов создан").format(
             frappe.utils.get_link_to_form("Journal Entry", je.name)
         ))
@@ -231,8 +246,10 @@ class Kassa(Document):
         pe.reference_date = self.date
         pe.remarks = self.remarks or f"Transfer from {self.name}"
         pe.flags.ignore_permissions = True
-        pe.insert()
-        pe.submit()
+        with span("pe.insert"):
+            pe.insert()
+        with span("pe.submit"):
+            pe.submit()
         frappe.msgprint(_("Payment Entry {0} для перемещения создан").format(
             frappe.utils.get_link_to_form("Payment Entry", pe.name)
         ))
@@ -293,8 +310,10 @@ class Kassa(Document):
         pe.reference_date = self.date
         pe.remarks = self.remarks or f"Conversion from {self.name}"
         pe.flags.ignore_permissions = True
-        pe.insert()
-        pe.submit()
+        with span("pe.insert"):
+            pe.insert()
+        with span("pe.submit"):
+            pe.submit()
         frappe.msgprint(_("Payment Entry {0} для конвертации создан").format(
             frappe.utils.get_link_to_form("Payment Entry", pe.name)
         ))
@@ -0,0 +1,11 @@
+# Copyright (c) 2026, Munisa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class LastSalesPrice(Document):
+	"""Maintained by premierprint.utils.pricing on Sales Invoice submit/cancel; name = item_code::customer|*"""
+
+	pass
@@ -0,0 +1,12 @@
+# Copyright (c) 2026, Munisa and Contributors
+# See license.txt
+
+from frappe.tests import UnitTestCase
+
+from premierprint.utils.pricing import ANY_CUSTOMER, get_last_sales_price_key
+
+
+class UnitTestLastSalesPrice(UnitTestCase):
+	def test_key(self):
+		self.assertEqual(get_last_sales_price_key("ITEM-1", "Cust A"), "ITEM-1::Cust A")
+		self.assertEqual(get_last_sales_price_key("ITEM-1"), f"ITEM-1::{ANY_CUSTOMER}")
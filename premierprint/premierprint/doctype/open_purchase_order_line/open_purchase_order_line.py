@@ -0,0 +1,11 @@
+# Copyright (c) 2026, Munisa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class OpenPurchaseOrderLine(Document):
+	"""Maintained by premierprint.utils.open_po_lines on PO/PR/PI submit/cancel; name = Purchase Order Item name"""
+
+	pass
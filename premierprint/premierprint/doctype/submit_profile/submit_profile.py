@@ -0,0 +1,11 @@
+# Copyright (c) 2026, Munisa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class SubmitProfile(Document):
+	"""Written by premierprint.utils.instrumentation when Store Submit Profiles is on"""
+
+	pass
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, Munisa and Contributors
+# See license.txt
+
+import json
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from premierprint.utils.instrumentation import PROFILE_DOCTYPE, SETTINGS_DOCTYPE, profile, span
+
+
+class IntegrationTestSubmitProfile(IntegrationTestCase):
+	def setUp(self):
+		self.name = f"profile test {frappe.generate_hash(length=8)}"
+		self._set_settings(enable_submit_profiling=1, store_submit_profiles=1, submit_profile_min_ms=0)
+
+	def _set_settings(self, **values):
+		for fieldname, value in values.items():
+			previous = frappe.db.get_single_value(SETTINGS_DOCTYPE, fieldname)
+			self.addCleanup(frappe.db.set_single_value, SETTINGS_DOCTYPE, fieldname, previous)
+			frappe.db.set_single_value(SETTINGS_DOCTYPE, fieldname, value)
+
+	def _stored(self):
+		return frappe.get_all(
+			PROFILE_DOCTYPE,
+			filters={"profile_name": self.name},
+			fields=["status", "query_count", "phases"],
+		)
+
+	def _run(self):
+		with profile(self.name):
+			with span("lookup"):
+				frappe.db.sql("SELECT 1")
+
+	def test_profile_row_is_written_when_enabled(self):
+		self._run()
+
+		rows = self._stored()
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0].status, "Success")
+		self.assertGreaterEqual(rows[0].query_count, 1)
+		self.assertIn("lookup", [phase["name"] for phase in json.loads(rows[0].phases)])
+
+	def test_nothing_is_stored_when_profiling_is_off(self):
+		self._set_settings(enable_submit_profiling=0)
+		self._run()
+		self.assertEqual(self._stored(), [])
+
+	def test_failed_submit_is_not_stored(self):
+		with self.assertRaises(frappe.ValidationError):
+			with profile(self.name):
+				frappe.throw("boom")
+		self.assertEqual(self._stored(), [])
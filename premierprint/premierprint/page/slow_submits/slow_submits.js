@@ -0,0 +1,115 @@
+// Copyright (c) 2026, Munisa and contributors
+// For license information, please see license.txt
+
+frappe.pages["slow-submits"].on_page_load = function (wrapper) {
+	const page = frappe.ui.make_app_page({
+		parent: wrapper,
+		title: __("Slow Submits"),
+		single_column: true,
+	});
+
+	const source = page.add_field({
+		fieldname: "source",
+		label: __("Source"),
+		fieldtype: "Select",
+		options: [
+			{ value: "recent", label: __("Recent (cache)") },
+			{ value: "stored", label: __("Stored (Submit Profile)") },
+		],
+		default: "recent",
+		change: () => refresh(),
+	});
+	const limit = page.add_field({
+		fieldname: "limit",
+		label: __("Limit"),
+		fieldtype: "Int",
+		default: 50,
+		change: () => refresh(),
+	});
+	page.set_primary_action(__("Refresh"), () => refresh(), "refresh");
+	page.add_inner_button(__("Settings"), () => frappe.set_route("Form", "Premier Print Settings"));
+
+	const $body = $('<div class="slow-submits"></div>').appendTo(page.main);
+
+	function refresh() {
+		frappe.call({
+			method: "premierprint.utils.instrumentation.get_slowest_submits",
+			args: { source: source.get_value(), limit: limit.get_value() },
+			callback(r) {
+				render(r.message || []);
+			},
+		});
+	}
+
+	function render(profiles) {
+		if (!profiles.length) {
+			$body.html(
+				`<p class="text-muted">${__(
+					"No profiles yet. Enable Submit Profiling in Premier Print Settings."
+				)}</p>`
+			);
+			return;
+		}
+
+		const rows = profiles
+			.map((p, i) => {
+				const doc = p.reference_name
+					? `<a href="/app/${frappe.router.slug(p.reference_doctype)}/${encodeURIComponent(
+							p.reference_name
+					  )}">${frappe.utils.escape_html(p.reference_name)}</a>`
+					: "";
+				const status = p.status === "Failed" ? "red" : "green";
+				return `<tr>
+					<td><a class="toggle-phases" data-idx="${i}">${frappe.utils.escape_html(
+					p.profile_name
+				)}</a></td>
+					<td>${doc}</td>
+					<td>${frappe.utils.escape_html(p.user || "")}</td>
+					<td>${frappe.datetime.str_to_user(p.started_at)}</td>
+					<td><span class="indicator-pill ${status}">${__(p.status)}</span></td>
+					<td class="text-right">${format_number(p.duration_ms, null, 1)}</td>
+					<td class="text-right">${p.query_count}</td>
+					<td class="text-right">${format_number(p.query_ms, null, 1)}</td>
+				</tr>
+				<tr class="phases hidden" data-idx="${i}"><td colspan="8">${render_phases(p.phases || [])}</td></tr>`;
+			})
+			.join("");
+
+		$body.html(`
+			<table class="table table-bordered table-hover">
+				<thead><tr>
+					<th>${__("Profile")}</th>
+					<th>${__("Document")}</th>
+					<th>${__("User")}</th>
+					<th>${__("Started At")}</th>
+					<th>${__("Status")}</th>
+					<th class="text-right">${__("Duration (ms)")}</th>
+					<th class="text-right">${__("Queries")}</th>
+					<th class="text-right">${__("Query Time (ms)")}</th>
+				</tr></thead>
+				<tbody>${rows}</tbody>
+			</table>
+		`);
+
+		$body.find(".toggle-phases").on("click", function () {
+			$body.find(`tr.phases[data-idx="${$(this).data("idx")}"]`).toggleClass("hidden");
+		});
+	}
+
+	function render_phases(phases) {
+		return `<table class="table table-condensed">
+			${phases
+				.map(
+					(s) => `<tr>
+						<td style="padding-left: ${s.depth * 20 + 8}px">${frappe.utils.escape_html(s.name)}</td>
+						<td class="text-right">+${format_number(s.offset_ms, null, 1)} ms</td>
+						<td class="text-right">${format_number(s.wall_ms, null, 1)} ms</td>
+						<td class="text-right">${s.queries} q / ${format_number(s.query_ms, null, 1)} ms</td>
+					</tr>`
+				)
+				.join("")}
+		</table>`;
+	}
+
+	refresh();
+};
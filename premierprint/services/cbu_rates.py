@@ -0,0 +1,220 @@
+"""
+CBU Exchange Rate Ingestion
+===========================
+Loads the Central Bank of Uzbekistan (cbu.uz) rates for every currency it
+publishes into `Currency Exchange`, both directions:
+
+	1 USD = 12 099.18 UZS   and   1 UZS = 0.0000826 USD
+
+Rows are written with one multi-row INSERT ... ON DUPLICATE KEY UPDATE per
+batch, using the same name ERPNext's CurrencyExchange.autoname() would give
+them, so re-running a day just refreshes the rates.
+
+Feed source
+-----------
+Defaults to the public CBU archive. For offline testing point the site config
+key `cbu_rates_feed` at a stand-in — an HTTP URL or a local path/file:// URL,
+with `{date}` (YYYY-MM-DD) as placeholder:
+
+	bench --site <site> set-config cbu_rates_feed "/srv/cbu-fixtures/{date}.json"
+	bench --site <site> set-config cbu_rates_feed "http://localhost:8800/cbu/{date}/"
+
+Usage:
+	bench --site <site> backfill-cbu-rates --from-date 2026-01-01
+"""
+
+import json
+from urllib.parse import urlparse
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, date_diff, flt, getdate, now_datetime, today
+
+CBU_FEED_URL = "https://cbu.uz/oz/arkhiv-kursov-valyut/json/all/{date}/"
+BASE_CURRENCY = "UZS"
+REQUEST_TIMEOUT = 10
+UPSERT_BATCH_SIZE = 500
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def update_rates(date=None):
+	"""
+	Scheduler job (hourly): ingest the rates published for `date` (default today).
+
+	Returns:
+		int: Number of Currency Exchange rows written
+	"""
+	date = getdate(date or today())
+	try:
+		rates = fetch_rates(date)
+		count = upsert_rates(build_exchange_rows(date, rates))
+		frappe.db.commit()
+		return count
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(message=frappe.get_traceback(), title=f"CBU rate update failed: {date}")
+		return 0
+
+
+def backfill_rates(from_date, to_date=None):
+	"""
+	Fill every date in [from_date, to_date] that has no USD -> UZS row yet.
+
+	Missing dates are found with one query; all fetched days are written in
+	batched upserts at the end. Days the feed cannot serve are reported, not fatal.
+
+	Returns:
+		dict: {"dates": [...], "rows": int, "failed": {date: error}}
+	"""
+	from_date = getdate(from_date)
+	to_date = getdate(to_date or today())
+	if from_date > to_date:
+		frappe.throw(_("From Date must be before To Date"))
+
+	existing = {
+		getdate(d)
+		for d in frappe.db.sql_list(
+			"""
+			SELECT DISTINCT date FROM `tabCurrency Exchange`
+			WHERE from_currency = 'USD' AND to_currency = %(base)s
+				AND date BETWEEN %(from_date)s AND %(to_date)s
+			""",
+			{"base": BASE_CURRENCY, "from_date": from_date, "to_date": to_date},
+		)
+	}
+
+	missing = [
+		d
+		for d in (add_days(from_date, i) for i in range(date_diff(to_date, from_date) + 1))
+		if getdate(d) not in existing
+	]
+
+	rows, failed = [], {}
+	for date in missing:
+		try:
+			rows.extend(build_exchange_rows(getdate(date), fetch_rates(date)))
+		except Exception as e:
+			failed[str(date)] = str(e)
+
+	count = upsert_rates(rows)
+	frappe.db.commit()
+
+	if failed:
+		frappe.log_error(message=frappe.as_json(failed), title="CBU rate backfill: some dates failed")
+
+	return {"dates": [str(d) for d in missing], "rows": count, "failed": failed}
+
+
+# ============================================================
+# FEED
+# ============================================================
+
+def fetch_rates(date):
+	"""
+	Return {currency: UZS per 1 unit} for a date from the configured feed.
+
+	CBU quotes some currencies per `Nominal` units (e.g. 10 or 100); the rate
+	is normalised to one unit here.
+	"""
+	payload = _load_feed(getdate(date))
+
+	rates = {}
+	for entry in payload or []:
+		currency = (entry.get("Ccy") or "").upper()
+		nominal = flt(entry.get("Nominal")) or 1.0
+		rate = flt(entry.get("Rate")) / nominal
+		if currency and currency != BASE_CURRENCY and rate > 0:
+			rates[currency] = rate
+
+	return rates
+
+
+def _load_feed(date):
+	source = (frappe.conf.get("cbu_rates_feed") or CBU_FEED_URL).format(date=date.isoformat())
+	parsed = urlparse(source)
+
+	if parsed.scheme in ("http", "https"):
+		import requests
+
+		response = requests.get(source, timeout=REQUEST_TIMEOUT)
+		response.raise_for_status()
+		return response.json()
+
+	path = parsed.path if parsed.scheme == "file" else source
+	with open(path, encoding="utf-8") as f:
+		return json.load(f)
+
+
+# ============================================================
+# WRITE
+# ============================================================
+
+def build_exchange_rows(date, rates):
+	"""Direct (X -> UZS) and inverse (UZS -> X) rows for currencies known to the site."""
+	if not rates:
+		return []
+
+	known = set(frappe.get_all("Currency", filters={"name": ["in", list(rates) + [BASE_CURRENCY]]}, pluck="name"))
+	if BASE_CURRENCY not in known:
+		return []
+
+	rows = []
+	for currency, rate in rates.items():
+		if currency not in known:
+			continue
+		rows.append((date, currency, BASE_CURRENCY, rate))
+		rows.append((date, BASE_CURRENCY, currency, 1.0 / rate))
+	return rows
+
+
+def upsert_rates(rows):
+	"""
+	Bulk insert / refresh Currency Exchange rows.
+
+	Args:
+		rows: [(date, from_currency, to_currency, exchange_rate)]
+
+	Returns:
+		int: Number of rows written
+	"""
+	now = now_datetime()
+	user = frappe.session.user
+
+	for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+		batch = rows[start : start + UPSERT_BATCH_SIZE]
+		values = []
+		for date, from_currency, to_currency, rate in batch:
+			values.extend([
+				currency_exchange_name(date, from_currency, to_currency),
+				now, now, user, user, date, from_currency, to_currency, flt(rate, 9),
+			])
+
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabCurrency Exchange`
+				(name, creation, modified, owner, modified_by, docstatus, idx,
+				date, from_currency, to_currency, exchange_rate, for_buying, for_selling)
+			VALUES {placeholders}
+			ON DUPLICATE KEY UPDATE
+				exchange_rate = VALUES(exchange_rate),
+				modified = VALUES(modified),
+				modified_by = VALUES(modified_by)
+			""".format(
+				placeholders=", ".join(["(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, 1, 1)"] * len(batch))
+			),
+			tuple(values),
+		)
+
+	if rows:
+		# erpnext.setup.utils.get_exchange_rate caches by (from, to, date)
+		frappe.cache().delete_keys("currency_exchange_rate")
+
+	return len(rows)
+
+
+def currency_exchange_name(date, from_currency, to_currency):
+	"""Name ERPNext gives a buying + selling Currency Exchange row (see CurrencyExchange.autoname)."""
+	return "{0}-{1}-{2}-Selling-Buying".format(getdate(date).isoformat(), from_currency, to_currency)
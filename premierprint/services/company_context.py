@@ -0,0 +1,172 @@
+"""
+Company Accounting Context
+==========================
+Per-company bundle of the accounts and masters that LCV and production code
+needs on every submit: currency, abbr, cost center, default accounts, payable
+accounts per currency, carrier suppliers and the transport service item.
+
+Resolved once and kept in a Redis hash (one field per company). Any change to
+Company, Account, Item or Supplier clears the cache via doc_events, so the next
+call resolves from the database again.
+
+Missing values are stored as None — callers decide whether that is an error
+(see lcv_utils.get_transport_expense_account, transport_lcv._get_payable_account).
+"""
+
+import frappe
+from frappe import _
+
+CACHE_KEY = "premierprint:company_context"
+
+# custom_lcv_currency -> carrier supplier
+CARRIER_SUPPLIERS = {
+	"USD": "Logistika Servis USD",
+	"UZS": "Logistika Servis UZS",
+}
+TRANSPORT_ITEM_NAME = "Transport xizmati"
+TRANSPORT_EXPENSE_ACCOUNT_NAME = "Expenses Included In Valuation"
+
+
+def get_company_context(company):
+	"""
+	Return the cached accounting context for a company.
+
+	Returns:
+		frappe._dict: company, abbr, default_currency, cost_center,
+		default_expense_account, stock_adjustment_account,
+		transport_expense_account, payable_accounts {currency: account},
+		carrier_suppliers {currency: supplier}, transport_item
+	"""
+	cache = frappe.cache()
+	context = cache.hget(CACHE_KEY, company)
+	if context is None:
+		context = _build_company_context(company)
+		cache.hset(CACHE_KEY, company, context)
+
+	return frappe._dict(context)
+
+
+def clear_company_context(doc=None, method=None, *args):
+	"""doc_events hook: drop cached contexts after master data changes."""
+	company = None
+	if doc is not None and doc.doctype == "Company":
+		company = doc.name
+	elif doc is not None and doc.doctype == "Account":
+		company = doc.get("company")
+
+	if company:
+		frappe.cache().hdel(CACHE_KEY, company)
+	else:
+		# Item / Supplier are shared by all companies
+		frappe.cache().delete_value(CACHE_KEY)
+
+
+# ============================================================
+# RESOLVERS
+# ============================================================
+
+def _build_company_context(company):
+	company_doc = frappe.db.get_value(
+		"Company",
+		company,
+		[
+			"abbr",
+			"default_currency",
+			"cost_center",
+			"default_expense_account",
+			"stock_adjustment_account",
+			"expenses_included_in_valuation",
+		],
+		as_dict=True,
+	)
+	if not company_doc:
+		frappe.throw(_("Company {0} not found").format(company))
+
+	return {
+		"company": company,
+		"abbr": company_doc.abbr,
+		"default_currency": company_doc.default_currency,
+		"cost_center": company_doc.cost_center,
+		"default_expense_account": company_doc.default_expense_account,
+		"stock_adjustment_account": company_doc.stock_adjustment_account,
+		"transport_expense_account": _resolve_transport_expense_account(company, company_doc),
+		"payable_accounts": _resolve_payable_accounts(company),
+		"carrier_suppliers": _resolve_carrier_suppliers(),
+		"transport_item": _resolve_transport_item(),
+	}
+
+
+def _resolve_transport_expense_account(company, company_doc):
+	"""
+	"Expenses Included In Valuation - {abbr}" lookup, most reliable first:
+	  1. Company field 'expenses_included_in_valuation'
+	  2. Canonical name built from the company abbreviation
+	  3. account_name exact match
+	  4. account_type = "Expense Account" with LIKE search
+	"""
+	account = company_doc.expenses_included_in_valuation
+	if account and frappe.db.exists("Account", account):
+		return account
+
+	if company_doc.abbr:
+		canonical_name = "{} - {}".format(TRANSPORT_EXPENSE_ACCOUNT_NAME, company_doc.abbr)
+		if frappe.db.exists("Account", canonical_name):
+			return canonical_name
+
+	account = frappe.db.get_value(
+		"Account",
+		filters={
+			"account_name": TRANSPORT_EXPENSE_ACCOUNT_NAME,
+			"company": company,
+			"is_group": 0,
+			"disabled": 0,
+		},
+		fieldname="name",
+	)
+	if account:
+		return account
+
+	return frappe.db.get_value(
+		"Account",
+		filters={
+			"account_type": "Expense Account",
+			"account_name": ["like", "%Expenses Included%"],
+			"company": company,
+			"is_group": 0,
+			"disabled": 0,
+		},
+		fieldname="name",
+		order_by="creation asc",
+	)
+
+
+def _resolve_payable_accounts(company):
+	"""First (oldest) Payable leaf account per account_currency."""
+	accounts = {}
+	for row in frappe.get_all(
+		"Account",
+		filters={"company": company, "account_type": "Payable", "is_group": 0, "disabled": 0},
+		fields=["name", "account_currency"],
+		order_by="creation asc",
+	):
+		accounts.setdefault(row.account_currency, row.name)
+	return accounts
+
+
+def _resolve_carrier_suppliers():
+	existing = set(
+		frappe.get_all("Supplier", filters={"name": ["in", list(CARRIER_SUPPLIERS.values())]}, pluck="name")
+	)
+	return {currency: supplier for currency, supplier in CARRIER_SUPPLIERS.items() if supplier in existing}
+
+
+def _resolve_transport_item():
+	# item_code match first, then item_name (auto-numbered items)
+	if frappe.db.exists("Item", TRANSPORT_ITEM_NAME):
+		return TRANSPORT_ITEM_NAME
+
+	return frappe.db.get_value(
+		"Item",
+		filters={"item_name": TRANSPORT_ITEM_NAME, "disabled": 0},
+		fieldname="name",
+	)
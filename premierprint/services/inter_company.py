@@ -0,0 +1,460 @@
+"""
+Inter-Company Transfer Engine
+=============================
+Drives the internal sale chain as a state machine on an "Inter-Company Transfer"
+record, one background job per advance:
+
+  1. Delivery Note    (source company)  — submitted by Asosiy panel, starts the transfer
+  2. Purchase Receipt (target company)  — created as DRAFT, waits for manual submit
+  3. Purchase Invoice (target company)  — created & submitted once the PR is submitted
+  4. Sales Invoice    (source company)  — created & submitted, paired with the PI
+
+Each hop commits on its own, so a failure leaves the earlier hops in place and
+the transfer in "Failed" with the error on the hop row. advance_pending_transfers()
+re-queues pending / failed / unblocked transfers in batches (scheduler + list view),
+get_stuck_transfers() lists chains that have not moved for a while.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, now_datetime
+
+from premierprint.utils.invoicing import (
+	make_purchase_invoice_from_receipt,
+	make_sales_invoice_from_delivery_note,
+)
+from premierprint.utils.timeline import add_comment
+
+DOCTYPE = "Inter-Company Transfer"
+
+HOP_DELIVERY_NOTE = "Delivery Note"
+HOP_PURCHASE_RECEIPT = "Purchase Receipt"
+HOP_PURCHASE_INVOICE = "Purchase Invoice"
+HOP_SALES_INVOICE = "Sales Invoice"
+HOPS = [HOP_DELIVERY_NOTE, HOP_PURCHASE_RECEIPT, HOP_PURCHASE_INVOICE, HOP_SALES_INVOICE]
+
+# hop -> transfer field holding the created document
+HOP_FIELDS = {
+	HOP_DELIVERY_NOTE: "delivery_note",
+	HOP_PURCHASE_RECEIPT: "purchase_receipt",
+	HOP_PURCHASE_INVOICE: "purchase_invoice",
+	HOP_SALES_INVOICE: "sales_invoice",
+}
+
+MAX_ATTEMPTS = 5
+JOB_TIMEOUT = 900  # seconds; a Queued transfer older than this has lost its job
+BATCH_SIZE = 200
+STUCK_AFTER_HOURS = 24
+
+
+# ============================================================
+# START / ENQUEUE
+# ============================================================
+
+def start_transfer(dn, target_company, target_warehouse, asosiy_panel=None):
+	"""
+	Create the transfer record for a just-submitted internal Delivery Note and
+	queue the Purchase Receipt hop. Runs inside the DN submit transaction, so the
+	job is only enqueued after commit.
+
+	Returns:
+		str: Inter-Company Transfer name
+	"""
+	existing = frappe.db.get_value(
+		DOCTYPE, {"delivery_note": dn.name, "status": ["!=", "Cancelled"]}, "name"
+	)
+	if existing:
+		return existing
+
+	transfer = frappe.new_doc(DOCTYPE)
+	transfer.posting_date = dn.posting_date
+	transfer.asosiy_panel = asosiy_panel
+	transfer.source_company = dn.company
+	transfer.customer = dn.customer
+	transfer.target_company = target_company
+	transfer.target_warehouse = target_warehouse
+	transfer.supplier = _get_internal_supplier(dn.company, target_company)
+	transfer.delivery_note = dn.name
+	transfer.status = "Pending"
+	transfer.current_hop = HOP_PURCHASE_RECEIPT
+
+	for hop in HOPS:
+		transfer.append("hops", {"hop": hop, "status": "Pending"})
+	_set_hop(transfer, HOP_DELIVERY_NOTE, "Done", document_name=dn.name, finished=True)
+
+	transfer.flags.ignore_permissions = True
+	transfer.insert()
+
+	enqueue_advance(transfer.name)
+	return transfer.name
+
+
+def enqueue_advance(transfer_name):
+	"""Queue one advance job per transfer (deduplicated by job_id)."""
+	job_id = f"inter_company_transfer::{transfer_name}"
+	frappe.enqueue(
+		"premierprint.services.inter_company.advance_transfer",
+		queue="default",
+		timeout=JOB_TIMEOUT,
+		job_id=job_id,
+		deduplicate=True,
+		enqueue_after_commit=True,
+		transfer_name=transfer_name,
+	)
+	frappe.db.set_value(
+		DOCTYPE, transfer_name, {"status": "Queued", "last_run": now_datetime()}, update_modified=False
+	)
+	return job_id
+
+
+def on_receipt_submitted(pr):
+	"""
+	Purchase Receipt on_submit: if the PR belongs to a transfer, queue its next
+	hop and tell the caller to skip the synchronous PR → PI creation.
+	"""
+	transfer_name = frappe.db.get_value(
+		DOCTYPE, {"purchase_receipt": pr.name, "status": ["!=", "Cancelled"]}, "name"
+	)
+	if not transfer_name:
+		return False
+
+	enqueue_advance(transfer_name)
+	frappe.msgprint(
+		_("Purchase Invoice will be created in the background by Inter-Company Transfer {0}").format(
+			f'<a href="/app/inter-company-transfer/{transfer_name}">{transfer_name}</a>'
+		),
+		indicator="blue",
+		alert=True,
+	)
+	return True
+
+
+def cancel_transfers_for_panel(asosiy_panel):
+	"""Asosiy panel on_cancel: stop any transfer it started from advancing."""
+	for name in frappe.get_all(
+		DOCTYPE,
+		filters={"asosiy_panel": asosiy_panel, "status": ["not in", ["Completed", "Cancelled"]]},
+		pluck="name",
+	):
+		frappe.db.set_value(DOCTYPE, name, "status", "Cancelled")
+
+
+# ============================================================
+# STATE MACHINE
+# ============================================================
+
+def advance_transfer(transfer_name):
+	"""
+	Background job: run hops from current_hop until the chain completes or
+	reaches a manual checkpoint (draft Purchase Receipt).
+	"""
+	transfer = frappe.get_doc(DOCTYPE, transfer_name, for_update=True)
+	if transfer.status in ("Completed", "Cancelled"):
+		return transfer.status
+
+	handlers = {
+		HOP_PURCHASE_RECEIPT: _run_purchase_receipt_hop,
+		HOP_PURCHASE_INVOICE: _run_purchase_invoice_hop,
+		HOP_SALES_INVOICE: _run_sales_invoice_hop,
+	}
+
+	for hop in HOPS:
+		row = _get_hop(transfer, hop)
+		if row.status == "Done":
+			continue
+
+		transfer.current_hop = hop
+		transfer.last_run = now_datetime()
+		if row.status != "Waiting":
+			_set_hop(transfer, hop, "Queued", started=True)
+
+		try:
+			state = handlers[hop](transfer)
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(
+				message=frappe.get_traceback(),
+				title=f"Inter-Company Transfer {transfer_name}: {hop} failed",
+			)
+			_record_failure(transfer_name, hop, str(e))
+			return "Failed"
+
+		_set_hop(transfer, hop, state, finished=(state == "Done"))
+		transfer.status = "Waiting" if state == "Waiting" else "Pending"
+		transfer.last_error = None
+		_save(transfer)
+		frappe.db.commit()
+
+		if state == "Waiting":
+			return "Waiting"
+
+	transfer.status = "Completed"
+	_save(transfer)
+	frappe.db.commit()
+	return "Completed"
+
+
+def _run_purchase_receipt_hop(transfer):
+	"""Create the target-company PR as DRAFT; Done once somebody submits it."""
+	if transfer.purchase_receipt:
+		docstatus = frappe.db.get_value("Purchase Receipt", transfer.purchase_receipt, "docstatus")
+		if docstatus == 1:
+			return "Done"
+		if docstatus == 0:
+			return "Waiting"
+		frappe.throw(_("Purchase Receipt {0} was cancelled").format(transfer.purchase_receipt))
+
+	dn = frappe.get_doc("Delivery Note", transfer.delivery_note)
+	supplier = transfer.supplier or _get_internal_supplier(transfer.source_company, transfer.target_company)
+
+	pr = frappe.new_doc("Purchase Receipt")
+	pr.company = transfer.target_company
+	pr.supplier = supplier
+	pr.posting_date = dn.posting_date
+	pr.currency = dn.currency
+	pr.set_warehouse = transfer.target_warehouse
+	pr.custom_delivery_note_ref = dn.name
+
+	for dn_item in dn.items:
+		pr.append("items", {
+			"item_code": dn_item.item_code,
+			"item_name": dn_item.item_name,
+			"qty": dn_item.qty,
+			"uom": dn_item.uom,
+			"rate": dn_item.rate,
+			"warehouse": transfer.target_warehouse,
+			"received_qty": dn_item.qty,
+		})
+
+	pr.flags.ignore_permissions = True
+	pr.insert()
+	# DO NOT SUBMIT - Draft for manual review (manual checkpoint)
+
+	transfer.supplier = supplier
+	transfer.purchase_receipt = pr.name
+	_set_hop(transfer, HOP_PURCHASE_RECEIPT, "Waiting", document_name=pr.name)
+
+	if transfer.asosiy_panel:
+		# Secondary linked doc of the panel, for its cancellation chain
+		frappe.db.set_value("Asosiy panel", transfer.asosiy_panel, {
+			"linked_document_type_2": "Purchase Receipt",
+			"linked_document_name_2": pr.name,
+		}, update_modified=False)
+		add_comment(
+			frappe._dict(doctype="Asosiy panel", name=transfer.asosiy_panel),
+			"Info",
+			_("2. Purchase Receipt {0} created as DRAFT (Target Company: {1}). Please review and submit manually.").format(
+				f'<a href="/app/purchase-receipt/{pr.name}">{pr.name}</a>', transfer.target_company
+			),
+		)
+
+	return "Waiting"
+
+
+def _run_purchase_invoice_hop(transfer):
+	existing = transfer.purchase_invoice or frappe.db.get_value(
+		"Purchase Invoice", {"docstatus": 1, "custom_purchase_receipt_ref": transfer.purchase_receipt}, "name"
+	)
+	if not existing:
+		pr = frappe.get_doc("Purchase Receipt", transfer.purchase_receipt)
+		pi = make_purchase_invoice_from_receipt(pr, flags={"inter_company_transfer": transfer.name})
+		existing = pi.name
+
+	transfer.purchase_invoice = existing
+	_set_hop(transfer, HOP_PURCHASE_INVOICE, "Done", document_name=existing)
+	return "Done"
+
+
+def _run_sales_invoice_hop(transfer):
+	existing = transfer.sales_invoice or _get_sales_invoice_of_delivery_note(transfer.delivery_note)
+	if not existing:
+		dn = frappe.get_doc("Delivery Note", transfer.delivery_note)
+		si = make_sales_invoice_from_delivery_note(dn, submit=False)
+		si.inter_company_invoice_reference = transfer.purchase_invoice
+		si.submit()
+		existing = si.name
+
+	# SI <-> PI pairing
+	frappe.db.set_value(
+		"Purchase Invoice", transfer.purchase_invoice, "inter_company_invoice_reference", existing
+	)
+
+	transfer.sales_invoice = existing
+	_set_hop(transfer, HOP_SALES_INVOICE, "Done", document_name=existing)
+	return "Done"
+
+
+def _get_sales_invoice_of_delivery_note(delivery_note):
+	"""Submitted SI billing the DN, matched on its rows (consolidated SIs have no header ref)."""
+	result = frappe.db.sql(
+		"""
+		SELECT si.name
+		FROM `tabSales Invoice Item` sii
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+		WHERE sii.delivery_note = %(delivery_note)s
+			AND si.docstatus = 1
+			AND si.is_return = 0
+		LIMIT 1
+		""",
+		{"delivery_note": delivery_note},
+	)
+	return result[0][0] if result else None
+
+
+# ============================================================
+# BATCH ADVANCE / QUEUE VIEW
+# ============================================================
+
+def advance_pending_transfers(limit=BATCH_SIZE):
+	"""
+	Scheduler job: re-queue transfers that can move.
+
+	  - Pending / Failed below MAX_ATTEMPTS
+	  - Queued for longer than JOB_TIMEOUT: the job was lost (worker killed
+	    before it could record a failure); counts as an attempt, and the
+	    transfer is marked Failed once MAX_ATTEMPTS is reached
+	  - Waiting whose draft Purchase Receipt has been submitted meanwhile
+	"""
+	rows = frappe.db.sql(
+		"""
+		SELECT t.name, t.status, t.attempts
+		FROM `tabInter-Company Transfer` t
+		LEFT JOIN `tabPurchase Receipt` pr ON pr.name = t.purchase_receipt
+		WHERE (
+				t.status = 'Pending'
+				OR (t.status = 'Queued' AND IFNULL(t.last_run, t.modified) < %(lost_before)s)
+				OR (t.status = 'Failed' AND t.attempts < %(max_attempts)s)
+				OR (t.status = 'Waiting' AND pr.docstatus = 1)
+			)
+		ORDER BY t.modified
+		LIMIT %(limit)s
+		""",
+		{
+			"lost_before": add_to_date(now_datetime(), seconds=-JOB_TIMEOUT),
+			"max_attempts": MAX_ATTEMPTS,
+			"limit": cint(limit) or BATCH_SIZE,
+		},
+		as_dict=True,
+	)
+
+	names = []
+	for row in rows:
+		if row.status == "Queued" and not _retry_lost_job(row):
+			continue
+		enqueue_advance(row.name)
+		names.append(row.name)
+
+	return names
+
+
+def _retry_lost_job(row):
+	"""Count a lost job as an attempt; False (and Failed) once MAX_ATTEMPTS is reached."""
+	attempts = cint(row.attempts) + 1
+	if attempts >= MAX_ATTEMPTS:
+		frappe.db.set_value(DOCTYPE, row.name, {
+			"status": "Failed",
+			"attempts": attempts,
+			"last_error": _("Background job lost {0} times (worker stopped before finishing)").format(attempts),
+		})
+		return False
+
+	frappe.db.set_value(DOCTYPE, row.name, "attempts", attempts, update_modified=False)
+	return True
+
+
+@frappe.whitelist()
+def advance_transfers(names):
+	"""List view bulk action: queue the selected transfers."""
+	frappe.only_for(("System Manager", "Accounts Manager"))
+
+	queued = []
+	for name in frappe.parse_json(names) or []:
+		status = frappe.db.get_value(DOCTYPE, name, "status")
+		if status and status not in ("Completed", "Cancelled"):
+			enqueue_advance(name)
+			queued.append(name)
+	return queued
+
+
+@frappe.whitelist()
+def get_stuck_transfers(hours=STUCK_AFTER_HOURS):
+	"""
+	Transfers not completed and not touched for `hours`, oldest first.
+
+	Returns:
+		list[dict]: name, status, current_hop, delivery_note, purchase_receipt,
+		            source_company, target_company, attempts, last_error, modified
+	"""
+	cutoff = add_to_date(now_datetime(), hours=-(cint(hours) or STUCK_AFTER_HOURS))
+	return frappe.get_all(
+		DOCTYPE,
+		filters={
+			"status": ["not in", ["Completed", "Cancelled"]],
+			"modified": ["<", cutoff],
+		},
+		fields=[
+			"name", "status", "current_hop", "delivery_note", "purchase_receipt",
+			"source_company", "target_company", "attempts", "last_error", "modified",
+		],
+		order_by="modified asc",
+	)
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _get_internal_supplier(source_company, target_company):
+	"""Supplier in the target company that represents the source company."""
+	supplier = frappe.db.get_value(
+		"Supplier",
+		{"represents_company": source_company, "is_internal_supplier": 1},
+		"name",
+	)
+	if not supplier:
+		frappe.throw(
+			_("Please setup an Internal Supplier in {0} that represents {1}").format(
+				target_company, source_company
+			)
+		)
+	return supplier
+
+
+def _get_hop(transfer, hop):
+	for row in transfer.hops:
+		if row.hop == hop:
+			return row
+	return transfer.append("hops", {"hop": hop, "status": "Pending"})
+
+
+def _set_hop(transfer, hop, status, document_name=None, started=False, finished=False):
+	row = _get_hop(transfer, hop)
+	row.status = status
+	if document_name:
+		row.document_type = hop
+		row.document_name = document_name
+		transfer.set(HOP_FIELDS[hop], document_name)
+	if started:
+		row.started_at = now_datetime()
+		row.error = None
+	if finished:
+		row.finished_at = now_datetime()
+	return row
+
+
+def _record_failure(transfer_name, hop, error):
+	transfer = frappe.get_doc(DOCTYPE, transfer_name)
+	row = _set_hop(transfer, hop, "Failed")
+	row.error = error
+	transfer.current_hop = hop
+	transfer.status = "Failed"
+	transfer.attempts = cint(transfer.attempts) + 1
+	transfer.last_error = error
+	transfer.last_run = now_datetime()
+	_save(transfer)
+	frappe.db.commit()
+
+
+def _save(transfer):
+	transfer.flags.ignore_permissions = True
+	transfer.save()
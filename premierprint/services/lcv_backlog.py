@@ -0,0 +1,231 @@
+"""
+LCV Backlog Reprocessing
+========================
+Bulk counterpart of lcv_trigger.reprocess_lcv().
+
+After an outage (worker down, missing Supplier/Item, etc.) submitted Purchase
+Invoices can be left with custom_transport_cost > 0 and no Transport LCV.
+This module finds all of them with a single anti-join and re-runs the transport
+pipeline in chunks on the "long" queue, so several workers process the backlog
+in parallel.
+
+Per-PI results are collected in a Redis hash keyed by batch id and can be read
+back with get_reprocess_status().
+
+Usage:
+	bench --site <site> reprocess-transport-lcv --dry-run
+	bench --site <site> reprocess-transport-lcv --chunk-size 25
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime
+
+DEFAULT_CHUNK_SIZE = 20
+RESULT_CACHE_KEY = "premierprint:lcv_reprocess:{0}"
+RESULT_TTL = 7 * 24 * 60 * 60  # 1 hafta
+
+
+def get_pis_missing_transport_lcv(company=None, from_date=None, to_date=None, limit=None):
+	"""
+	Return submitted PIs with custom_transport_cost > 0 and no live LCV.
+
+	One LEFT JOIN ... IS NULL query; cancelled LCVs (docstatus = 2) do not count
+	as coverage, drafts do (they are picked up by the pipeline's duplicate guard).
+
+	Returns:
+		list[dict]: name, company, posting_date, custom_transport_cost, custom_lcv_currency
+	"""
+	conditions = []
+	values = {}
+
+	if company:
+		conditions.append("AND pi.company = %(company)s")
+		values["company"] = company
+	if from_date:
+		conditions.append("AND pi.posting_date >= %(from_date)s")
+		values["from_date"] = from_date
+	if to_date:
+		conditions.append("AND pi.posting_date <= %(to_date)s")
+		values["to_date"] = to_date
+
+	limit_clause = ""
+	if cint(limit) > 0:
+		limit_clause = "LIMIT %(limit)s"
+		values["limit"] = cint(limit)
+
+	return frappe.db.sql(
+		"""
+		SELECT
+			pi.name,
+			pi.company,
+			pi.posting_date,
+			pi.custom_transport_cost,
+			pi.custom_lcv_currency
+		FROM `tabPurchase Invoice` pi
+		LEFT JOIN `tabLanded Cost Voucher` lcv
+			ON lcv.custom_purchase_invoice = pi.name
+			AND lcv.docstatus < 2
+		WHERE pi.docstatus = 1
+			AND pi.custom_transport_cost > 0
+			AND lcv.name IS NULL
+			{conditions}
+		ORDER BY pi.posting_date, pi.name
+		{limit_clause}
+		""".format(conditions=" ".join(conditions), limit_clause=limit_clause),
+		values,
+		as_dict=True,
+	)
+
+
+@frappe.whitelist()
+def reprocess_missing_lcvs(
+	dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, company=None, from_date=None, to_date=None, limit=None
+):
+	"""
+	Find PIs missing their Transport LCV and enqueue them in chunks.
+
+	Args:
+		dry_run   : Only list the candidates, nothing is created or enqueued
+		chunk_size: Number of PIs handled by one background job
+		company, from_date, to_date, limit: Optional candidate filters
+
+	Returns:
+		dict: {"batch_id", "dry_run", "count", "chunks", "purchase_invoices"}
+	"""
+	frappe.only_for(("System Manager", "Accounts Manager"))
+
+	dry_run = cint(dry_run)
+	chunk_size = max(cint(chunk_size) or DEFAULT_CHUNK_SIZE, 1)
+
+	candidates = get_pis_missing_transport_lcv(
+		company=company, from_date=from_date, to_date=to_date, limit=limit
+	)
+	pi_names = [row.name for row in candidates]
+	chunks = [pi_names[i : i + chunk_size] for i in range(0, len(pi_names), chunk_size)]
+
+	result = {
+		"batch_id": None,
+		"dry_run": dry_run,
+		"count": len(pi_names),
+		"chunks": len(chunks),
+		"purchase_invoices": candidates,
+	}
+
+	if dry_run or not pi_names:
+		return result
+
+	batch_id = frappe.generate_hash(length=10)
+	result["batch_id"] = batch_id
+
+	for idx, chunk in enumerate(chunks):
+		frappe.enqueue(
+			"premierprint.services.lcv_backlog.process_chunk",
+			queue="long",
+			timeout=3600,
+			job_id=f"lcv_reprocess::{batch_id}::{idx}",
+			enqueue_after_commit=True,
+			batch_id=batch_id,
+			pi_names=chunk,
+		)
+
+	frappe.logger().info(
+		f"LCV reprocess batch {batch_id}: {len(pi_names)} PI(s) in {len(chunks)} chunk(s) enqueued"
+	)
+	return result
+
+
+def process_chunk(batch_id, pi_names):
+	"""
+	Background job: re-run the transport pipeline for each PI of the chunk.
+
+	Each PI is isolated — a failure is rolled back and recorded, the next PI
+	continues. The pipeline itself commits after Carrier PI and LCV submit, so a
+	failed LCV step leaves the Carrier PI in place: that is recorded as
+	"LCV Failed" with the Carrier PI, and the next run reuses it
+	(transport_lcv.get_carrier_pi) instead of creating another one.
+	"""
+	from premierprint.services.lcv_trigger import reprocess_lcv
+
+	results = {}
+	for pi_name in pi_names:
+		try:
+			outcome = reprocess_lcv(pi_name, lcv_type="Transport")
+			lcv_name = frappe.db.get_value(
+				"Landed Cost Voucher",
+				{"custom_purchase_invoice": pi_name, "docstatus": 1},
+				"name",
+			)
+			if outcome.get("errors") or not lcv_name:
+				frappe.db.rollback()
+				results[pi_name] = _failed_result(
+					pi_name,
+					"; ".join(outcome.get("errors") or []) or _("LCV was not created"),
+				)
+			else:
+				frappe.db.commit()
+				results[pi_name] = _result("Success", lcv=lcv_name)
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(
+				message=frappe.get_traceback(),
+				title=f"Bulk LCV Reprocess Failed: {pi_name}",
+			)
+			results[pi_name] = _failed_result(pi_name, str(e))
+
+		_store_result(batch_id, pi_name, results[pi_name])
+
+	return results
+
+
+@frappe.whitelist()
+def get_reprocess_status(batch_id):
+	"""
+	Return per-PI results recorded so far for a reprocess batch.
+
+	Returns:
+		dict: {"batch_id", "processed", "success", "failed", "lcv_failed",
+		       "results": {pi: {...}}}; "LCV Failed" = Carrier PI created, LCV not
+	"""
+	raw = frappe.cache().hgetall(_cache_key(batch_id)) or {}
+	results = {frappe.safe_decode(pi_name): value for pi_name, value in raw.items()}
+
+	return {
+		"batch_id": batch_id,
+		"processed": len(results),
+		"success": sum(1 for r in results.values() if r.get("status") == "Success"),
+		"failed": sum(1 for r in results.values() if r.get("status") == "Failed"),
+		"lcv_failed": sum(1 for r in results.values() if r.get("status") == "LCV Failed"),
+		"results": results,
+	}
+
+
+def _result(status, lcv=None, error=None, carrier_pi=None):
+	return {
+		"status": status,
+		"lcv": lcv,
+		"carrier_pi": carrier_pi,
+		"error": error,
+		"processed_at": str(now_datetime()),
+	}
+
+
+def _failed_result(pi_name, error):
+	# The Carrier PI is committed before the LCV step, so it survives the rollback
+	carrier_pi = frappe.db.get_value(
+		"Purchase Invoice", {"custom_transport_source_pi": pi_name, "docstatus": 1}, "name"
+	)
+	if carrier_pi:
+		return _result("LCV Failed", error=error, carrier_pi=carrier_pi)
+	return _result("Failed", error=error)
+
+
+def _cache_key(batch_id):
+	return RESULT_CACHE_KEY.format(batch_id)
+
+
+def _store_result(batch_id, pi_name, result):
+	cache = frappe.cache()
+	key = _cache_key(batch_id)
+	cache.hset(key, pi_name, result)
+	cache.expire(cache.make_key(key), RESULT_TTL)
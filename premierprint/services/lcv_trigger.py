@@ -260,6 +260,10 @@ def _auto_fill_transport_from_po(doc, method):
 # UTILITY FUNCTIONS FOR EXTERNAL CALLS
 # ============================================================
 
+LCV_STATUS_LABELS = {0: "Draft", 1: "Submitted", 2: "Cancelled"}
+
+
+@frappe.whitelist()
 def get_lcv_summary(pi_name):
 	"""
 	Get summary of all LCVs linked to a Purchase Invoice.
@@ -270,44 +274,145 @@ def get_lcv_summary(pi_name):
 	Returns:
 		dict: Summary information
 	"""
+	return get_lcv_summaries([pi_name])[pi_name]
 
-	lcvs = frappe.get_all(
-		"Landed Cost Voucher",
-		filters={"custom_purchase_invoice": pi_name},
-		fields=["name", "custom_lcv_type", "docstatus", "posting_date"],
-		order_by="creation desc"
-	)
 
-	total_amount = 0.0
-
-	for lcv in lcvs:
-		# Get total amount from taxes
-		taxes_total = frappe.db.sql("""
-			SELECT SUM(amount) as total
-			FROM `tabLanded Cost Taxes and Charges`
-			WHERE parent = %s
-		""", lcv.name, as_dict=True)
-
-		if taxes_total and taxes_total[0].total:
-			lcv['total_amount'] = flt(taxes_total[0].total, 2)
-			total_amount += lcv['total_amount']
-		else:
-			lcv['total_amount'] = 0.0
-
-		# Status label
-		if lcv.docstatus == 0:
-			lcv['status_label'] = "Draft"
-		elif lcv.docstatus == 1:
-			lcv['status_label'] = "Submitted"
-		else:
-			lcv['status_label'] = "Cancelled"
-
-	return {
-		"purchase_invoice": pi_name,
-		"lcv_count": len(lcvs),
-		"total_lcv_amount": flt(total_amount, 2),
-		"lcvs": lcvs
+@frappe.whitelist()
+def get_lcv_summaries(pi_names):
+	"""
+	LCV summary for one or many Purchase Invoices in a single grouped join.
+
+	Used by list-view indicators: totals only count submitted LCVs,
+	drafts/cancelled ones are still listed per PI. Throws PermissionError
+	unless the user can read every Purchase Invoice asked for.
+
+	Args:
+		pi_names: list of Purchase Invoice names (or JSON string)
+
+	Returns:
+		dict: {pi_name: {purchase_invoice, lcv_count, submitted_count,
+		                 total_lcv_amount, lcvs: [...]}}
+	"""
+	pi_names = frappe.parse_json(pi_names) if isinstance(pi_names, str) else pi_names
+	if isinstance(pi_names, str):
+		pi_names = [pi_names]
+	pi_names = list(dict.fromkeys(pi_names or []))
+	for pi_name in pi_names:
+		frappe.has_permission("Purchase Invoice", "read", pi_name, throw=True)
+
+	summaries = {
+		pi_name: {
+			"purchase_invoice": pi_name,
+			"lcv_count": 0,
+			"submitted_count": 0,
+			"total_lcv_amount": 0.0,
+			"lcvs": [],
+		}
+		for pi_name in pi_names
 	}
+	if not pi_names:
+		return summaries
+
+	rows = frappe.db.sql("""
+		SELECT
+			lcv.custom_purchase_invoice AS purchase_invoice,
+			lcv.name,
+			lcv.docstatus,
+			lcv.posting_date,
+			COALESCE(SUM(tax.amount), 0) AS total_amount
+		FROM `tabLanded Cost Voucher` lcv
+		LEFT JOIN `tabLanded Cost Taxes and Charges` tax
+			ON tax.parent = lcv.name
+			AND tax.parenttype = 'Landed Cost Voucher'
+		WHERE lcv.custom_purchase_invoice IN %(pi_names)s
+		GROUP BY lcv.name, lcv.custom_purchase_invoice, lcv.docstatus, lcv.posting_date, lcv.creation
+		ORDER BY lcv.creation DESC
+	""", {"pi_names": pi_names}, as_dict=True)
+
+	for row in rows:
+		summary = summaries[row.purchase_invoice]
+		row.total_amount = flt(row.total_amount, 2)
+		row.status_label = LCV_STATUS_LABELS.get(row.docstatus, "Unknown")
+		summary["lcvs"].append(row)
+		summary["lcv_count"] += 1
+		if row.docstatus == 1:
+			summary["submitted_count"] += 1
+			summary["total_lcv_amount"] = flt(summary["total_lcv_amount"] + row.total_amount, 2)
+
+	return summaries
+
+
+@frappe.whitelist()
+def get_lcv_coverage(company=None, from_date=None, to_date=None):
+	"""
+	Dashboard data: how many purchases carry transport cost and how many of
+	them are covered by a submitted LCV, per company.
+
+	One query: PIs LEFT JOIN a per-PI aggregate of submitted LCV charges.
+
+	Needs read access to Purchase Invoice; users restricted to some
+	companies (User Permission) only see those.
+
+	Returns:
+		list[dict]: company, purchase_invoices, with_transport, covered,
+		            missing, lcv_amount (company currency)
+	"""
+	from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+
+	frappe.has_permission("Purchase Invoice", "read", throw=True)
+	allowed_companies = [perm.get("doc") for perm in get_user_permissions().get("Company", [])]
+	if company and allowed_companies and company not in allowed_companies:
+		frappe.throw(
+			_("Not permitted to view LCV coverage of company {0}").format(company),
+			frappe.PermissionError,
+		)
+
+	conditions = []
+	values = {}
+	if company:
+		conditions.append("AND pi.company = %(company)s")
+		values["company"] = company
+	elif allowed_companies:
+		conditions.append("AND pi.company IN %(companies)s")
+		values["companies"] = tuple(allowed_companies)
+	if from_date:
+		conditions.append("AND pi.posting_date >= %(from_date)s")
+		values["from_date"] = from_date
+	if to_date:
+		conditions.append("AND pi.posting_date <= %(to_date)s")
+		values["to_date"] = to_date
+
+	rows = frappe.db.sql("""
+		SELECT
+			pi.company,
+			COUNT(*) AS purchase_invoices,
+			SUM(CASE WHEN pi.custom_transport_cost > 0 THEN 1 ELSE 0 END) AS with_transport,
+			SUM(CASE WHEN pi.custom_transport_cost > 0 AND lcv.purchase_invoice IS NOT NULL
+				THEN 1 ELSE 0 END) AS covered,
+			SUM(CASE WHEN pi.custom_transport_cost > 0 AND lcv.purchase_invoice IS NULL
+				THEN 1 ELSE 0 END) AS missing,
+			SUM(IFNULL(lcv.amount, 0)) AS lcv_amount
+		FROM `tabPurchase Invoice` pi
+		LEFT JOIN (
+			SELECT l.custom_purchase_invoice AS purchase_invoice, SUM(tax.amount) AS amount
+			FROM `tabLanded Cost Voucher` l
+			INNER JOIN `tabLanded Cost Taxes and Charges` tax
+				ON tax.parent = l.name
+				AND tax.parenttype = 'Landed Cost Voucher'
+			WHERE l.docstatus = 1
+				AND IFNULL(l.custom_purchase_invoice, '') != ''
+			GROUP BY l.custom_purchase_invoice
+		) lcv ON lcv.purchase_invoice = pi.name
+		WHERE pi.docstatus = 1
+			{conditions}
+		GROUP BY pi.company
+		ORDER BY pi.company
+	""".format(conditions=" ".join(conditions)), values, as_dict=True)
+
+	for row in rows:
+		row.lcv_amount = flt(row.lcv_amount, 2)
+
+	return rows
 
 
 def reprocess_lcv(pi_name, lcv_type=None):
@@ -1,169 +1,199 @@
+from typing import NamedTuple
+
 import frappe
 from frappe import _
-from frappe.utils import flt, nowdate
+from frappe.utils import flt, getdate, nowdate
+
+from premierprint.services.company_context import get_company_context
+
+# custom_lcv_exchange_rate is always entered the way people read it on the
+# CBU board: "1 USD = 12 099.18 UZS" — so'm per one unit of the other currency.
+LCV_QUOTE_CURRENCY = "UZS"
+
+# Migration validator thresholds (see validate_rate_quote)
+RATE_TOLERANCE = 0.10  # 10% => same direction
+INVERSE_THRESHOLD = 100  # >100x apart => the quote is the reciprocal
+
+
+class RateQuote(NamedTuple):
+	"""
+	Explicit exchange rate quote: 1 base_currency = value quote_currency.
+
+	Carries the direction with the number, so conversion is plain arithmetic
+	and never depends on today's Currency Exchange table.
+
+	Examples:
+		RateQuote(12099.18, "USD", "UZS").convert(50000, "UZS", "USD")  # -> 4.13
+		RateQuote(12099.18, "USD", "UZS").rate("UZS", "USD")            # -> 0.0000826
+	"""
+
+	value: float
+	base_currency: str
+	quote_currency: str
+
+	def rate(self, from_currency, to_currency):
+		"""Multiplier for from_currency -> to_currency (ERPNext conversion_rate semantics)."""
+		if from_currency == to_currency:
+			return 1.0
+		if flt(self.value) <= 0:
+			frappe.throw(_("Exchange rate must be greater than 0 ({0})").format(self.describe()))
+		if (from_currency, to_currency) == (self.base_currency, self.quote_currency):
+			return flt(self.value)
+		if (from_currency, to_currency) == (self.quote_currency, self.base_currency):
+			return 1.0 / flt(self.value)
+		frappe.throw(
+			_("Rate {0} cannot convert {1} to {2}").format(self.describe(), from_currency, to_currency)
+		)
+
+	def convert(self, amount, from_currency, to_currency):
+		"""Convert amount from_currency -> to_currency."""
+		return flt(amount) * self.rate(from_currency, to_currency)
+
+	def describe(self):
+		return "1 {0} = {1} {2}".format(self.base_currency, flt(self.value, 6), self.quote_currency)
+
+
+def make_lcv_rate_quote(exchange_rate, transport_currency, company_currency):
+	"""
+	Build the RateQuote for Purchase Invoice.custom_lcv_exchange_rate.
+
+	The field is quoted in LCV_QUOTE_CURRENCY (so'm) per one unit of the other
+	currency of the pair. When neither side is so'm the field is read with
+	ERPNext semantics: 1 transport_currency = N company_currency.
+	"""
+	if LCV_QUOTE_CURRENCY in (transport_currency, company_currency) and transport_currency != company_currency:
+		base_currency = company_currency if transport_currency == LCV_QUOTE_CURRENCY else transport_currency
+		return RateQuote(flt(exchange_rate), base_currency, LCV_QUOTE_CURRENCY)
+
+	return RateQuote(flt(exchange_rate), transport_currency, company_currency)
+
 
 def convert_to_company_currency(amount, from_currency, to_currency, conversion_rate):
 	"""
-	Smart Currency Conversion with Ambiguous Rate Detection.
-
-	This function intelligently handles both direct and indirect exchange rates by:
-	1. Fetching the system's official exchange rate from ERPNext
-	2. Comparing the input rate against the official rate
-	3. Determining if the input is a multiplier (direct) or divisor (indirect)
-	4. Applying the correct mathematical operation
-
-	SCENARIO A (Transport LCV - Indirect Rate):
-		- Input: 50,000 UZS with rate 12,099.18 (User model: 1 USD = 12,099 UZS)
-		- System Rate: 0.00008265 (Official: 1 UZS = 0.00008 USD)
-		- Detection: Input rate is ~146,000x larger than system rate
-		- Operation: DIVIDE (50,000 / 12,099.18 = ~4.13 USD) ✅
-
-	SCENARIO B (Variance LCV - Direct Rate):
-		- Input: 50,000 UZS with rate 0.00008265 (System model: 1 UZS = 0.00008 USD)
-		- System Rate: 0.00008265 (Official: 1 UZS = 0.00008 USD)
-		- Detection: Input rate matches system rate
-		- Operation: MULTIPLY (50,000 * 0.00008265 = ~4.13 USD) ✅
+	Convert amount between currencies with pure arithmetic (no DB lookups).
 
 	Args:
-		amount: Amount to convert
-		from_currency: Source currency code
-		to_currency: Target currency code
-		conversion_rate: Exchange rate (may be direct or indirect)
+		amount         : Amount to convert
+		from_currency  : Source currency code
+		to_currency    : Target currency code
+		conversion_rate: RateQuote, or a plain number with ERPNext semantics
+		                 (1 from_currency = N to_currency, i.e. multiply)
 
 	Returns:
 		float: Converted amount in target currency
 	"""
 	amount = flt(amount)
-	conversion_rate = flt(conversion_rate)
-
-	# Edge case: Invalid rate
-	if conversion_rate <= 0:
-		frappe.log_error(
-			message=f"Invalid conversion rate ({conversion_rate}) provided for {from_currency} -> {to_currency}. Using rate 1.0.",
-			title="Currency Conversion Warning"
-		)
-		conversion_rate = 1.0
 
 	# Same currency - no conversion needed
 	if from_currency == to_currency:
 		return amount
 
-	# ============================================================
-	# INTELLIGENT RATE DETECTION ALGORITHM
-	# ============================================================
-	try:
-		# Step 1: Fetch official system exchange rate from ERPNext
-		# This uses the same API that the UI uses (erpnext.setup.utils.get_exchange_rate)
-		from erpnext.setup.utils import get_exchange_rate
-
-		official_rate = None
-		try:
-			official_rate = get_exchange_rate(
-				from_currency=from_currency,
-				to_currency=to_currency,
-				transaction_date=nowdate()
-			)
-		except Exception:
-			# Try reverse lookup if direct lookup fails
-			try:
-				reverse_rate = get_exchange_rate(
-					from_currency=to_currency,
-					to_currency=from_currency,
-					transaction_date=nowdate()
-				)
-				if reverse_rate and reverse_rate > 0:
-					official_rate = 1.0 / reverse_rate
-			except Exception:
-				pass
-
-		if not official_rate or official_rate <= 0:
-			# Last resort: Use input rate as-is with multiplication
+	if not isinstance(conversion_rate, RateQuote):
+		rate = flt(conversion_rate)
+		if rate <= 0:
 			frappe.log_error(
-				message=f"No official exchange rate found for {from_currency} -> {to_currency}. Using input rate {conversion_rate} directly.",
-				title="Currency Rate Fallback"
+				message=f"Invalid conversion rate ({conversion_rate}) provided for {from_currency} -> {to_currency}. Using rate 1.0.",
+				title="Currency Conversion Warning"
 			)
-			return amount * conversion_rate
-
-		# Step 2: Calculate deviation ratio between input rate and official rate
-		# This tells us if the user passed an inverse rate
-		deviation_ratio = conversion_rate / official_rate if official_rate != 0 else 1.0
-
-		# Step 3: Also check inverse deviation (official / input)
-		# This helps detect when the input is the reciprocal
-		inverse_deviation_ratio = official_rate / conversion_rate if conversion_rate != 0 else 1.0
-
-		# Step 4: Determine the operation based on deviation
-		# LOGIC:
-		# - If deviation_ratio ≈ 1 (within 10% tolerance): Input is DIRECT → MULTIPLY
-		# - If deviation_ratio >> 1 (>100x): Input is INDIRECT (inverse) → DIVIDE
-		# - If inverse_deviation_ratio ≈ 1 (within 10%): Input is already inverse → DIVIDE
-
-		TOLERANCE = 0.10  # 10% tolerance for "same rate"
-		INVERSE_THRESHOLD = 100  # If >100x different, it's inverse
-
-		if abs(deviation_ratio - 1.0) < TOLERANCE:
-			# Case 1: Input rate matches official rate (within tolerance) → Direct multiplication
-			# Example: Input 0.00008265 matches Official 0.00008265
-			operation = "multiply"
-			result = amount * conversion_rate
-
-		elif deviation_ratio > INVERSE_THRESHOLD:
-			# Case 2: Input rate is way larger than official → User passed inverse rate
-			# Example: Input 12,099 vs Official 0.00008265 → ratio ~146,000,000x
-			# This means user input is (1 / official_rate), so we need to divide
-			operation = "divide"
-			result = amount / conversion_rate
-
-		elif inverse_deviation_ratio > INVERSE_THRESHOLD:
-			# Case 3: Official rate is way larger than input → Input is already inverted
-			# Rare case, but handle it
-			operation = "divide"
-			result = amount / conversion_rate
-
-		else:
-			# Case 4: Moderate deviation - analyze currency strength
-			# For weak->strong conversion (like UZS->USD), official rate should be small (<1)
-			# If input rate is large (>1), it's likely inverse
-			if official_rate < 1.0 and conversion_rate > 1.0:
-				# Official expects small multiplier, input gave large divisor
-				operation = "divide"
-				result = amount / conversion_rate
-			elif official_rate > 1.0 and conversion_rate < 1.0:
-				# Official expects large multiplier, input gave small multiplier (inverted)
-				operation = "divide"
-				result = amount / conversion_rate
-			else:
-				# Default to multiplication if uncertain
-				operation = "multiply"
-				result = amount * conversion_rate
-
-		# Log the decision for audit trail
-		frappe.logger().debug(
-			f"Currency Conversion: {amount} {from_currency} -> {to_currency} | "
-			f"Input Rate: {conversion_rate} | Official Rate: {official_rate} | "
-			f"Deviation: {deviation_ratio:.2f}x | Operation: {operation.upper()} | "
-			f"Result: {result:.2f}"
-		)
+			rate = 1.0
+		conversion_rate = RateQuote(rate, from_currency, to_currency)
 
-		return flt(result, 2)
+	return flt(conversion_rate.convert(amount, from_currency, to_currency), 2)
+
+
+# ============================================================
+# MIGRATION VALIDATOR
+# The old "smart" detection compared the input rate with the official ERPNext
+# rate on every conversion. It now only runs here, to audit historical data.
+# ============================================================
+
+def validate_rate_quote(quote, from_currency, to_currency, on_date=None):
+	"""
+	Compare a RateQuote with the official ERPNext rate for the same date.
+
+	Returns:
+		dict: {status: "ok" | "inverse" | "mismatch" | "no_official_rate",
+		       implied_rate, official_rate, deviation}
+	"""
+	from erpnext.setup.utils import get_exchange_rate
+
+	implied_rate = quote.rate(from_currency, to_currency)
+	official_rate = flt(
+		get_exchange_rate(from_currency, to_currency, transaction_date=on_date or nowdate())
+	)
+
+	result = {
+		"status": "no_official_rate",
+		"implied_rate": implied_rate,
+		"official_rate": official_rate,
+		"deviation": None,
+	}
+	if official_rate <= 0 or implied_rate <= 0:
+		return result
+
+	deviation = implied_rate / official_rate
+	result["deviation"] = deviation
+
+	if abs(deviation - 1.0) < RATE_TOLERANCE:
+		result["status"] = "ok"
+	elif deviation > INVERSE_THRESHOLD or deviation < 1.0 / INVERSE_THRESHOLD:
+		result["status"] = "inverse"
+	else:
+		result["status"] = "mismatch"
+
+	return result
+
+
+def find_rate_direction_mismatches(from_date=None, to_date=None, company=None):
+	"""
+	Audit submitted PIs whose custom_lcv_exchange_rate reads differently under
+	make_lcv_rate_quote() than the official rate of their posting date suggests.
+
+	Run once after upgrading:
+		bench --site <site> execute premierprint.services.lcv_utils.find_rate_direction_mismatches
+
+	Returns:
+		list[dict]: PIs with status "inverse" or "mismatch"
+	"""
+	conditions = []
+	values = {}
+	if from_date:
+		conditions.append("AND pi.posting_date >= %(from_date)s")
+		values["from_date"] = from_date
+	if to_date:
+		conditions.append("AND pi.posting_date <= %(to_date)s")
+		values["to_date"] = to_date
+	if company:
+		conditions.append("AND pi.company = %(company)s")
+		values["company"] = company
+
+	invoices = frappe.db.sql("""
+		SELECT pi.name, pi.posting_date, pi.custom_lcv_currency,
+			pi.custom_lcv_exchange_rate, c.default_currency AS company_currency
+		FROM `tabPurchase Invoice` pi
+		INNER JOIN `tabCompany` c ON c.name = pi.company
+		WHERE pi.docstatus = 1
+			AND pi.custom_transport_cost > 0
+			AND pi.custom_lcv_exchange_rate > 0
+			AND pi.custom_lcv_currency != c.default_currency
+			{conditions}
+		ORDER BY pi.posting_date
+	""".format(conditions=" ".join(conditions)), values, as_dict=True)
+
+	checked = {}
+	mismatches = []
+	for pi in invoices:
+		quote = make_lcv_rate_quote(pi.custom_lcv_exchange_rate, pi.custom_lcv_currency, pi.company_currency)
+		key = (quote, pi.custom_lcv_currency, pi.company_currency, getdate(pi.posting_date))
+		if key not in checked:
+			checked[key] = validate_rate_quote(quote, pi.custom_lcv_currency, pi.company_currency, pi.posting_date)
+
+		result = checked[key]
+		if result["status"] in ("inverse", "mismatch"):
+			mismatches.append({"purchase_invoice": pi.name, "rate": quote.describe(), **result})
+
+	return mismatches
 
-	except ImportError:
-		# Fallback: ERPNext not available (unlikely in production)
-		frappe.log_error(
-			message="ERPNext setup.utils not available. Using simple multiplication.",
-			title="Currency Conversion Fallback"
-		)
-		return amount * conversion_rate
-
-	except Exception as e:
-		# Unexpected error - log and use safe fallback
-		frappe.log_error(
-			message=f"Currency conversion error: {str(e)}\n"
-			        f"Amount: {amount}, From: {from_currency}, To: {to_currency}, Rate: {conversion_rate}",
-			title="Currency Conversion Error"
-		)
-		# Safe fallback: assume input rate is correct for multiplication
-		return amount * conversion_rate
 
 def get_stock_received_but_not_billed_account(company):
 	"""
@@ -192,55 +222,14 @@ def get_transport_expense_account(company):
 	"""
 	Return the "Expenses Included In Valuation - {abbr}" account for the company.
 
-	Lookup strategy (most reliable first):
-	  1. Use ERPNext's built-in Company field 'expenses_included_in_valuation' if set.
-	  2. Construct the canonical name: "Expenses Included In Valuation - {abbr}"
-	     and verify it exists in the Account master.
-	  3. Fall back to account_type = "Expense Account" with LIKE search.
-	  4. Hard-throw — never return a wrong account silently.
+	Resolved once per company by company_context (Company field, canonical name,
+	account_name match, LIKE fallback) and served from cache afterwards.
+	Hard-throws — never returns a wrong account silently.
 
 	CRITICAL: This account MUST be used for BOTH the Carrier PI item and the LCV
 	          applicable charges row. Using any other account breaks stock valuation.
 	"""
-	# 1. Company master field (fastest, most reliable)
-	account = frappe.get_cached_value("Company", company, "expenses_included_in_valuation")
-	if account and frappe.db.exists("Account", account):
-		return account
-
-	# 2. Canonical name lookup using company abbreviation
-	abbr = frappe.get_cached_value("Company", company, "abbr")
-	if abbr:
-		canonical_name = "Expenses Included In Valuation - {}".format(abbr)
-		if frappe.db.exists("Account", canonical_name):
-			return canonical_name
-
-	# 3. account_name exact match + company filter (covers renamed accounts)
-	account = frappe.db.get_value(
-		"Account",
-		filters={
-			"account_name": "Expenses Included In Valuation",
-			"company": company,
-			"is_group": 0,
-			"disabled": 0,
-		},
-		fieldname="name",
-	)
-	if account:
-		return account
-
-	# 4. account_type fallback (last resort — account may have been renamed)
-	account = frappe.db.get_value(
-		"Account",
-		filters={
-			"account_type": "Expense Account",
-			"account_name": ["like", "%Expenses Included%"],
-			"company": company,
-			"is_group": 0,
-			"disabled": 0,
-		},
-		fieldname="name",
-		order_by="creation asc",
-	)
+	account = get_company_context(company).transport_expense_account
 	if account:
 		return account
 
@@ -8,9 +8,13 @@ Full pipeline:
 Custom Fields assumed on Purchase Invoice:
   - custom_transport_cost        : Float  — transport charge amount
   - custom_lcv_currency          : Link/Currency — "USD" or "UZS"
-  - custom_lcv_exchange_rate     : Float  — exchange rate for conversion
+  - custom_lcv_exchange_rate     : Float  — "1 USD = X UZS" style rate, see lcv_utils.make_lcv_rate_quote
   - custom_lcv_taqsimlash_usuli  : Select — "Qty" | "Amount" | "Distribute Manually"
-  - custom_transport_pi          : Data/Link — stores created Carrier PI name (duplicate guard)
+
+Custom Field on the Carrier PI:
+  - custom_transport_source_pi   : Link — the source PI (duplicate guard, see
+                                   get_carrier_pi; the Carrier PI is committed
+                                   before the LCV step, so a re-run reuses it)
 
 Supplier mapping (custom_lcv_currency):
   USD  ->  "Logistika Servis USD"
@@ -24,23 +28,28 @@ import frappe
 from frappe import _
 from frappe.utils import flt, nowdate
 
+from premierprint.services.company_context import CARRIER_SUPPLIERS, get_company_context
 from premierprint.services.lcv_utils import (
+    RateQuote,
     convert_to_company_currency,
     get_transport_expense_account,
+    make_lcv_rate_quote,
 )
+from premierprint.utils.instrumentation import span, traced
 
 
 # ---------------------------------------------------------------------------
 # PUBLIC ENTRY POINT
 # ---------------------------------------------------------------------------
 
+@traced("transport_lcv.run_transport_pipeline")
 def run_transport_pipeline(doc):
     """
     Main entry point called from lcv_trigger.on_submit().
 
     Steps:
       1. Guard: custom_transport_cost must be > 0
-      2. Duplicate guard: skip if Carrier PI already created for this PI
+      2. Duplicate guard: reuse the Carrier PI already created for this PI
       3. Create & submit Carrier PI
       4. Create & submit LCV
       5. Store Carrier PI name on original PI for audit trail
@@ -55,8 +64,8 @@ def run_transport_pipeline(doc):
     if transport_cost <= 0:
         return None  # Nothing to do - silent exit
 
-    # Duplicate guard — custom_transport_pi PI da yo'q, shuning uchun LCV orqali tekshiramiz
-    # (validate_transport_lcv_creation ichida existing LCV check bor)
+    # Duplicate guard: LCV — validate_transport_lcv_creation ichida existing LCV check bor;
+    # Carrier PI — get_carrier_pi (avvalgi urinishda LCV yiqilgan bo'lsa qayta ishlatiladi)
 
     # Fetch shared parameters
     transport_currency = doc.get("custom_lcv_currency")
@@ -67,18 +76,16 @@ def run_transport_pipeline(doc):
     if lcv_exchange_rate <= 0:
         frappe.throw(_("custom_lcv_exchange_rate must be > 0 to create the Transport PI."))
 
-    company_currency = frappe.get_cached_value("Company", doc.company, "default_currency")
+    company_currency = get_company_context(doc.company).default_currency
+    rate_quote = make_lcv_rate_quote(lcv_exchange_rate, transport_currency, company_currency)
 
     # Convert transport cost to company currency
-    if transport_currency == company_currency:
-        transport_amount_company = transport_cost
-    else:
-        transport_amount_company = convert_to_company_currency(
-            amount=transport_cost,
-            from_currency=transport_currency,
-            to_currency=company_currency,
-            conversion_rate=lcv_exchange_rate,
-        )
+    transport_amount_company = convert_to_company_currency(
+        amount=transport_cost,
+        from_currency=transport_currency,
+        to_currency=company_currency,
+        conversion_rate=rate_quote,
+    )
 
     # Purchase Receipts
     pr_list = get_purchase_receipts_from_pi(doc)
@@ -87,24 +94,26 @@ def run_transport_pipeline(doc):
             _("No Purchase Receipts linked to PI {0}. Cannot create Transport LCV.").format(doc.name)
         )
 
-    # Step 1: Carrier PI
-    carrier_pi_name = _create_carrier_pi(
-        original_pi=doc,
-        transport_cost=transport_cost,
-        transport_currency=transport_currency,
-        lcv_exchange_rate=lcv_exchange_rate,
-        company_currency=company_currency,
-    )
+    # Step 1: Carrier PI (reused when an earlier run failed at the LCV step)
+    with span("carrier_pi"):
+        carrier_pi_name = get_carrier_pi(doc.name) or _create_carrier_pi(
+            original_pi=doc,
+            transport_cost=transport_cost,
+            transport_currency=transport_currency,
+            rate_quote=rate_quote,
+            company_currency=company_currency,
+        )
 
     # Step 2: LCV
-    lcv_name = create_transport_lcv(
-        doc=doc,
-        pr_list=pr_list,
-        transport_amount=transport_amount_company,
-        original_amount=transport_cost,
-        original_currency=transport_currency,
-        exchange_rate=lcv_exchange_rate,
-    )
+    with span("lcv"):
+        lcv_name = create_transport_lcv(
+            doc=doc,
+            pr_list=pr_list,
+            transport_amount=transport_amount_company,
+            original_amount=transport_cost,
+            original_currency=transport_currency,
+            rate_quote=rate_quote,
+        )
 
     # Step 3: custom_transport_pi field PI da mavjud emas — skip
 
@@ -123,8 +132,32 @@ def run_transport_pipeline(doc):
 # STEP 1: CARRIER PURCHASE INVOICE
 # ---------------------------------------------------------------------------
 
+def get_carrier_pi(source_pi):
+    """
+    Carrier PI already created for `source_pi`, or None. A draft left by a
+    failed submit is submitted here, so the pipeline can continue with it.
+    """
+    carrier = frappe.db.get_value(
+        "Purchase Invoice",
+        {"custom_transport_source_pi": source_pi, "docstatus": ["<", 2]},
+        ["name", "docstatus"],
+        as_dict=True,
+        order_by="docstatus desc, creation desc",
+    )
+    if not carrier:
+        return None
+
+    if carrier.docstatus == 0:
+        carrier_pi = frappe.get_doc("Purchase Invoice", carrier.name)
+        carrier_pi.flags.ignore_permissions = True
+        carrier_pi.submit()
+        frappe.db.commit()
+
+    return carrier.name
+
+
 def _create_carrier_pi(
-    original_pi, transport_cost, transport_currency, lcv_exchange_rate, company_currency
+    original_pi, transport_cost, transport_currency, rate_quote, company_currency
 ):
     """
     Create and submit a Purchase Invoice for the transport carrier.
@@ -139,55 +172,17 @@ def _create_carrier_pi(
     Returns:
         str: Name of the created and submitted Carrier PI
     """
-    supplier = _get_carrier_supplier(transport_currency)
+    supplier = _get_carrier_supplier(original_pi.company, transport_currency)
     expense_account = get_transport_expense_account(original_pi.company)
 
     # ERPNext conversion_rate semantics:
     #   "1 unit of PI currency = N units of company currency"
     #
-    # User's lcv_exchange_rate is ALWAYS stored as:
-    #   "1 USD = X UZS"  (human-readable, strong-to-weak)
-    #   e.g. lcv_exchange_rate = 12,099.18
-    #
-    # Case A: PI currency = USD, company = UZS
-    #   -> 1 USD = 12,099 UZS -> conversion_rate = 12,099  ✅ use as-is
-    #
-    # Case B: PI currency = UZS, company = USD
-    #   -> 1 UZS = 1/12,099 USD -> conversion_rate = 1/12,099 = 0.0000826  ✅ invert
-    #
-    # Case C: same currency -> rate = 1.0
-    if transport_currency == company_currency:
-        pi_conversion_rate = 1.0
-    else:
-        # Determine which side is stronger by checking if company_currency is USD
-        # and transport_currency is UZS (weak). When PI is in the WEAK currency,
-        # we must invert the human rate.
-        #
-        # General rule: if lcv_exchange_rate > 1, the user expressed it as
-        # "1 strong = N weak". If PI currency IS the weak one, invert.
-        # We detect this by comparing: does company_currency == "USD" and
-        # transport_currency != "USD"? No — use a currency-agnostic approach:
-        # fetch the official ERPNext rate for transport_currency -> company_currency.
-        # If official rate < 1 and lcv_exchange_rate > 1, they are inverses -> invert.
-        try:
-            from erpnext.setup.utils import get_exchange_rate
-            official = get_exchange_rate(
-                from_currency=transport_currency,
-                to_currency=company_currency,
-                transaction_date=nowdate(),
-            )
-            if official and flt(official) > 0:
-                pi_conversion_rate = flt(official)
-            else:
-                raise ValueError("no official rate")
-        except Exception:
-            # Fallback: derive from lcv_exchange_rate direction heuristic
-            # lcv_exchange_rate > 1 almost always means "1 strong = N weak"
-            # If company_currency is the strong one, PI is in weak -> invert
-            if flt(lcv_exchange_rate) > 1:
-                pi_conversion_rate = 1.0 / flt(lcv_exchange_rate)
-            else:
-                pi_conversion_rate = flt(lcv_exchange_rate)
+    # rate_quote carries its own direction ("1 USD = 12,099 UZS"), so:
+    #   PI in USD, company UZS -> 12,099
+    #   PI in UZS, company USD -> 1 / 12,099
+    #   same currency          -> 1.0
+    pi_conversion_rate = rate_quote.rate(transport_currency, company_currency)
 
     # Resolve the correct payable (credit_to) account whose currency matches
     # the transport_currency. ERPNext enforces: PI currency == credit_to account currency.
@@ -207,8 +202,9 @@ def _create_carrier_pi(
     carrier_pi.update_stock = 0
     carrier_pi.set_posting_time = 0
     carrier_pi.remarks = _("Transport charge for Purchase Invoice: {0}").format(original_pi.name)
+    carrier_pi.custom_transport_source_pi = original_pi.name
 
-    transport_item = _get_transport_item()
+    transport_item = _get_transport_item(original_pi.company)
 
     carrier_pi.append(
         "items",
@@ -221,7 +217,7 @@ def _create_carrier_pi(
             "amount": flt(transport_cost, 4),
             "uom": "Nos",
             "expense_account": expense_account,
-            "cost_center": frappe.db.get_value("Company", original_pi.company, "cost_center"),
+            "cost_center": get_company_context(original_pi.company).cost_center,
         },
     )
 
@@ -253,7 +249,7 @@ def _create_carrier_pi(
 # STEP 2: LANDED COST VOUCHER
 # ---------------------------------------------------------------------------
 
-def create_transport_lcv(doc, pr_list, transport_amount, original_amount, original_currency, exchange_rate):
+def create_transport_lcv(doc, pr_list, transport_amount, original_amount, original_currency, rate_quote):
     """
     Create and submit a Landed Cost Voucher for transport charges.
 
@@ -266,7 +262,7 @@ def create_transport_lcv(doc, pr_list, transport_amount, original_amount, origin
         transport_amount : Transport cost in company currency (already converted)
         original_amount  : Original amount in original_currency
         original_currency: Currency of the transport cost
-        exchange_rate    : Exchange rate used for conversion
+        rate_quote       : RateQuote used for conversion
 
     Returns:
         str: Name of the created and submitted LCV
@@ -296,7 +292,7 @@ def create_transport_lcv(doc, pr_list, transport_amount, original_amount, origin
         )
         return existing_lcv
 
-    company_currency = frappe.get_cached_value("Company", doc.company, "default_currency")
+    company_currency = get_company_context(doc.company).default_currency
     expense_account = get_transport_expense_account(doc.company)
 
     lcv = frappe.new_doc("Landed Cost Voucher")
@@ -339,7 +335,7 @@ def create_transport_lcv(doc, pr_list, transport_amount, original_amount, origin
         doc.name, flt(original_amount, 2), original_currency
     )
     if original_currency != company_currency:
-        description += _(" @ rate {0}").format(flt(exchange_rate, 6))
+        description += _(" @ {0}").format(rate_quote.describe())
 
     lcv.append(
         "taxes",
@@ -433,25 +429,22 @@ def get_purchase_receipts_from_pi(doc):
 # PRIVATE HELPERS
 # ---------------------------------------------------------------------------
 
-def _get_carrier_supplier(transport_currency):
+def _get_carrier_supplier(company, transport_currency):
     """Resolve transport supplier name from currency."""
-    mapping = {
-        "USD": "Logistika Servis USD",
-        "UZS": "Logistika Servis UZS",
-    }
-    supplier = mapping.get(transport_currency)
-    if not supplier:
+    context = get_company_context(company)
+    if transport_currency not in CARRIER_SUPPLIERS:
         frappe.throw(
             _(
                 "No carrier supplier configured for currency '{0}'. "
                 "custom_lcv_currency must be 'USD' or 'UZS'."
             ).format(transport_currency)
         )
-    if not frappe.db.exists("Supplier", supplier):
+    supplier = context.carrier_suppliers.get(transport_currency)
+    if not supplier:
         frappe.throw(
             _(
                 "Supplier '{0}' does not exist. Create it in the Supplier master."
-            ).format(supplier)
+            ).format(CARRIER_SUPPLIERS[transport_currency])
         )
     return supplier
 
@@ -462,24 +455,9 @@ def _get_payable_account(company, currency):
     matches the given currency.
 
     ERPNext rule: PI currency MUST equal the credit_to account currency.
-
-    Strategy:
-      1. Look for a Payable account in the company's Chart of Accounts
-         whose account_currency == currency.
-      2. Throw with a clear actionable message if none found.
+    The oldest matching Payable account is resolved by company_context.
     """
-    account = frappe.db.get_value(
-        "Account",
-        filters={
-            "company": company,
-            "account_type": "Payable",
-            "account_currency": currency,
-            "is_group": 0,
-            "disabled": 0,
-        },
-        fieldname="name",
-        order_by="creation asc",
-    )
+    account = get_company_context(company).payable_accounts.get(currency)
     if not account:
         frappe.throw(
             _(
@@ -490,32 +468,20 @@ def _get_payable_account(company, currency):
     return account
 
 
-def _get_transport_item():
+def _get_transport_item(company):
     """
     Return the item code for the 'Transport xizmati' service item.
 
-    Lookup strategy:
-      1. Check if an item with name (item_code) == 'Transport xizmati' exists.
-      2. If not, search by item_name == 'Transport xizmati' (handles auto-numbered items).
-      3. Hard-throw with an actionable message if neither is found.
+    company_context matches item_code first, then item_name (auto-numbered items).
 
     Returns:
         str: The item `name` (= item_code) field value
     """
-    # 1. Direct name/item_code match (ideal case — item was named manually)
-    if frappe.db.exists("Item", "Transport xizmati"):
-        return "Transport xizmati"
-
-    # 2. item_name match — item exists but was auto-numbered (e.g. name = "5")
-    item_code = frappe.db.get_value(
-        "Item",
-        filters={"item_name": "Transport xizmati", "disabled": 0},
-        fieldname="name",
-    )
+    item_code = get_company_context(company).transport_item
     if item_code:
         return item_code
 
-    # 3. Item genuinely missing — fail loudly
+    # Item genuinely missing — fail loudly
     frappe.throw(
         _(
             "Item 'Transport xizmati' does not exist. "
@@ -592,7 +558,9 @@ def _populate_lcv_items_from_pi(lcv, pi_doc, company_currency):
             amount=flt(pi_item.amount),
             from_currency=pi_doc.currency,
             to_currency=company_currency,
-            conversion_rate=flt(pi_doc.conversion_rate) or 1.0,
+            conversion_rate=RateQuote(
+                flt(pi_doc.conversion_rate) or 1.0, pi_doc.currency, company_currency
+            ),
         )
 
         item_rate_company = (
@@ -0,0 +1,184 @@
+"""
+WIP Ledger
+==========
+What is left in a WIP warehouse for one Sales Order Item: materials moved in
+by 'Расход по заказу' transfers minus what production (Repack) or reversal
+entries already took out again.
+
+Stock Entries are matched on custom_sales_order / custom_sales_order_item.
+Legacy entries without custom_sales_order_item belong to the whole Sales
+Order, so they count for every line of it (the old SO-level behaviour).
+
+Batches: a production panel takes a share of what is left, equal to its
+production_qty over the quantity still to produce (ordered stock_qty minus
+finished goods already produced for the line). The last batch gets share 1
+and takes the exact remaining balance, so the line settles to zero. Service
+costs follow the same share of the PI cost not yet absorbed by earlier
+production entries (their additional costs). A production entry reversed by
+Asosiy panel's Reverse mode (custom_reversal_of on the reversal) no longer
+counts as produced or absorbed; its materials are back in the WIP balance.
+
+Production submits call lock_sales_order_item() first: the Sales Order Item
+row stays locked until commit, so a second production panel for the same line
+waits, then reads the balance left by the first one instead of consuming the
+same WIP materials twice. Under REPEATABLE READ a plain SELECT would still see
+the snapshot taken before the lock was granted, so the balance functions take
+lock=True there and run as locking reads (LOCK IN SHARE MODE), which always
+read the latest committed rows.
+"""
+
+import frappe
+from frappe.utils import flt
+
+
+def lock_sales_order_item(sales_order_item):
+	"""Row-lock the Sales Order Item until the current transaction ends."""
+	return frappe.db.get_value("Sales Order Item", sales_order_item, "name", for_update=True)
+
+
+def _locking(lock):
+	return "LOCK IN SHARE MODE" if lock else ""
+
+
+def get_wip_balance(sales_order, sales_order_item, wip_warehouse, lock=False):
+	"""
+	Remaining WIP materials of a Sales Order Item.
+
+	Returns:
+		list[dict]: item_code, item_name, uom, description, qty_in, qty_out,
+		            qty (remaining), rate (average incoming), amount,
+		            source_entries — only items with qty > 0
+	"""
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			sed.item_code,
+			sed.uom,
+			MAX(sed.item_name) AS item_name,
+			MAX(sed.description) AS description,
+			SUM(CASE WHEN sed.t_warehouse = %(wip_warehouse)s THEN sed.qty ELSE 0 END) AS qty_in,
+			SUM(CASE WHEN sed.t_warehouse = %(wip_warehouse)s THEN sed.qty * sed.valuation_rate ELSE 0 END) AS amount_in,
+			SUM(CASE WHEN sed.s_warehouse = %(wip_warehouse)s THEN sed.qty ELSE 0 END) AS qty_out,
+			GROUP_CONCAT(DISTINCT CASE WHEN sed.t_warehouse = %(wip_warehouse)s THEN se.name END
+				SEPARATOR ', ') AS source_entries
+		FROM `tabStock Entry Detail` sed
+		INNER JOIN `tabStock Entry` se ON sed.parent = se.name
+		WHERE se.docstatus = 1
+			AND se.custom_sales_order = %(sales_order)s
+			AND (se.custom_sales_order_item = %(sales_order_item)s OR IFNULL(se.custom_sales_order_item, '') = '')
+			AND se.purpose IN ('Material Transfer', 'Repack')
+			AND (sed.t_warehouse = %(wip_warehouse)s OR sed.s_warehouse = %(wip_warehouse)s)
+		GROUP BY sed.item_code, sed.uom
+		ORDER BY sed.item_code
+		{_locking(lock)}
+		""",
+		{"sales_order": sales_order, "sales_order_item": sales_order_item, "wip_warehouse": wip_warehouse},
+		as_dict=True,
+	)
+
+	balance = []
+	for row in rows:
+		row.qty = flt(row.qty_in) - flt(row.qty_out)
+		if row.qty <= 0:
+			continue
+		row.rate = flt(row.amount_in) / flt(row.qty_in) if flt(row.qty_in) else 0
+		row.amount = row.qty * row.rate
+		balance.append(row)
+	return balance
+
+
+# Production Repacks of a line that still count: same line match as the WIP
+# balance (legacy entries without custom_sales_order_item belong to the whole
+# order), reversal entries and the entries they reversed left out.
+PRODUCTION_ENTRY_CONDITIONS = """
+	se.docstatus = 1
+	AND se.purpose = 'Repack'
+	AND se.custom_sales_order = %(sales_order)s
+	AND (se.custom_sales_order_item = %(sales_order_item)s OR IFNULL(se.custom_sales_order_item, '') = '')
+	AND IFNULL(se.custom_reversal_of, '') = ''
+	AND NOT EXISTS (
+		SELECT 1 FROM `tabStock Entry` rev
+		WHERE rev.custom_reversal_of = se.name AND rev.docstatus = 1
+	)
+"""
+
+
+def production_fraction(ordered_qty, produced_qty, production_qty):
+	"""
+	Share of the remaining balance a batch of `production_qty` takes: its part
+	of what is still to produce, 1 for the last batch or any over-production.
+	"""
+	remaining_qty = flt(ordered_qty) - flt(produced_qty)
+	production_qty = flt(production_qty)
+	if remaining_qty <= 0 or production_qty >= remaining_qty:
+		return 1.0
+	return production_qty / remaining_qty
+
+
+def get_production_share(sales_order, sales_order_item, finished_good, production_qty, lock=False):
+	"""
+	Share of the remaining WIP / service balance a production batch takes.
+
+	Returns:
+		frappe._dict: ordered_qty, produced_qty, remaining_qty, fraction
+		              (see production_fraction)
+	"""
+	ordered_qty = flt(frappe.db.get_value("Sales Order Item", sales_order_item, "stock_qty"))
+	produced_qty = flt(
+		frappe.db.sql(
+			f"""
+			SELECT SUM(sed.transfer_qty)
+			FROM `tabStock Entry Detail` sed
+			INNER JOIN `tabStock Entry` se ON sed.parent = se.name
+			WHERE {PRODUCTION_ENTRY_CONDITIONS}
+				AND sed.item_code = %(finished_good)s
+				AND IFNULL(sed.t_warehouse, '') != ''
+			{_locking(lock)}
+			""",
+			{"sales_order": sales_order, "sales_order_item": sales_order_item, "finished_good": finished_good},
+		)[0][0]
+	)
+
+	return frappe._dict(
+		ordered_qty=ordered_qty,
+		produced_qty=produced_qty,
+		remaining_qty=max(ordered_qty - produced_qty, 0),
+		fraction=production_fraction(ordered_qty, produced_qty, production_qty),
+	)
+
+
+def get_service_balance(sales_order, sales_order_item, lock=False):
+	"""
+	Service cost of a Sales Order Item (company currency) and what is left.
+
+	Returns:
+		frappe._dict: total (submitted service PIs), absorbed (additional costs
+		              of production entries not reversed), remaining
+	"""
+	total = flt(
+		frappe.db.sql(
+			f"""
+			SELECT SUM(pii.base_amount)
+			FROM `tabPurchase Invoice Item` pii
+			INNER JOIN `tabPurchase Invoice` pi ON pii.parent = pi.name
+			WHERE pi.docstatus = 1
+				AND pi.update_stock = 0
+				AND pii.custom_sales_order = %(sales_order)s
+				AND pii.custom_sales_order_item = %(sales_order_item)s
+			{_locking(lock)}
+			""",
+			{"sales_order": sales_order, "sales_order_item": sales_order_item},
+		)[0][0]
+	)
+	absorbed = flt(
+		frappe.db.sql(
+			f"""
+			SELECT SUM(se.total_additional_costs)
+			FROM `tabStock Entry` se
+			WHERE {PRODUCTION_ENTRY_CONDITIONS}
+			{_locking(lock)}
+			""",
+			{"sales_order": sales_order, "sales_order_item": sales_order_item},
+		)[0][0]
+	)
+	return frappe._dict(total=total, absorbed=absorbed, remaining=max(total - absorbed, 0))
@@ -40,6 +40,104 @@ PURCHASE_INVOICE_ITEM_CUSTOM_FIELDS = {
 }
 
 
+# Indexed references used by utils/invoicing.py and services/inter_company.py
+# for inter-company duplicate detection (instead of remarks / bill_no scans).
+INTER_COMPANY_REFERENCE_CUSTOM_FIELDS = {
+	"Sales Invoice": [
+		{
+			"fieldname": "custom_delivery_note_ref",
+			"label": "Delivery Note Reference",
+			"fieldtype": "Link",
+			"options": "Delivery Note",
+			"insert_after": "is_internal_customer",
+			"read_only": 1,
+			"no_copy": 1,
+			"print_hide": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		}
+	],
+	"Purchase Receipt": [
+		{
+			"fieldname": "custom_delivery_note_ref",
+			"label": "Delivery Note Reference",
+			"fieldtype": "Link",
+			"options": "Delivery Note",
+			"insert_after": "is_internal_supplier",
+			"read_only": 1,
+			"no_copy": 1,
+			"print_hide": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		}
+	],
+	"Purchase Invoice": [
+		{
+			"fieldname": "custom_purchase_receipt_ref",
+			"label": "Purchase Receipt Reference",
+			"fieldtype": "Link",
+			"options": "Purchase Receipt",
+			"insert_after": "is_internal_supplier",
+			"read_only": 1,
+			"no_copy": 1,
+			"print_hide": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		}
+	],
+}
+
+
+# Per Sales Order Item WIP ledger (services/wip_ledger.py): 'Расход по заказу'
+# transfers and production Repack entries carry the line they belong to;
+# Reverse-mode entries point at the entry they reverse.
+WIP_LEDGER_CUSTOM_FIELDS = {
+	"Stock Entry": [
+		{
+			"fieldname": "custom_sales_order_item",
+			"label": "Sales Order Item",
+			"fieldtype": "Data",
+			"insert_after": "custom_sales_order",
+			"read_only": 1,
+			"no_copy": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		},
+		{
+			"fieldname": "custom_reversal_of",
+			"label": "Reversal Of",
+			"fieldtype": "Link",
+			"options": "Stock Entry",
+			"insert_after": "custom_sales_order_item",
+			"read_only": 1,
+			"no_copy": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		}
+	]
+}
+
+
+# Carrier PI of the transport pipeline (services/transport_lcv.py) -> source PI;
+# duplicate guard when the pipeline is re-run after a failed LCV step.
+TRANSPORT_LCV_CUSTOM_FIELDS = {
+	"Purchase Invoice": [
+		{
+			"fieldname": "custom_transport_source_pi",
+			"label": "Transport Charge For",
+			"fieldtype": "Link",
+			"options": "Purchase Invoice",
+			"insert_after": "custom_purchase_receipt_ref",
+			"read_only": 1,
+			"no_copy": 1,
+			"print_hide": 1,
+			"search_index": 1,
+			"module": PREMIERPRINT_MODULE,
+		}
+	]
+}
+
+
 def create_purchase_invoice_custom_fields():
 	"""
 	Creates custom fields for Purchase Invoice to track linked LCVs.
@@ -86,6 +184,36 @@ def ensure_purchase_invoice_item_custom_fields():
 	print("✅ Purchase Invoice Item custom fields aligned successfully!")
 
 
+def ensure_inter_company_reference_fields():
+	"""
+	Ensures the indexed inter-company reference fields exist.
+	"""
+	create_custom_fields(INTER_COMPANY_REFERENCE_CUSTOM_FIELDS, update=True)
+	frappe.db.commit()
+
+	print("✅ Inter-company reference fields created successfully!")
+
+
+def ensure_wip_ledger_fields():
+	"""
+	Ensures the Stock Entry fields used by the WIP ledger exist.
+	"""
+	create_custom_fields(WIP_LEDGER_CUSTOM_FIELDS, update=True)
+	frappe.db.commit()
+
+	print("✅ WIP ledger fields created successfully!")
+
+
+def ensure_transport_lcv_fields():
+	"""
+	Ensures the Carrier PI -> source PI reference used by the transport pipeline exists.
+	"""
+	create_custom_fields(TRANSPORT_LCV_CUSTOM_FIELDS, update=True)
+	frappe.db.commit()
+
+	print("✅ Transport LCV fields created successfully!")
+
+
 def setup_all():
 	"""
 	Main setup function - creates all custom fields.
@@ -93,6 +221,9 @@ def setup_all():
 	print("🚀 Setting up Premier Print custom fields...")
 	create_purchase_invoice_custom_fields()
 	ensure_purchase_invoice_item_custom_fields()
+	ensure_inter_company_reference_fields()
+	ensure_wip_ledger_fields()
+	ensure_transport_lcv_fields()
 	print("✅ All custom fields setup complete!")
 
 
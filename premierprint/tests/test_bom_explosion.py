@@ -0,0 +1,24 @@
+"""
+The cached BOM explosion is stored per unit and scaled on request.
+"""
+
+from frappe.tests import UnitTestCase
+
+from premierprint.utils.stock_entry import scale_bom_explosion
+
+PER_UNIT = {
+	"PAPER-A4": {"qty": 0.25, "stock_uom": "Kg", "conversion_factor": 1.0},
+	"INK-BLACK": {"qty": 0.002, "stock_uom": "Litre", "conversion_factor": 1.0},
+}
+
+
+class TestBOMExplosion(UnitTestCase):
+	def test_scale_multiplies_qty(self):
+		scaled = scale_bom_explosion(PER_UNIT, 400)
+		self.assertAlmostEqual(scaled["PAPER-A4"]["qty"], 100)
+		self.assertAlmostEqual(scaled["INK-BLACK"]["qty"], 0.8)
+		self.assertEqual(scaled["PAPER-A4"]["stock_uom"], "Kg")
+
+	def test_scale_does_not_mutate_cached_value(self):
+		scale_bom_explosion(PER_UNIT, 10)
+		self.assertEqual(PER_UNIT["PAPER-A4"]["qty"], 0.25)
@@ -0,0 +1,62 @@
+"""
+utils/bulk_create reserves one block of numeric IDs; every record must be
+created under the ID reserved for it. Data Import blocks (utils/naming) are
+dropped when the row that reserved them is rolled back.
+"""
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from premierprint.utils import naming
+from premierprint.utils.bulk_create import create_records
+
+
+class TestBulkCreate(IntegrationTestCase):
+	def setUp(self):
+		self.created = []
+
+	def tearDown(self):
+		for name in self.created:
+			frappe.delete_doc("Customer", name, force=True, ignore_permissions=True)
+		frappe.db.commit()
+
+	def test_customers_keep_reserved_ids(self):
+		tag = frappe.generate_hash(length=8)
+		rows = [
+			{
+				"customer_name": f"Bulk test {tag} {idx}",
+				"customer_group": "All Customer Groups",
+				"territory": "All Territories",
+			}
+			for idx in range(3)
+		]
+
+		result = create_records("Customer", rows)
+		self.created = result["created"]
+
+		self.assertEqual(result["errors"], [])
+		self.assertEqual(len(result["reserved"]), 3)
+		self.assertEqual(result["created"], result["reserved"])
+
+
+class TestImportIDPool(IntegrationTestCase):
+	def setUp(self):
+		frappe.local.__dict__.pop("premierprint_id_pools", None)
+		for target in (
+			patch.object(naming, "allocate_ids", side_effect=[["101", "102"], ["201", "202"]]),
+			patch.object(frappe.flags, "in_import", True),
+		):
+			target.start()
+			self.addCleanup(target.stop)
+		self.addCleanup(frappe.local.__dict__.pop, "premierprint_id_pools", None)
+
+	def test_block_is_used_row_after_row(self):
+		self.assertEqual(naming.allocate_customer_id(), "101")
+		self.assertEqual(naming.allocate_customer_id(), "102")
+
+	def test_rolled_back_block_is_not_reused(self):
+		self.assertEqual(naming.allocate_customer_id(), "101")
+		frappe.db.rollback()
+		self.assertEqual(naming.allocate_customer_id(), "201")
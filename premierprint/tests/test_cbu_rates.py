@@ -0,0 +1,40 @@
+"""
+CBU feed parsing against a local stand-in file (no network).
+"""
+
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from premierprint.services.cbu_rates import currency_exchange_name, fetch_rates
+
+PAYLOAD = [
+	{"Ccy": "USD", "Nominal": "1", "Rate": "12099.18", "Date": "19.10.2026"},
+	{"Ccy": "JPY", "Nominal": "10", "Rate": "815.40", "Date": "19.10.2026"},
+	{"Ccy": "XXX", "Nominal": "1", "Rate": "0", "Date": "19.10.2026"},
+]
+
+
+class TestCBURates(UnitTestCase):
+	def setUp(self):
+		self.feed_dir = tempfile.mkdtemp()
+		with open(os.path.join(self.feed_dir, "2026-10-19.json"), "w") as f:
+			json.dump(PAYLOAD, f)
+
+	def test_file_stand_in_feed(self):
+		feed = os.path.join(self.feed_dir, "{date}.json")
+		with patch.dict(frappe.local.conf, {"cbu_rates_feed": feed}):
+			rates = fetch_rates("2026-10-19")
+
+		self.assertAlmostEqual(rates["USD"], 12099.18)
+		self.assertAlmostEqual(rates["JPY"], 81.54)  # per 1 unit, not per Nominal
+		self.assertNotIn("XXX", rates)
+
+	def test_currency_exchange_name(self):
+		self.assertEqual(
+			currency_exchange_name("2026-10-19", "USD", "UZS"), "2026-10-19-USD-UZS-Selling-Buying"
+		)
@@ -0,0 +1,59 @@
+"""
+With consolidation and mirrored Purchase Invoices on, an internal Purchase
+Receipt must not get a PI of its own: the mirrored PI of the consolidated SI
+already books its goods in the receiving company.
+"""
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from premierprint.utils import invoicing
+
+
+class TestConsolidationBilling(UnitTestCase):
+	def setUp(self):
+		self.pr = frappe._dict(
+			name="MAT-PRE-0001", supplier="Premier Print LLC", is_return=0,
+			custom_delivery_note_ref="MAT-DN-0001",
+		)
+		for target in (
+			patch.object(frappe.db, "get_value", return_value=1),  # internal supplier
+			patch.object(frappe.db, "exists", return_value=None),  # no PR-ref PI, no transfer
+			patch("premierprint.services.inter_company.on_receipt_submitted", return_value=False),
+			patch("frappe.msgprint"),
+			patch.object(invoicing, "add_comment"),
+		):
+			target.start()
+			self.addCleanup(target.stop)
+
+		make_pi = patch.object(invoicing, "make_purchase_invoice_from_receipt")
+		self.make_pi = make_pi.start()
+		self.addCleanup(make_pi.stop)
+
+	def _submit(self, mirrored_pi=None, mirroring=False):
+		with (
+			patch.object(invoicing, "get_mirrored_purchase_invoice_for_receipt", return_value=mirrored_pi),
+			patch.object(invoicing, "is_mirroring_enabled", return_value=mirroring),
+		):
+			invoicing.on_purchase_receipt_submit(self.pr, "on_submit")
+
+	def test_receipt_after_consolidation_reuses_the_mirrored_pi(self):
+		self._submit(mirrored_pi="ACC-PINV-0001", mirroring=True)
+		self.make_pi.assert_not_called()
+
+	def test_receipt_before_consolidation_waits_for_the_mirror(self):
+		self._submit(mirroring=True)
+		self.make_pi.assert_not_called()
+
+	def test_receipt_is_invoiced_without_mirroring(self):
+		self._submit(mirroring=False)
+		self.make_pi.assert_called_once_with(self.pr)
+
+	def test_transfer_tracked_receipt_is_not_left_to_the_mirror(self):
+		with (
+			patch.object(invoicing, "is_mirroring_enabled", return_value=True),
+			patch.object(frappe.db, "exists", return_value="ICT-0001"),
+		):
+			self.assertFalse(invoicing.will_be_mirrored_by_consolidation(self.pr))
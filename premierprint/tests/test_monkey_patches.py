@@ -0,0 +1,32 @@
+"""
+`import premierprint` must stay cheap: no ERPNext import and no patching at
+import time. Patches are applied by utils/monkey_patches.apply_patches.
+"""
+
+import subprocess
+import sys
+
+from frappe.tests import UnitTestCase
+
+from premierprint.utils import monkey_patches
+
+
+class TestMonkeyPatches(UnitTestCase):
+	def test_import_does_not_import_erpnext(self):
+		output = subprocess.check_output(
+			[sys.executable, "-c", "import sys, premierprint; print('erpnext' in sys.modules)"],
+			text=True,
+		)
+		self.assertEqual(output.strip(), "False")
+
+	def test_apply_patches_is_idempotent(self):
+		import erpnext.stock.utils as stock_utils
+
+		monkey_patches.apply_patches()
+		patched = stock_utils.validate_warehouse_company
+		self.assertTrue(hasattr(patched, monkey_patches.ORIGINAL_ATTR))
+
+		# Re-applying (new process state) must not wrap the wrapper
+		monkey_patches._applied = False
+		monkey_patches.apply_patches()
+		self.assertIs(stock_utils.validate_warehouse_company, patched)
@@ -0,0 +1,46 @@
+"""
+utils/timeline buffers comments per transaction: written after commit,
+dropped on rollback (also to a timeline.savepoint).
+"""
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from premierprint.utils import timeline
+
+
+class TestTimeline(IntegrationTestCase):
+	def setUp(self):
+		self.doc = frappe.get_doc("User", "Administrator")
+		self.text = f"timeline test {frappe.generate_hash(length=8)}"
+
+	def tearDown(self):
+		frappe.db.delete("Comment", {"content": self.text})
+		frappe.db.commit()
+
+	def _count(self):
+		return frappe.db.count("Comment", {"content": self.text})
+
+	def test_comments_are_written_after_commit(self):
+		timeline.add_comment(self.doc, "Info", self.text)
+		timeline.add_comment(self.doc, "Info", self.text)
+		self.assertEqual(self._count(), 0)
+
+		frappe.db.commit()
+		self.assertEqual(self._count(), 2)
+		self.assertIsNone(frappe.local.timeline_buffer)
+
+	def test_rollback_discards_comments(self):
+		timeline.add_comment(self.doc, "Info", self.text)
+		frappe.db.rollback()
+		frappe.db.commit()
+		self.assertEqual(self._count(), 0)
+
+	def test_rollback_to_savepoint_drops_later_comments(self):
+		timeline.add_comment(self.doc, "Info", self.text)
+		timeline.savepoint("timeline_test")
+		timeline.add_comment(self.doc, "Info", self.text)
+		timeline.rollback_to("timeline_test")
+
+		frappe.db.commit()
+		self.assertEqual(self._count(), 1)
@@ -0,0 +1,158 @@
+"""
+services/wip_ledger: batch shares, the legacy line backfill, and two production panels for the same
+Sales Order Item submitted at once. The second one waits on the Sales Order
+Item lock, but its REPEATABLE READ snapshot is older than the first panel's
+commit. Its balance reads must be locking reads, which see committed rows, or
+it consumes the same WIP materials again.
+"""
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from premierprint.patches.add_wip_ledger_fields import plan_line_tags, resolve_line
+from premierprint.premierprint.doctype.asosiy_panel.asosiy_panel import Asosiypanel
+from premierprint.services.wip_ledger import production_fraction
+
+PANEL_MODULE = "premierprint.premierprint.doctype.asosiy_panel.asosiy_panel"
+LOCKING = ("LOCK IN SHARE MODE", "FOR UPDATE")
+
+
+class SnapshotDB:
+	"""Stock Entry totals of one line: committed state vs. an older snapshot."""
+
+	def __init__(self, qty_in, ordered_qty):
+		self.ordered_qty = ordered_qty
+		self.committed = frappe._dict(qty_in=qty_in, qty_out=0, produced=0)
+		self.snapshot = frappe._dict(self.committed)
+		self.queries = []
+
+	def commit_production(self, qty_out, produced):
+		self.committed.qty_out += qty_out
+		self.committed.produced += produced
+
+	def sql(self, query, values=None, as_dict=False):
+		self.queries.append(query)
+		state = self.committed if any(clause in query for clause in LOCKING) else self.snapshot
+		if "qty_in" in query:
+			return [frappe._dict(
+				item_code="PAPER-A4", uom="Kg", item_name="Paper", description="Paper",
+				qty_in=state.qty_in, amount_in=state.qty_in * 2, qty_out=state.qty_out,
+				source_entries="MAT-STE-0001",
+			)]
+		if "transfer_qty" in query:
+			return [[state.produced]]
+		return [[0]]
+
+	def get_value(self, doctype, name, fieldname, *args, **kwargs):
+		return self.ordered_qty
+
+
+class FakePanel:
+	sales_order = "SO-0001"
+	sales_order_item = "soi-0001"
+	finished_good = "BOX-01"
+	from_warehouse = "WIP - PP"
+
+	def __init__(self, qty, production_qty):
+		self.production_qty = production_qty
+		self.items = [frappe._dict(
+			item_code="PAPER-A4", uom="Kg", qty=qty, rate=2, amount=qty * 2,
+			is_wip_item=1, is_stock_item=1, precision=lambda fieldname: 3,
+		)]
+
+	def remove(self, row):
+		self.items.remove(row)
+
+
+class TestProductionFraction(UnitTestCase):
+	def test_partial_batches_take_their_part_of_what_is_left(self):
+		self.assertAlmostEqual(production_fraction(100, 0, 40), 0.4)
+		self.assertAlmostEqual(production_fraction(100, 40, 30), 0.5)
+
+	def test_final_batch_takes_everything(self):
+		self.assertEqual(production_fraction(100, 70, 30), 1)
+
+	def test_over_production_takes_everything(self):
+		self.assertEqual(production_fraction(100, 70, 50), 1)
+		self.assertEqual(production_fraction(100, 120, 10), 1)
+
+
+class TestLegacyBackfill(UnitTestCase):
+	"""One legacy transfer into WIP and a production Repack of line 1, order with two lines."""
+
+	ORDER_LINES = {("SO-0001", "soi-1"), ("SO-0001", "soi-2")}
+
+	def _entries(self, transfer_panel):
+		entries = [
+			frappe._dict(
+				name="MAT-STE-0001", purpose="Material Transfer", sales_order="SO-0001",
+				remarks=None, panel=transfer_panel,
+			),
+			frappe._dict(
+				name="MAT-STE-0002", purpose="Repack", sales_order="SO-0001", panel=None,
+				remarks="Production for Sales Order: SO-0001 | Sales Order Item: soi-1 | Asosiy Panel: AP-0002",
+			),
+		]
+		panels = {"AP-0001": ("SO-0001", "soi-1"), "AP-0002": ("SO-0001", "soi-1")}
+		for entry in entries:
+			entry.line = resolve_line(entry, panels, self.ORDER_LINES)
+		return entries
+
+	def test_order_is_tagged_when_every_entry_resolves(self):
+		tags = plan_line_tags(self._entries(transfer_panel="AP-0001"))
+		self.assertEqual(tags, {"MAT-STE-0001": "soi-1", "MAT-STE-0002": "soi-1"})
+
+	def test_untraceable_transfer_keeps_the_order_level(self):
+		# Tagging only the Repack would hide its consumption from line 2
+		entries = self._entries(transfer_panel=None)
+		self.assertIsNone(entries[0].line)
+		self.assertEqual(entries[1].line, "soi-1")
+		self.assertEqual(plan_line_tags(entries), {})
+
+	def test_remark_line_of_another_order_is_ignored(self):
+		entry = frappe._dict(
+			name="MAT-STE-0003", purpose="Repack", sales_order="SO-0002", panel=None,
+			remarks="Sales Order Item: soi-1 | Asosiy Panel: AP-9999",
+		)
+		self.assertIsNone(resolve_line(entry, {}, self.ORDER_LINES))
+
+
+class TestWIPLedger(UnitTestCase):
+	def setUp(self):
+		self.db = SnapshotDB(qty_in=10, ordered_qty=100)
+		for target, fake in (
+			(patch.object(frappe.db, "sql"), self.db.sql),
+			(patch.object(frappe.db, "get_value"), self.db.get_value),
+		):
+			target.start().side_effect = fake
+			self.addCleanup(target.stop)
+		lock = patch(f"{PANEL_MODULE}.lock_sales_order_item")
+		lock.start()
+		self.addCleanup(lock.stop)
+
+	def test_overlapping_submits_do_not_consume_wip_twice(self):
+		first = FakePanel(qty=10, production_qty=100)
+		Asosiypanel._reserve_wip_materials(first)
+		self.assertEqual(first.items[0].qty, 10)
+		self.db.commit_production(qty_out=10, produced=100)
+
+		# Second panel: snapshot taken before the first commit still shows 10 kg
+		second = FakePanel(qty=10, production_qty=100)
+		with self.assertRaises(frappe.ValidationError):
+			Asosiypanel._reserve_wip_materials(second)
+		self.assertEqual(second.items, [])
+
+	def test_partial_batch_is_capped_at_its_share(self):
+		panel = FakePanel(qty=10, production_qty=40)
+		with patch("frappe.msgprint"):
+			Asosiypanel._reserve_wip_materials(panel)
+		self.assertEqual(panel.items[0].qty, 4)
+		self.assertEqual(panel.items[0].amount, 8)
+
+	def test_balance_queries_are_locking_reads(self):
+		Asosiypanel._reserve_wip_materials(FakePanel(qty=10, production_qty=100))
+		self.assertTrue(self.db.queries)
+		for query in self.db.queries:
+			self.assertTrue(any(clause in query for clause in LOCKING), query)
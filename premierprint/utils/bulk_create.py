@@ -0,0 +1,104 @@
+"""
+Bulk Item / Customer creation
+=============================
+Creates many records in one call: numeric IDs for all rows without one are
+reserved as a single contiguous block (utils/naming.allocate_ids), then the
+documents are inserted in chunks with a savepoint per row, so one bad row
+does not roll back the rest. Per-row errors are returned to the caller.
+
+Data Import goes through the same counter: with frappe.flags.in_import set,
+CustomItem / CustomCustomer take IDs from a pre-reserved block
+(naming.IMPORT_BLOCK_SIZE) instead of locking the counter for every row. The
+flag stands in for a Data Import hook; a block whose reserving row is rolled
+back is dropped with it.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from premierprint.utils import timeline
+from premierprint.utils.naming import ID_SERIES, allocate_ids
+
+DEFAULT_CHUNK_SIZE = 200
+BACKGROUND_THRESHOLD = 1000
+
+
+@frappe.whitelist()
+def bulk_create(doctype, rows, chunk_size=DEFAULT_CHUNK_SIZE, background=0):
+	"""
+	Create Items or Customers in bulk.
+
+	Args:
+		doctype   : "Item" or "Customer"
+		rows      : list (or JSON list) of field dicts; rows without an ID get one
+		chunk_size: Rows per commit
+		background: Run on the "long" queue (forced above BACKGROUND_THRESHOLD rows)
+
+	Returns:
+		dict: {"created": [names], "errors": [{"row", "error"}], "reserved": [ids]}
+		      or {"job_id"} when enqueued
+	"""
+	if doctype not in ID_SERIES:
+		frappe.throw(_("Bulk creation is only supported for {0}").format(", ".join(ID_SERIES)))
+	frappe.has_permission(doctype, "create", throw=True)
+
+	rows = frappe.parse_json(rows) or []
+	if cint(background) or len(rows) > BACKGROUND_THRESHOLD:
+		job = frappe.enqueue(
+			"premierprint.utils.bulk_create.create_records",
+			queue="long",
+			timeout=3600,
+			doctype=doctype,
+			rows=rows,
+			chunk_size=chunk_size,
+		)
+		return {"job_id": job.id if job else None}
+
+	return create_records(doctype, rows, chunk_size)
+
+
+def create_records(doctype, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+	chunk_size = max(cint(chunk_size) or DEFAULT_CHUNK_SIZE, 1)
+	id_field = ID_SERIES[doctype][1]
+
+	# One block for every row without an explicit ID
+	missing = [row for row in rows if not row.get(id_field)]
+	reserved = allocate_ids(doctype, len(missing)) if missing else []
+	frappe.db.commit()  # release the counter row lock straight away
+
+	for row, new_id in zip(missing, reserved):
+		row[id_field] = new_id
+
+	created, errors = [], []
+	for start in range(0, len(rows), chunk_size):
+		for idx, row in enumerate(rows[start : start + chunk_size], start=start + 1):
+			timeline.savepoint("bulk_create_row")
+			try:
+				doc = frappe.get_doc(_build_doc(doctype, row))
+				doc.insert()
+				created.append(doc.name)
+			except Exception as e:
+				timeline.rollback_to("bulk_create_row")
+				errors.append({"row": idx, "id": row.get(id_field), "error": str(e)})
+				frappe.clear_messages()
+
+		frappe.db.commit()
+
+	if errors:
+		frappe.log_error(
+			message=frappe.as_json(errors),
+			title=f"Bulk {doctype} creation: {len(errors)} row(s) failed",
+		)
+
+	return {"created": created, "errors": errors, "reserved": reserved}
+
+
+def _build_doc(doctype, row):
+	doc = {"doctype": doctype, **row}
+	if doctype == "Item":
+		# CustomItem.autoname -> name = item_code
+		doc["name"] = row["item_code"]
+	elif doctype == "Customer":
+		doc.setdefault("customer_name", row["name"])
+	return doc
@@ -0,0 +1,241 @@
+"""
+Submit Instrumentation
+======================
+Per-phase timings for document-generating submits (Asosiy panel, Kassa,
+transport LCV pipeline, invoicing hooks).
+
+	with profile("Asosiy panel: Перемещения", doc=self):   # root: one per submit
+		with span("se.insert"):                            # nested phase
+			se.insert()
+
+	@traced("invoicing.on_delivery_note_submit")           # root or span, whichever applies
+	def on_delivery_note_submit(doc, method): ...
+
+	@phase("validate")                                     # span only, never a root
+	def validate(self): ...
+
+While a profile is active, frappe.db.sql is wrapped to count queries and
+their time; every span records wall time, query count and query time.
+Finished profiles go to a Redis ring buffer (last PROFILE_BUFFER_SIZE) and,
+optionally, to the `Submit Profile` doctype. Failed submits only reach the
+ring buffer (the transaction is rolled back).
+
+Toggled per site in Premier Print Settings (enable_submit_profiling). When
+off, profile / span / traced do nothing beyond one cached settings read.
+Slowest submits: desk page /app/slow-submits.
+"""
+
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, now_datetime
+
+SETTINGS_DOCTYPE = "Premier Print Settings"
+PROFILE_DOCTYPE = "Submit Profile"
+PROFILE_BUFFER_KEY = "premierprint:submit_profiles"
+PROFILE_BUFFER_SIZE = 200
+
+
+def is_profiling_enabled():
+	return cint(frappe.db.get_single_value(SETTINGS_DOCTYPE, "enable_submit_profiling"))
+
+
+class SubmitProfile:
+	"""Spans and query counters of one profiled submit."""
+
+	def __init__(self, name, doc=None):
+		self.name = name
+		self.reference_doctype = doc.doctype if doc is not None else None
+		self.reference_name = doc.name if doc is not None else None
+		self.user = frappe.session.user
+		self.started_at = now_datetime()
+		self.spans = []
+		self.depth = 0
+		self.queries = 0
+		self.query_ms = 0.0
+		self._start = time.perf_counter()
+		self._sql = None
+
+	def start(self):
+		self._sql = frappe.db.sql
+		frappe.db.sql = self._timed_sql
+
+	def stop(self):
+		frappe.db.sql = self._sql
+		return _elapsed_ms(self._start)
+
+	def _timed_sql(self, *args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return self._sql(*args, **kwargs)
+		finally:
+			self.queries += 1
+			self.query_ms += _elapsed_ms(start)
+
+	@contextmanager
+	def span(self, name):
+		start, queries, query_ms = time.perf_counter(), self.queries, self.query_ms
+		record = {"name": name, "depth": self.depth, "offset_ms": _elapsed_ms(self._start)}
+		self.spans.append(record)
+		self.depth += 1
+		try:
+			yield record
+		finally:
+			self.depth -= 1
+			record.update(
+				wall_ms=_elapsed_ms(start),
+				queries=self.queries - queries,
+				query_ms=round(self.query_ms - query_ms, 2),
+			)
+
+	def as_dict(self, duration_ms, error=None):
+		return {
+			"profile_name": self.name,
+			"reference_doctype": self.reference_doctype,
+			"reference_name": self.reference_name,
+			"user": self.user,
+			"started_at": str(self.started_at),
+			"status": "Failed" if error else "Success",
+			"error": error,
+			"duration_ms": duration_ms,
+			"query_count": self.queries,
+			"query_ms": round(self.query_ms, 2),
+			"phases": self.spans,
+		}
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+@contextmanager
+def profile(name, doc=None):
+	"""Root profile of a submit; becomes a span when one is already active."""
+	active = getattr(frappe.local, "submit_profile", None)
+	if active is not None:
+		with active.span(name) as record:
+			yield record
+		return
+
+	if not is_profiling_enabled():
+		yield None
+		return
+
+	current = SubmitProfile(name, doc)
+	frappe.local.submit_profile = current
+	current.start()
+	error = None
+	try:
+		yield current
+	except Exception as e:
+		error = str(e) or e.__class__.__name__
+		raise
+	finally:
+		duration_ms = current.stop()
+		frappe.local.submit_profile = None
+		_record(current.as_dict(duration_ms, error))
+
+
+def span(name):
+	"""Nested phase of the active profile (no-op without one)."""
+	active = getattr(frappe.local, "submit_profile", None)
+	return active.span(name) if active is not None else nullcontext()
+
+
+def traced(name=None):
+	"""Decorator: run the function as a span, or as a root profile if none is active."""
+
+	def decorator(fn):
+		label = name or fn.__qualname__
+
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			doc = args[0] if args and isinstance(args[0], Document) else None
+			with profile(label, doc=doc):
+				return fn(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
+
+def phase(name=None):
+	"""Decorator: run the function as a span of the active profile (never starts one)."""
+
+	def decorator(fn):
+		label = name or fn.__name__
+
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			with span(label):
+				return fn(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
+
+@frappe.whitelist()
+def get_slowest_submits(source="recent", limit=50):
+	"""
+	Slowest profiled submits for the Slow Submits desk page.
+
+	Args:
+		source: "recent" (ring buffer, includes failures) or "stored" (Submit Profile)
+		limit : Rows to return
+	"""
+	frappe.only_for("System Manager")
+	limit = cint(limit) or 50
+
+	if source == "stored":
+		rows = frappe.get_all(
+			PROFILE_DOCTYPE,
+			fields=[
+				"name", "profile_name", "reference_doctype", "reference_name", "user", "started_at",
+				"status", "duration_ms", "query_count", "query_ms", "phases",
+			],
+			order_by="duration_ms desc",
+			limit=limit,
+		)
+		for row in rows:
+			row.phases = json.loads(row.phases or "[]")
+		return rows
+
+	profiles = [json.loads(raw) for raw in frappe.cache().lrange(PROFILE_BUFFER_KEY, 0, -1) or []]
+	return sorted(profiles, key=lambda p: p["duration_ms"], reverse=True)[:limit]
+
+
+# ============================================================
+# STORAGE
+# ============================================================
+
+def _record(data):
+	"""Never let instrumentation break the submit it measures."""
+	try:
+		cache = frappe.cache()
+		cache.lpush(PROFILE_BUFFER_KEY, json.dumps(data, default=str, ensure_ascii=False))
+		cache.ltrim(PROFILE_BUFFER_KEY, 0, PROFILE_BUFFER_SIZE - 1)
+
+		if data["status"] == "Success" and _should_store(data["duration_ms"]):
+			frappe.get_doc({
+				"doctype": PROFILE_DOCTYPE,
+				**data,
+				"phases": json.dumps(data["phases"], ensure_ascii=False, indent=1),
+			}).insert(ignore_permissions=True)
+	except Exception:
+		frappe.log_error(message=frappe.get_traceback(), title="Submit profile could not be recorded")
+
+
+def _should_store(duration_ms):
+	settings = frappe.db.get_value(
+		SETTINGS_DOCTYPE, None, ["store_submit_profiles", "submit_profile_min_ms"], as_dict=True
+	)
+	return cint(settings.store_submit_profiles) and duration_ms >= flt(settings.submit_profile_min_ms)
+
+
+def _elapsed_ms(start):
+	return round((time.perf_counter() - start) * 1000, 2)
@@ -6,38 +6,62 @@ Handles automatic document creation for internal party transactions:
 - PR → PI: Purchase Receipt submit → Purchase Invoice (for internal suppliers)
 - PI → SI: Purchase Invoice submit → Ensure linked Sales Invoice is submitted
 
+Delivery Notes created by Asosiy panel for an internal customer carry
+`flags.inter_company_transfer`; their chain is driven hop by hop in the
+background by premierprint.services.inter_company instead.
+
+With "Consolidate Inter-Company Invoices" enabled in Premier Print Settings,
+internal DNs are not invoiced on submit: consolidate_inter_company_invoices()
+runs daily and emits one SI (plus mirrored PI) per company pair, customer and day.
+With mirroring on, the internal Purchase Receipt of such a DN gets no PI of its
+own: the mirrored PI already books the goods in the receiving company.
+
 Author: PremierPrint
 """
 
 import frappe
 from frappe import _
+from frappe.utils import cint, getdate, now_datetime, nowdate
 
+from premierprint.utils.instrumentation import traced
+from premierprint.utils.timeline import add_comment
 
+
+@traced("invoicing.on_delivery_note_submit")
 def on_delivery_note_submit(doc, method):
     """Delivery Note submit bo'lganda Sales Invoice avtomatik yaratish.
 
     Faqat internal customer (ichki mijoz) uchun ishlaydi.
     DN submit → SI create & submit (update_stock=0).
+    Returns (e.g. Asosiy panel "Reverse" mode) are skipped.
     """
-    if not doc.customer:
+    if not doc.customer or doc.is_return:
         return
 
     is_internal = frappe.db.get_value("Customer", doc.customer, "is_internal_customer")
     if not is_internal:
         return
 
-    # Duplicate tekshiruvi
+    if doc.flags.inter_company_transfer:
+        from premierprint.services.inter_company import start_transfer
+
+        start_transfer(doc, **doc.flags.inter_company_transfer)
+        return
+
+    if is_consolidation_enabled():
+        frappe.msgprint(
+            _("Sales Invoice will be created by the daily inter-company consolidation"),
+            indicator="blue",
+            alert=True
+        )
+        return
+
+    # Duplicate tekshiruvi (indexed custom_delivery_note_ref)
     existing_si = frappe.db.exists("Sales Invoice", {
         "docstatus": ["<", 2],
         "return_against": ["is", "not set"],
         "custom_delivery_note_ref": doc.name
     })
-    if not existing_si:
-        # Fallback: remarks orqali tekshirish
-        existing_si = frappe.db.exists("Sales Invoice", {
-            "docstatus": ["<", 2],
-            "remarks": ["like", f"%{doc.name}%"]
-        })
 
     if existing_si:
         frappe.msgprint(
@@ -47,38 +71,7 @@ def on_delivery_note_submit(doc, method):
         return
 
     try:
-        si = frappe.new_doc("Sales Invoice")
-        si.customer = doc.customer
-        si.company = doc.company
-        si.posting_date = doc.posting_date
-        si.currency = doc.currency
-        si.selling_price_list = doc.selling_price_list
-        si.is_internal_customer = 1
-        si.represents_company = frappe.db.get_value("Customer", doc.customer, "represents_company")
-        si.update_stock = 0  # Stock already updated by Delivery Note
-        si.remarks = _("Auto-created from Delivery Note {0}").format(doc.name)
-
-        # custom field orqali bog'lash (agar mavjud bo'lsa)
-        if hasattr(si, "custom_delivery_note_ref"):
-            si.custom_delivery_note_ref = doc.name
-
-        for item in doc.items:
-            si.append("items", {
-                "item_code": item.item_code,
-                "item_name": item.item_name,
-                "description": item.description,
-                "qty": item.qty,
-                "uom": item.uom,
-                "rate": item.rate,
-                "amount": item.amount,
-                "warehouse": item.warehouse,
-                "delivery_note": doc.name,
-                "dn_detail": item.name,
-            })
-
-        si.flags.ignore_permissions = True
-        si.insert()
-        si.submit()
+        si = make_sales_invoice_from_delivery_note(doc)
 
         frappe.msgprint(
             _("Sales Invoice <a href='/app/sales-invoice/{0}'>{0}</a> auto-created and submitted").format(si.name),
@@ -87,10 +80,10 @@ def on_delivery_note_submit(doc, method):
         )
 
         # Cross-reference comments
-        doc.add_comment("Info", _("Sales Invoice {0} auto-created").format(
+        add_comment(doc, "Info", _("Sales Invoice {0} auto-created").format(
             f'<a href="/app/sales-invoice/{si.name}">{si.name}</a>'
         ))
-        si.add_comment("Info", _("Created from Delivery Note {0}").format(
+        add_comment(si, "Info", _("Created from Delivery Note {0}").format(
             f'<a href="/app/delivery-note/{doc.name}">{doc.name}</a>'
         ))
 
@@ -105,23 +98,31 @@ def on_delivery_note_submit(doc, method):
         )
 
 
+@traced("invoicing.on_purchase_receipt_submit")
 def on_purchase_receipt_submit(doc, method):
     """Purchase Receipt submit bo'lganda Purchase Invoice avtomatik yaratish.
 
     Faqat internal supplier (ichki taminotchi) uchun ishlaydi.
     PR submit → PI create & submit (update_stock=0).
+    Returns (e.g. Asosiy panel "Reverse" mode) are skipped.
     """
-    if not doc.supplier:
+    if not doc.supplier or doc.is_return:
         return
 
     is_internal = frappe.db.get_value("Supplier", doc.supplier, "is_internal_supplier")
     if not is_internal:
         return
 
-    # Duplicate tekshiruvi
+    # Inter-Company Transfer PR: PI is created by the transfer's next hop
+    from premierprint.services.inter_company import on_receipt_submitted
+
+    if on_receipt_submitted(doc):
+        return
+
+    # Duplicate tekshiruvi (indexed custom_purchase_receipt_ref)
     existing_pi = frappe.db.exists("Purchase Invoice", {
         "docstatus": ["<", 2],
-        "bill_no": doc.name
+        "custom_purchase_receipt_ref": doc.name
     })
 
     if existing_pi:
@@ -131,51 +132,25 @@ def on_purchase_receipt_submit(doc, method):
         )
         return
 
-    try:
-        pi = frappe.new_doc("Purchase Invoice")
-        pi.supplier = doc.supplier
-        pi.company = doc.company
-        pi.posting_date = doc.posting_date
-        pi.currency = doc.currency
-        pi.conversion_rate = doc.conversion_rate
-        pi.buying_price_list = doc.buying_price_list
-        pi.is_internal_supplier = 1
-        pi.represents_company = frappe.db.get_value("Supplier", doc.supplier, "represents_company")
-        pi.bill_no = doc.name  # Reference to Purchase Receipt
-        pi.update_stock = 0  # Stock already updated by Purchase Receipt
-
-        for item in doc.items:
-            pi.append("items", {
-                "item_code": item.item_code,
-                "item_name": item.item_name,
-                "description": item.description,
-                "qty": item.qty,
-                "uom": item.uom,
-                "stock_uom": item.stock_uom,
-                "conversion_factor": item.conversion_factor,
-                "rate": item.rate,
-                "amount": item.amount,
-                "warehouse": item.warehouse,
-                "expense_account": item.expense_account,
-                "cost_center": item.cost_center,
-                "purchase_receipt": doc.name,
-                "pr_detail": item.name,
-            })
+    # Consolidation: the DN is billed by the mirrored PI of its consolidated SI
+    mirrored_pi = get_mirrored_purchase_invoice_for_receipt(doc)
+    if mirrored_pi:
+        frappe.msgprint(
+            _("Purchase Invoice {0} (inter-company consolidation) already bills this receipt").format(mirrored_pi),
+            indicator="orange"
+        )
+        return
 
-        # Taxes (agar mavjud bo'lsa)
-        for tax in doc.get("taxes", []):
-            pi.append("taxes", {
-                "charge_type": tax.charge_type,
-                "account_head": tax.account_head,
-                "description": tax.description,
-                "rate": tax.rate,
-                "tax_amount": tax.tax_amount,
-                "cost_center": tax.cost_center,
-            })
+    if will_be_mirrored_by_consolidation(doc):
+        frappe.msgprint(
+            _("Purchase Invoice will be created by the daily inter-company consolidation"),
+            indicator="blue",
+            alert=True
+        )
+        return
 
-        pi.flags.ignore_permissions = True
-        pi.insert()
-        pi.submit()
+    try:
+        pi = make_purchase_invoice_from_receipt(doc)
 
         frappe.msgprint(
             _("Purchase Invoice <a href='/app/purchase-invoice/{0}'>{0}</a> auto-created and submitted").format(pi.name),
@@ -184,10 +159,10 @@ def on_purchase_receipt_submit(doc, method):
         )
 
         # Cross-reference comments
-        doc.add_comment("Info", _("Purchase Invoice {0} auto-created").format(
+        add_comment(doc, "Info", _("Purchase Invoice {0} auto-created").format(
             f'<a href="/app/purchase-invoice/{pi.name}">{pi.name}</a>'
         ))
-        pi.add_comment("Info", _("Created from Purchase Receipt {0}").format(
+        add_comment(pi, "Info", _("Created from Purchase Receipt {0}").format(
             f'<a href="/app/purchase-receipt/{doc.name}">{doc.name}</a>'
         ))
 
@@ -202,6 +177,7 @@ def on_purchase_receipt_submit(doc, method):
         )
 
 
+@traced("invoicing.on_purchase_invoice_submit")
 def on_purchase_invoice_submit(doc, method):
     """Purchase Invoice submit bo'lganda bog'langan Sales Invoice ni ham submit qilish.
 
@@ -211,7 +187,7 @@ def on_purchase_invoice_submit(doc, method):
         return
 
     is_internal = frappe.db.get_value("Supplier", doc.supplier, "is_internal_supplier")
-    if not is_internal:
+    if not is_internal or doc.flags.inter_company_transfer:
         return
 
     # SI ni topish: inter_company_invoice_reference orqali
@@ -220,14 +196,16 @@ def on_purchase_invoice_submit(doc, method):
     if doc.get("inter_company_invoice_reference"):
         linked_si = doc.inter_company_invoice_reference
 
-    # Fallback: bill_no (PR name) orqali DN ni topib, undan SI ni topish
-    if not linked_si and doc.bill_no:
-        # bill_no = Purchase Receipt name
-        # PR yaratilgan DN bilan bog'langan SI ni izlash
-        linked_si = frappe.db.get_value("Sales Invoice", {
-            "docstatus": 0,  # Draft
-            "remarks": ["like", f"%{doc.bill_no}%"]
-        }, "name")
+    # Fallback: PI -> PR -> DN -> SI, all via indexed reference fields
+    if not linked_si and doc.get("custom_purchase_receipt_ref"):
+        dn_name = frappe.db.get_value(
+            "Purchase Receipt", doc.custom_purchase_receipt_ref, "custom_delivery_note_ref"
+        )
+        if dn_name:
+            linked_si = frappe.db.get_value("Sales Invoice", {
+                "docstatus": 0,  # Draft
+                "custom_delivery_note_ref": dn_name
+            }, "name")
 
     if not linked_si:
         return
@@ -245,7 +223,7 @@ def on_purchase_invoice_submit(doc, method):
                 alert=True
             )
 
-            si_doc.add_comment("Info", _("Auto-submitted via Purchase Invoice {0}").format(
+            add_comment(si_doc, "Info", _("Auto-submitted via Purchase Invoice {0}").format(
                 f'<a href="/app/purchase-invoice/{doc.name}">{doc.name}</a>'
             ))
 
@@ -259,3 +237,279 @@ def on_purchase_invoice_submit(doc, method):
                 _("Sales Invoice {0} ni submit qilishda xatolik: {1}").format(linked_si, str(e)),
                 indicator="orange"
             )
+
+
+def make_sales_invoice_from_delivery_note(dn, submit=True):
+    """Internal customer DN → Sales Invoice (update_stock=0). Returns the SI doc."""
+    si = frappe.new_doc("Sales Invoice")
+    si.customer = dn.customer
+    si.company = dn.company
+    si.posting_date = dn.posting_date
+    si.currency = dn.currency
+    si.selling_price_list = dn.selling_price_list
+    si.is_internal_customer = 1
+    si.represents_company = frappe.db.get_value("Customer", dn.customer, "represents_company")
+    si.update_stock = 0  # Stock already updated by Delivery Note
+    si.remarks = _("Auto-created from Delivery Note {0}").format(dn.name)
+
+    si.custom_delivery_note_ref = dn.name  # indexed dedup reference
+
+    for item in dn.items:
+        si.append("items", {
+            "item_code": item.item_code,
+            "item_name": item.item_name,
+            "description": item.description,
+            "qty": item.qty,
+            "uom": item.uom,
+            "rate": item.rate,
+            "amount": item.amount,
+            "warehouse": item.warehouse,
+            "delivery_note": dn.name,
+            "dn_detail": item.name,
+        })
+
+    si.flags.ignore_permissions = True
+    si.insert()
+    if submit:
+        si.submit()
+    return si
+
+
+def make_purchase_invoice_from_receipt(pr, submit=True, flags=None):
+    """Internal supplier PR → Purchase Invoice (update_stock=0). Returns the PI doc."""
+    pi = frappe.new_doc("Purchase Invoice")
+    pi.supplier = pr.supplier
+    pi.company = pr.company
+    pi.posting_date = pr.posting_date
+    pi.currency = pr.currency
+    pi.conversion_rate = pr.conversion_rate
+    pi.buying_price_list = pr.buying_price_list
+    pi.is_internal_supplier = 1
+    pi.represents_company = frappe.db.get_value("Supplier", pr.supplier, "represents_company")
+    pi.bill_no = pr.name  # Reference to Purchase Receipt
+    pi.custom_purchase_receipt_ref = pr.name  # indexed dedup reference
+    pi.update_stock = 0  # Stock already updated by Purchase Receipt
+
+    for item in pr.items:
+        pi.append("items", {
+            "item_code": item.item_code,
+            "item_name": item.item_name,
+            "description": item.description,
+            "qty": item.qty,
+            "uom": item.uom,
+            "stock_uom": item.stock_uom,
+            "conversion_factor": item.conversion_factor,
+            "rate": item.rate,
+            "amount": item.amount,
+            "warehouse": item.warehouse,
+            "expense_account": item.expense_account,
+            "cost_center": item.cost_center,
+            "purchase_receipt": pr.name,
+            "pr_detail": item.name,
+        })
+
+    # Taxes (agar mavjud bo'lsa)
+    for tax in pr.get("taxes", []):
+        pi.append("taxes", {
+            "charge_type": tax.charge_type,
+            "account_head": tax.account_head,
+            "description": tax.description,
+            "rate": tax.rate,
+            "tax_amount": tax.tax_amount,
+            "cost_center": tax.cost_center,
+        })
+
+    pi.flags.ignore_permissions = True
+    pi.flags.update(flags or {})
+    pi.insert()
+    if submit:
+        pi.submit()
+    return pi
+
+
+# ============================================================
+# DAILY CONSOLIDATION
+# ============================================================
+
+def is_consolidation_enabled():
+    return cint(frappe.db.get_single_value("Premier Print Settings", "consolidate_inter_company_invoices"))
+
+
+def is_mirroring_enabled():
+    return is_consolidation_enabled() and cint(
+        frappe.db.get_single_value("Premier Print Settings", "create_mirrored_purchase_invoice")
+    )
+
+
+def _receipt_delivery_note(pr):
+    return pr.get("custom_delivery_note_ref") or pr.get("inter_company_reference")
+
+
+def get_mirrored_purchase_invoice_for_receipt(pr):
+    """Mirrored PI of the consolidated SI that billed the receipt's Delivery Note, if any."""
+    delivery_note = _receipt_delivery_note(pr)
+    if not delivery_note:
+        return None
+
+    result = frappe.db.sql(
+        """
+        SELECT pi.name
+        FROM `tabSales Invoice Item` sii
+        INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+        INNER JOIN `tabPurchase Invoice` pi ON pi.inter_company_invoice_reference = si.name
+        WHERE sii.delivery_note = %(delivery_note)s
+            AND si.docstatus = 1
+            AND si.is_return = 0
+            AND pi.docstatus < 2
+            AND IFNULL(pi.custom_purchase_receipt_ref, '') = ''
+        LIMIT 1
+        """,
+        {"delivery_note": delivery_note},
+    )
+    return result[0][0] if result else None
+
+
+def will_be_mirrored_by_consolidation(pr):
+    """
+    True when the receipt's DN is left to the daily consolidation and its
+    mirrored PI, so the receipt must not get a PI of its own.
+    """
+    delivery_note = _receipt_delivery_note(pr)
+    if not delivery_note or not is_mirroring_enabled():
+        return False
+    return not frappe.db.exists("Inter-Company Transfer", {"delivery_note": delivery_note})
+
+
+def get_unbilled_internal_delivery_notes(before_date=None):
+    """
+    Submitted internal-customer DNs with nothing billed yet, posted before
+    `before_date` (default: today, i.e. the day is closed). DNs tracked by an
+    Inter-Company Transfer are left out: its Sales Invoice hop bills them.
+
+    Returns:
+        list[dict]: name, company, customer, posting_date, currency,
+                    conversion_rate, selling_price_list
+    """
+    return frappe.db.sql(
+        """
+        SELECT dn.name, dn.company, dn.customer, dn.posting_date, dn.currency,
+            dn.conversion_rate, dn.selling_price_list
+        FROM `tabDelivery Note` dn
+        INNER JOIN `tabCustomer` c ON c.name = dn.customer
+        WHERE dn.docstatus = 1
+            AND dn.is_return = 0
+            AND c.is_internal_customer = 1
+            AND IFNULL(dn.per_billed, 0) = 0
+            AND dn.posting_date < %(before_date)s
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabInter-Company Transfer` t WHERE t.delivery_note = dn.name
+            )
+        ORDER BY dn.company, dn.customer, dn.posting_date, dn.name
+        """,
+        {"before_date": getdate(before_date or nowdate())},
+        as_dict=True,
+    )
+
+
+def consolidate_inter_company_invoices(before_date=None):
+    """
+    Scheduler job (daily): one Sales Invoice per (company, customer, day,
+    currency, rate) for all unbilled internal DNs, every row linked back through
+    delivery_note / dn_detail, plus the mirrored Purchase Invoice in the
+    customer's company.
+
+    Each group is committed on its own; a failing group is logged and retried
+    on the next run.
+
+    Returns:
+        list[dict]: {"sales_invoice", "purchase_invoice", "delivery_notes"} per group
+    """
+    if not is_consolidation_enabled():
+        return []
+
+    groups = {}
+    for dn in get_unbilled_internal_delivery_notes(before_date):
+        key = (dn.company, dn.customer, dn.posting_date, dn.currency, dn.conversion_rate)
+        groups.setdefault(key, []).append(dn.name)
+
+    mirror_pi = is_mirroring_enabled()
+    results = []
+
+    for (company, customer, posting_date, _currency, _rate), dn_names in groups.items():
+        try:
+            si = make_consolidated_sales_invoice(dn_names)
+            pi_name = make_mirrored_purchase_invoice(si) if mirror_pi else None
+            frappe.db.commit()
+            results.append({
+                "sales_invoice": si.name,
+                "purchase_invoice": pi_name,
+                "delivery_notes": dn_names,
+            })
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(
+                title=_("Inter-Company Consolidation Failed: {0} / {1} / {2}").format(company, customer, posting_date),
+                message=frappe.get_traceback()
+            )
+
+    frappe.db.set_single_value("Premier Print Settings", "last_consolidation_run", now_datetime())
+    frappe.db.commit()
+    return results
+
+
+def make_consolidated_sales_invoice(dn_names):
+    """One submitted SI covering every row of the given DNs (same company/customer/day)."""
+    dns = [frappe.get_doc("Delivery Note", name) for name in dn_names]
+    first = dns[0]
+
+    si = frappe.new_doc("Sales Invoice")
+    si.customer = first.customer
+    si.company = first.company
+    si.posting_date = first.posting_date
+    si.set_posting_time = 1
+    si.currency = first.currency
+    si.conversion_rate = first.conversion_rate
+    si.selling_price_list = first.selling_price_list
+    si.is_internal_customer = 1
+    si.represents_company = frappe.db.get_value("Customer", first.customer, "represents_company")
+    si.update_stock = 0  # Stock already updated by Delivery Notes
+    si.remarks = _("Consolidated from Delivery Notes {0}").format(", ".join(dn_names))
+    if len(dns) == 1:
+        si.custom_delivery_note_ref = first.name
+
+    for dn in dns:
+        for item in dn.items:
+            si.append("items", {
+                "item_code": item.item_code,
+                "item_name": item.item_name,
+                "description": item.description,
+                "qty": item.qty,
+                "uom": item.uom,
+                "rate": item.rate,
+                "amount": item.amount,
+                "warehouse": item.warehouse,
+                "delivery_note": dn.name,
+                "dn_detail": item.name,
+            })
+
+    si.flags.ignore_permissions = True
+    si.insert()
+    si.submit()
+    return si
+
+
+def make_mirrored_purchase_invoice(si):
+    """Mirror a consolidated SI in the customer's company via ERPNext's inter-company mapper."""
+    from erpnext.accounts.doctype.sales_invoice.sales_invoice import make_inter_company_purchase_invoice
+
+    existing = frappe.db.get_value(
+        "Purchase Invoice", {"docstatus": ["<", 2], "inter_company_invoice_reference": si.name}, "name"
+    )
+    if existing:
+        return existing
+
+    pi = make_inter_company_purchase_invoice(si.name)
+    pi.flags.ignore_permissions = True
+    pi.insert()
+    pi.submit()
+    return pi.name
@@ -0,0 +1,229 @@
+"""
+Material Requirement Planning
+=============================
+Explodes the BOMs of many open Sales Order Items at once (shared per-unit
+cache from utils/stock_entry.get_exploded_bom), sums the raw materials per
+item + warehouse and nets them against `tabBin`.projected_qty in one query.
+
+The shortage list can be turned into draft 'Запрос материалов' Asosiy panels
+(one per warehouse) with create_material_request_panels().
+
+Quantities:
+	- Requirement is based on the still-undelivered qty (qty - delivered_qty)
+	  of each Sales Order Item, exploded through the item's default BOM.
+	- projected_qty already subtracts reservations and adds ordered /
+	  requested qty, so shortage = required - projected (never negative).
+"""
+
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, nowdate
+
+from premierprint.utils import timeline
+from premierprint.utils.stock_entry import get_exploded_bom, scale_bom_explosion
+
+MATERIAL_REQUEST_OPERATION = "Запрос материалов"
+
+
+@frappe.whitelist()
+def get_material_requirements(sales_order_items=None, from_date=None, to_date=None, company=None, warehouse=None):
+	"""
+	Aggregated raw-material requirements and shortages for open Sales Order Items.
+
+	Args:
+		sales_order_items: list (or JSON list) of Sales Order Item names
+		from_date, to_date: Delivery date range (used when no items are given)
+		company          : Restrict to one company
+		warehouse        : Count every requirement against this warehouse instead
+		                   of the BOM source / item default warehouse
+
+	Returns:
+		dict: {"requirements": [...], "shortages": [...], "missing_bom": [...]}
+		      each requirement: item_code, item_name, stock_uom, warehouse,
+		      required_qty, projected_qty, shortage_qty, sales_order_items
+	"""
+	frappe.has_permission("Sales Order", "read", throw=True)
+
+	sales_order_items = frappe.parse_json(sales_order_items) or []
+	if not sales_order_items and not (from_date or to_date):
+		frappe.throw(_("Select Sales Order Items or a delivery date range"))
+
+	order_lines = _get_open_order_lines(sales_order_items, from_date, to_date, company)
+
+	requirements = {}
+	missing_bom = []
+	for line in order_lines:
+		if not line.bom:
+			missing_bom.append(line.name)
+			continue
+
+		exploded = scale_bom_explosion(get_exploded_bom(line.bom, line.company), line.pending_qty)
+		for item_code, item_data in exploded.items():
+			target_warehouse = (
+				warehouse
+				or item_data.get("source_warehouse")
+				or item_data.get("default_warehouse")
+				or line.warehouse
+			)
+			row = requirements.setdefault(
+				(item_code, target_warehouse),
+				{
+					"item_code": item_code,
+					"warehouse": target_warehouse,
+					"stock_uom": item_data["stock_uom"],
+					"required_qty": 0.0,
+					"sales_order_items": [],
+				},
+			)
+			row["required_qty"] += flt(item_data["qty"])
+			row["sales_order_items"].append(line.name)
+
+	_net_against_bins(requirements)
+
+	rows = sorted(requirements.values(), key=lambda r: (r["warehouse"] or "", r["item_code"]))
+	return {
+		"requirements": rows,
+		"shortages": [row for row in rows if row["shortage_qty"] > 0],
+		"missing_bom": missing_bom,
+	}
+
+
+@frappe.whitelist()
+def create_material_request_panels(shortages, posting_date=None):
+	"""
+	Create one draft 'Запрос материалов' Asosiy panel per warehouse.
+
+	Args:
+		shortages   : list (or JSON list) of rows from get_material_requirements
+		              (item_code, warehouse, shortage_qty, stock_uom)
+		posting_date: Panel posting date (default today)
+
+	Returns:
+		dict: {"created": [panel names], "errors": [{"warehouse", "error"}]}
+	"""
+	frappe.has_permission("Asosiy panel", "create", throw=True)
+
+	by_warehouse = defaultdict(list)
+	for row in frappe.parse_json(shortages) or []:
+		row = frappe._dict(row)
+		if row.warehouse and flt(row.shortage_qty) > 0:
+			by_warehouse[row.warehouse].append(row)
+
+	if not by_warehouse:
+		return {"created": [], "errors": []}
+
+	warehouse_company = dict(
+		frappe.get_all(
+			"Warehouse",
+			filters={"name": ["in", list(by_warehouse)]},
+			fields=["name", "company"],
+			as_list=True,
+		)
+	)
+	item_names = dict(
+		frappe.get_all(
+			"Item",
+			filters={"name": ["in", list({row.item_code for rows in by_warehouse.values() for row in rows})]},
+			fields=["name", "item_name"],
+			as_list=True,
+		)
+	)
+
+	created, errors = [], []
+	for warehouse, rows in by_warehouse.items():
+		timeline.savepoint("material_request_panel")
+		try:
+			panel = frappe.get_doc({
+				"doctype": "Asosiy panel",
+				"operation_type": MATERIAL_REQUEST_OPERATION,
+				"company": warehouse_company.get(warehouse),
+				"posting_date": getdate(posting_date or nowdate()),
+				"from_warehouse": warehouse,
+				"items": [
+					{
+						"item_code": row.item_code,
+						"item_name": item_names.get(row.item_code),
+						"uom": row.stock_uom,
+						"qty": flt(row.shortage_qty),
+						"is_stock_item": 1,
+					}
+					for row in rows
+				],
+			})
+			panel.insert()
+			created.append(panel.name)
+		except Exception as e:
+			timeline.rollback_to("material_request_panel")
+			errors.append({"warehouse": warehouse, "error": str(e)})
+			frappe.clear_messages()
+
+	return {"created": created, "errors": errors}
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _get_open_order_lines(sales_order_items, from_date, to_date, company):
+	conditions = []
+	values = {}
+	if sales_order_items:
+		conditions.append("AND soi.name IN %(sales_order_items)s")
+		values["sales_order_items"] = tuple(sales_order_items)
+	if from_date:
+		conditions.append("AND soi.delivery_date >= %(from_date)s")
+		values["from_date"] = getdate(from_date)
+	if to_date:
+		conditions.append("AND soi.delivery_date <= %(to_date)s")
+		values["to_date"] = getdate(to_date)
+	if company:
+		conditions.append("AND so.company = %(company)s")
+		values["company"] = company
+
+	# pending_qty in stock units: the BOM explosion is per stock unit of the finished good
+	return frappe.db.sql("""
+		SELECT
+			soi.name,
+			soi.item_code,
+			soi.warehouse,
+			so.company,
+			i.default_bom AS bom,
+			(soi.qty - IFNULL(soi.delivered_qty, 0)) * IFNULL(NULLIF(soi.conversion_factor, 0), 1) AS pending_qty
+		FROM `tabSales Order Item` soi
+		INNER JOIN `tabSales Order` so ON so.name = soi.parent
+		INNER JOIN `tabItem` i ON i.name = soi.item_code
+		WHERE so.docstatus = 1
+			AND so.status NOT IN ('Closed', 'Completed', 'Cancelled', 'On Hold')
+			AND soi.qty > IFNULL(soi.delivered_qty, 0)
+			{conditions}
+		ORDER BY soi.delivery_date, soi.parent, soi.idx
+	""".format(conditions=" ".join(conditions)), values, as_dict=True)
+
+
+def _net_against_bins(requirements):
+	"""Fill projected_qty / shortage_qty / item_name for every requirement row (one Bin query)."""
+	if not requirements:
+		return
+
+	item_codes = tuple({item_code for item_code, _warehouse in requirements})
+	warehouses = tuple({warehouse for _item_code, warehouse in requirements if warehouse})
+
+	projected = {}
+	if warehouses:
+		for row in frappe.db.sql("""
+			SELECT item_code, warehouse, projected_qty
+			FROM `tabBin`
+			WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+		""", {"item_codes": item_codes, "warehouses": warehouses}, as_dict=True):
+			projected[(row.item_code, row.warehouse)] = flt(row.projected_qty)
+
+	item_names = dict(
+		frappe.get_all("Item", filters={"name": ["in", list(item_codes)]}, fields=["name", "item_name"], as_list=True)
+	)
+
+	for key, row in requirements.items():
+		row["item_name"] = item_names.get(row["item_code"])
+		row["projected_qty"] = projected.get(key, 0.0)
+		row["shortage_qty"] = max(flt(row["required_qty"]) - row["projected_qty"], 0.0)
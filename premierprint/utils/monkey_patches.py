@@ -0,0 +1,73 @@
+"""
+ERPNext Monkey Patches
+======================
+Single registry of every runtime patch Premier Print applies to ERPNext.
+
+Nothing is imported or patched when `premierprint` is imported. The patches
+are applied lazily, once per process, from the `before_request` and
+`before_job` hooks (hooks.py). Anything else that needs them (bench execute,
+console, tests) calls apply_patches() itself — it is idempotent.
+
+Registered patches:
+	validate_warehouse_company  (erpnext.stock.utils and the Stock Ledger
+	Entry module, which imports it by name)
+		Skipped while frappe.flags.ignore_validate_warehouse_company is set,
+		for inter-company stock transfers.
+"""
+
+import functools
+import importlib
+
+import frappe
+
+# Marker on our wrappers: original function, so re-applying never double-wraps
+ORIGINAL_ATTR = "_premierprint_original"
+
+_applied = False
+
+
+def _skip_validate_warehouse_company(original):
+	@functools.wraps(original)
+	def validate_warehouse_company(warehouse, company):
+		if getattr(frappe.flags, "ignore_validate_warehouse_company", False):
+			return  # inter-company transfer
+		return original(warehouse, company)
+
+	return validate_warehouse_company
+
+
+# (module, attribute, wrapper factory)
+PATCHES = (
+	("erpnext.stock.utils", "validate_warehouse_company", _skip_validate_warehouse_company),
+	(
+		"erpnext.stock.doctype.stock_ledger_entry.stock_ledger_entry",
+		"validate_warehouse_company",
+		_skip_validate_warehouse_company,
+	),
+)
+
+
+def apply_patches(*args, **kwargs):
+	"""before_request / before_job hook: apply every registered patch once per process."""
+	global _applied
+	if _applied:
+		return
+
+	for module_name, attribute, make_wrapper in PATCHES:
+		try:
+			module = importlib.import_module(module_name)
+		except ImportError:
+			continue  # erpnext not installed on this site
+		_patch(module, attribute, make_wrapper)
+
+	_applied = True
+
+
+def _patch(module, attribute, make_wrapper):
+	current = getattr(module, attribute, None)
+	if current is None or hasattr(current, ORIGINAL_ATTR):
+		return
+
+	wrapper = make_wrapper(current)
+	setattr(wrapper, ORIGINAL_ATTR, current)
+	setattr(module, attribute, wrapper)
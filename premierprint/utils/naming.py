@@ -2,43 +2,150 @@
 Auto-increment naming for Item and Customer
 Cheksiz raqamlar - million, milliard va undan ko'p!
 """
+from functools import partial
+
 import frappe
 
+# tabSeries rows holding the last issued numeric ID
+ITEM_ID_SERIES = "premierprint-item-id"
+CUSTOMER_ID_SERIES = "premierprint-customer-id"
+
+# doctype -> (series, numeric name column) used for seeding / collision checks
+ID_SERIES = {
+    "Item": (ITEM_ID_SERIES, "item_code"),
+    "Customer": (CUSTOMER_ID_SERIES, "name"),
+}
+
+
+def _get_max_numeric_id(doctype):
+    """Full scan for the highest numeric ID — only used to seed / resync the counter."""
+    column = ID_SERIES[doctype][1]
+    max_id = frappe.db.sql("""
+        SELECT MAX(CAST(`{column}` AS UNSIGNED)) as max_id
+        FROM `tab{doctype}`
+        WHERE `{column}` REGEXP '^[0-9]+$'
+    """.format(column=column, doctype=doctype), as_dict=True)
+
+    if max_id and max_id[0].get('max_id'):
+        return int(max_id[0]['max_id'])
+    return 0
+
+
+def _lock_counter(doctype):
+    """
+    Return the current counter value with the tabSeries row locked (FOR UPDATE)
+    until the transaction ends. The row is seeded from the table max on first use.
+    """
+    series = ID_SERIES[doctype][0]
+    current = frappe.db.sql(
+        "SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (series,)
+    )
+    if not current:
+        frappe.db.sql(
+            "INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)",
+            (series, _get_max_numeric_id(doctype)),
+        )
+        current = frappe.db.sql(
+            "SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (series,)
+        )
+    return int(current[0][0])
+
+
+def _set_counter(doctype, value):
+    frappe.db.sql(
+        "UPDATE `tabSeries` SET `current` = %s WHERE `name` = %s",
+        (value, ID_SERIES[doctype][0]),
+    )
+
+
+def _any_taken(doctype, start, count):
+    """True if an ID in [start, start + count) already exists (created by hand / legacy)."""
+    column = ID_SERIES[doctype][1]
+    return bool(frappe.db.sql("""
+        SELECT 1 FROM `tab{doctype}`
+        WHERE `{column}` IN %(ids)s
+        LIMIT 1
+    """.format(column=column, doctype=doctype), {"ids": tuple(str(i) for i in range(start, start + count))}))
+
+
+def allocate_ids(doctype, count=1):
+    """
+    Atomically reserve `count` consecutive numeric IDs for Item / Customer.
+
+    The tabSeries row stays locked until commit, so concurrent inserts queue
+    up instead of racing for the same MAX()+1. If the range collides with an
+    existing record, the counter is resynced from the table max once.
+
+    Returns:
+        list[str]: The reserved IDs, ascending
+    """
+    count = max(int(count or 1), 1)
+    current = _lock_counter(doctype)
+
+    start = current + 1
+    if _any_taken(doctype, start, count):
+        start = max(current, _get_max_numeric_id(doctype)) + 1
+
+    _set_counter(doctype, start + count - 1)
+    return [str(i) for i in range(start, start + count)]
+
+
+# Data Import: IDs are reserved in blocks instead of one counter round-trip per row.
+# There is no separate Data Import hook: the importer sets frappe.flags.in_import,
+# and CustomItem / CustomCustomer naming checks it here.
+IMPORT_BLOCK_SIZE = 100
+
+
+def _allocate_one(doctype):
+    if not frappe.flags.in_import:
+        return allocate_ids(doctype)[0]
+
+    # Block is kept for the import job; IDs left unused when it ends become gaps
+    pools = frappe.local.__dict__.setdefault("premierprint_id_pools", {})
+    pool = pools.setdefault(doctype, [])
+    if not pool:
+        pool.extend(allocate_ids(doctype, IMPORT_BLOCK_SIZE))
+        # The counter update commits with the row that reserved the block. If that
+        # row is rolled back the counter is too, so the block must not be used.
+        frappe.db.after_rollback.add(partial(_drop_id_pool, doctype))
+    return pool.pop(0)
+
+
+def _drop_id_pool(doctype):
+    frappe.local.__dict__.get("premierprint_id_pools", {}).pop(doctype, None)
+
+
+def allocate_item_id():
+    return _allocate_one("Item")
+
+
+def allocate_customer_id():
+    return _allocate_one("Customer")
+
+
 @frappe.whitelist()
 def get_next_item_id():
     """
     Keyingi Item ID ni qaytaradi (API method)
-    Faqat 1-5 xonali raqamlarni hisobga oladi (eski 1100002 kabi uzun raqamlar ignore)
+    Faqat ko'rsatish uchun — counter o'zgarmaydi, haqiqiy ID insert paytida beriladi.
     """
-    max_id = frappe.db.sql("""
-        SELECT MAX(CAST(item_code AS UNSIGNED)) as max_id
-        FROM `tabItem`
-        WHERE item_code REGEXP '^[0-9]+$'
-    """, as_dict=True)
-
-    next_id = 1
-    if max_id and max_id[0].get('max_id'):
-        next_id = int(max_id[0]['max_id']) + 1
-
-    return str(next_id)
+    return str(_peek_counter("Item") + 1)
 
 
 @frappe.whitelist()
 def get_next_customer_id():
     """
     Keyingi Customer ID ni qaytaradi (API method)
+    Faqat ko'rsatish uchun — counter o'zgarmaydi.
     """
-    max_id = frappe.db.sql("""
-        SELECT MAX(CAST(name AS UNSIGNED)) as max_id
-        FROM `tabCustomer`
-        WHERE name REGEXP '^[0-9]+$'
-    """, as_dict=True)
+    return str(_peek_counter("Customer") + 1)
 
-    next_id = 1
-    if max_id and max_id[0].get('max_id'):
-        next_id = int(max_id[0]['max_id']) + 1
 
-    return str(next_id)
+def _peek_counter(doctype):
+    current = frappe.db.get_value("Series", ID_SERIES[doctype][0], "current")
+    if current is None:
+        return _get_max_numeric_id(doctype)
+    return int(current)
 
 
 def autoname_item(doc, method):
@@ -47,8 +154,7 @@ def autoname_item(doc, method):
     """
     # Yangi Item yaratilayotganini tekshirish (eski ITEM- formatidan ham tozalash)
     if not doc.item_code or doc.item_code.startswith("new-item") or doc.item_code.startswith("ITEM-"):
-        next_id = get_next_item_id()
-        doc.item_code = next_id
+        doc.item_code = allocate_item_id()
 
     # Name ni ham raqam qilish (eski format bo'lsa ham)
     if not doc.name or doc.name.startswith("new-item") or doc.name.startswith("ITEM-"):
@@ -61,7 +167,7 @@ def autoname_customer(doc, method):
     Customer uchun avtomatik raqam berish: 1, 2, 3, 4, ... (cheksiz)
     """
     if not doc.name or doc.name.startswith("new-customer"):
-        doc.name = get_next_customer_id()
+        doc.name = allocate_customer_id()
 
 def set_smart_id(doc, method):
     """
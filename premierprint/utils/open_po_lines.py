@@ -0,0 +1,152 @@
+"""
+Open Purchase Order Lines
+=========================
+`Open Purchase Order Line` holds one row per submitted Purchase Order Item
+that still has pending qty (qty - received_qty > 0). Asosiy panel's PO
+selection (get_purchase_orders_for_selection) and item fetch
+(get_items_from_purchase_orders) read only this table.
+
+Rows of a PO are rebuilt from `tabPurchase Order Item` whenever something
+changes its received qty:
+
+	Purchase Order    on_submit / on_cancel / on_update_after_submit
+	Purchase Receipt  on_submit / on_cancel
+	Purchase Invoice  on_submit / on_cancel (update_stock invoices)
+
+PO status (Closed / On Hold / Completed) is checked at read time, since
+closing a PO does not fire doc_events.
+
+Full rebuild:
+	bench --site <site> execute premierprint.utils.open_po_lines.rebuild_open_po_lines
+"""
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+OPEN_LINE_DOCTYPE = "Open Purchase Order Line"
+REBUILD_BATCH_SIZE = 500
+
+LINE_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"purchase_order",
+	"purchase_order_item",
+	"po_idx",
+	"transaction_date",
+	"supplier",
+	"company",
+	"item_code",
+	"item_name",
+	"uom",
+	"qty",
+	"received_qty",
+	"pending_qty",
+	"rate",
+)
+
+
+# ============================================================
+# DOC EVENTS
+# ============================================================
+
+def on_purchase_order_change(doc, method=None):
+	"""Purchase Order on_submit / on_cancel / on_update_after_submit."""
+	sync_open_po_lines([doc.name])
+
+
+def on_receipt_change(doc, method=None):
+	"""Purchase Receipt / Purchase Invoice on_submit / on_cancel."""
+	if doc.doctype == "Purchase Invoice" and not doc.get("update_stock"):
+		return
+
+	sync_open_po_lines({row.purchase_order for row in doc.items if row.get("purchase_order")})
+
+
+# ============================================================
+# MAINTENANCE
+# ============================================================
+
+def sync_open_po_lines(purchase_orders):
+	"""Replace the open lines of the given Purchase Orders with their current pending qty."""
+	purchase_orders = [po for po in purchase_orders if po]
+	if not purchase_orders:
+		return
+
+	frappe.db.delete(OPEN_LINE_DOCTYPE, {"purchase_order": ["in", purchase_orders]})
+	_insert_lines(_get_pending_lines(purchase_orders))
+
+
+def rebuild_open_po_lines():
+	"""Rebuild the whole table (patch / bench execute)."""
+	frappe.db.delete(OPEN_LINE_DOCTYPE)
+
+	purchase_orders = frappe.get_all("Purchase Order", filters={"docstatus": 1}, pluck="name")
+	for start in range(0, len(purchase_orders), REBUILD_BATCH_SIZE):
+		_insert_lines(_get_pending_lines(purchase_orders[start : start + REBUILD_BATCH_SIZE]))
+
+	frappe.db.commit()
+
+
+def _get_pending_lines(purchase_orders):
+	return frappe.db.sql(
+		"""
+		SELECT
+			poi.name AS purchase_order_item,
+			poi.parent AS purchase_order,
+			poi.idx AS po_idx,
+			po.transaction_date,
+			po.supplier,
+			po.company,
+			poi.item_code,
+			poi.item_name,
+			COALESCE(NULLIF(poi.uom, ''), poi.stock_uom) AS uom,
+			poi.qty,
+			poi.received_qty,
+			poi.rate
+		FROM `tabPurchase Order Item` poi
+		INNER JOIN `tabPurchase Order` po ON po.name = poi.parent
+		WHERE po.docstatus = 1
+			AND po.name IN %(purchase_orders)s
+			AND poi.qty > poi.received_qty
+		""",
+		{"purchase_orders": tuple(purchase_orders)},
+		as_dict=True,
+	)
+
+
+def _insert_lines(lines):
+	if not lines:
+		return
+
+	now = now_datetime()
+	user = frappe.session.user
+	frappe.db.bulk_insert(
+		OPEN_LINE_DOCTYPE,
+		fields=LINE_FIELDS,
+		values=[
+			(
+				line.purchase_order_item,
+				now,
+				now,
+				user,
+				user,
+				line.purchase_order,
+				line.purchase_order_item,
+				line.po_idx,
+				line.transaction_date,
+				line.supplier,
+				line.company,
+				line.item_code,
+				line.item_name,
+				line.uom,
+				flt(line.qty),
+				flt(line.received_qty),
+				flt(line.qty) - flt(line.received_qty),
+				flt(line.rate),
+			)
+			for line in lines
+		],
+	)
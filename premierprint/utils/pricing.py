@@ -1,6 +1,27 @@
+import hashlib
+
 import frappe
 from frappe import _
-from frappe.utils import flt, formatdate
+from frappe.utils import cint, flt, formatdate, getdate, now_datetime
+
+
+# ============================================================
+# LAST SALES PRICE INDEX
+# "Last Sales Price" rows are keyed item_code::customer and item_code::*
+# and kept current on Sales Invoice submit / cancel, so a lookup is one
+# primary-key read.
+# ============================================================
+
+ANY_CUSTOMER = "*"
+NAME_LENGTH = 140  # varchar(140) name column
+
+
+def get_last_sales_price_key(item_code, customer=None):
+	"""Document name of the Last Sales Price row for (item_code, customer)."""
+	key = "{0}::{1}".format(item_code, customer or ANY_CUSTOMER)
+	if len(key) > NAME_LENGTH:
+		key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+	return key
 
 
 @frappe.whitelist()
@@ -15,124 +36,332 @@ def get_last_sales_price(item_code, customer=None):
 	Returns:
 		dict: {rate: narx, date: sana, invoice: invoice nomi}
 	"""
+	fields = ["rate", "posting_date", "sales_invoice"]
 
-	filters = {
-		"item_code": item_code,
-		"docstatus": 1  # Faqat submitted
-	}
-
-	# Agar customer berilgan bo'lsa, faqat shu mijoz uchun
+	row = None
 	if customer:
-		filters["parent"] = frappe.db.sql("""
-										  SELECT name
-										  FROM `tabSales Invoice`
-										  WHERE customer = %s
-											AND docstatus = 1
-										  """, customer, as_list=True)
-
-		if not filters["parent"]:
-			return get_last_sales_price_any_customer(item_code)
-
-	# Eng oxirgi Sales Invoice Item-ni topish
-	last_item = frappe.db.get_all(
-		"Sales Invoice Item",
-		filters=filters,
-		fields=["rate", "parent", "creation"],
-		order_by="creation desc",
-		limit=1
-	)
+		row = frappe.db.get_value(
+			"Last Sales Price", get_last_sales_price_key(item_code, customer), fields, as_dict=True
+		)
 
-	if not last_item:
-		# Agar topilmasa, har qanday mijoz uchun
+	# Agar topilmasa, har qanday mijoz uchun
+	if not row:
 		return get_last_sales_price_any_customer(item_code)
 
-	item = last_item[0]
+	return _format_last_price(row)
+
 
-	# Invoice sanasini olish
-	invoice_date = frappe.db.get_value(
-		"Sales Invoice",
-		item.parent,
-		"posting_date"
+def get_last_sales_price_any_customer(item_code):
+	"""
+	Har qanday mijoz uchun eng oxirgi narx
+	"""
+	row = frappe.db.get_value(
+		"Last Sales Price",
+		get_last_sales_price_key(item_code),
+		["rate", "posting_date", "sales_invoice"],
+		as_dict=True,
 	)
+	if not row:
+		return {"rate": 0, "date": None, "invoice": None}
 
+	return _format_last_price(row)
+
+
+def _format_last_price(row):
 	return {
-		"rate": flt(item.rate, 2),
-		"date": formatdate(invoice_date),
-		"invoice": item.parent
+		"rate": flt(row.rate, 2),
+		"date": formatdate(row.posting_date),
+		"invoice": row.sales_invoice
 	}
 
 
-def get_last_sales_price_any_customer(item_code):
+def update_last_sales_price(doc, method=None):
 	"""
-	Har qanday mijoz uchun eng oxirgi narx
+	Sales Invoice on_submit: upsert the (item, customer) and (item, *) rows.
+
+	One multi-row INSERT ... ON DUPLICATE KEY UPDATE; an existing row is only
+	overwritten when this invoice row is newer (source_creation), so late
+	submits of older drafts do not regress the price.
 	"""
-	last_item = frappe.db.get_all(
-		"Sales Invoice Item",
-		filters={
-			"item_code": item_code,
-			"docstatus": 1
-		},
-		fields=["rate", "parent", "creation"],
-		order_by="creation desc",
-		limit=1
+	latest = {}
+	for item in doc.items:
+		if not item.item_code:
+			continue
+		for customer in (doc.customer, None):
+			# later rows of the same invoice win, like ORDER BY creation, idx
+			latest[(item.item_code, customer)] = item
+
+	if not latest:
+		return
+
+	now = now_datetime()
+	values = []
+	for (item_code, customer), item in latest.items():
+		values.append((
+			get_last_sales_price_key(item_code, customer), now, now, frappe.session.user, frappe.session.user,
+			item_code, customer, flt(item.rate), doc.currency, doc.name, doc.posting_date,
+			item.creation or doc.creation or now,
+		))
+
+	placeholders = ", ".join(["(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s, %s, %s)"] * len(values))
+	newer = "VALUES(source_creation) >= IFNULL(source_creation, '1900-01-01')"
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabLast Sales Price`
+			(name, creation, modified, owner, modified_by, docstatus, idx,
+			item_code, customer, rate, currency, sales_invoice, posting_date, source_creation)
+		VALUES {placeholders}
+		ON DUPLICATE KEY UPDATE
+			rate = IF({newer}, VALUES(rate), rate),
+			currency = IF({newer}, VALUES(currency), currency),
+			sales_invoice = IF({newer}, VALUES(sales_invoice), sales_invoice),
+			posting_date = IF({newer}, VALUES(posting_date), posting_date),
+			modified = IF({newer}, VALUES(modified), modified),
+			source_creation = IF({newer}, VALUES(source_creation), source_creation)
+		""".format(placeholders=placeholders, newer=newer),
+		tuple(v for row in values for v in row),
 	)
 
-	if not last_item:
-		return {"rate": 0, "date": None, "invoice": None}
 
-	item = last_item[0]
-	invoice_date = frappe.db.get_value(
-		"Sales Invoice",
-		item.parent,
-		"posting_date"
+def on_sales_invoice_cancel(doc, method=None):
+	"""
+	Sales Invoice on_cancel: rows pointing at this invoice are recomputed from
+	the remaining submitted invoices of the affected items.
+	"""
+	item_codes = frappe.get_all(
+		"Last Sales Price", filters={"sales_invoice": doc.name}, pluck="item_code", distinct=True
 	)
+	if item_codes:
+		rebuild_last_sales_prices(item_codes=item_codes)
+
+
+def rebuild_last_sales_prices(item_codes=None):
+	"""
+	Recompute Last Sales Price rows from submitted Sales Invoices with one
+	ROW_NUMBER() window query per key type.
+
+	Args:
+		item_codes: Limit to these items (default: everything)
+
+	Returns:
+		int: Number of rows in the index afterwards
+	"""
+	conditions = ""
+	values = {"name_length": NAME_LENGTH, "any_customer": ANY_CUSTOMER, "user": frappe.session.user}
+	if item_codes:
+		conditions = "AND sii.item_code IN %(item_codes)s"
+		values["item_codes"] = tuple(item_codes)
+		frappe.db.sql("DELETE FROM `tabLast Sales Price` WHERE item_code IN %(item_codes)s", values)
+	else:
+		frappe.db.sql("DELETE FROM `tabLast Sales Price`")
+
+	for partition, customer_expr in (("sii.item_code, si.customer", "customer"), ("sii.item_code", "NULL")):
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabLast Sales Price`
+				(name, creation, modified, owner, modified_by, docstatus, idx,
+				item_code, customer, rate, currency, sales_invoice, posting_date, source_creation)
+			SELECT
+				IF(CHAR_LENGTH(k.lsp_key) > %(name_length)s, SHA1(k.lsp_key), k.lsp_key),
+				NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+				k.item_code, {customer_expr}, k.rate, k.currency, k.parent, k.posting_date, k.creation
+			FROM (
+				SELECT
+					ranked.*,
+					CONCAT(ranked.item_code, '::', IFNULL({customer_expr}, %(any_customer)s)) AS lsp_key
+				FROM (
+					SELECT sii.item_code, si.customer, sii.rate, si.currency, sii.parent,
+						si.posting_date, sii.creation,
+						ROW_NUMBER() OVER (
+							PARTITION BY {partition}
+							ORDER BY sii.creation DESC, sii.idx DESC
+						) AS rn
+					FROM `tabSales Invoice Item` sii
+					INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+					WHERE sii.docstatus = 1
+						AND IFNULL(sii.item_code, '') != ''
+						{conditions}
+				) ranked
+				WHERE ranked.rn = 1
+			) k
+			""".format(partition=partition, customer_expr=customer_expr, conditions=conditions),
+			values,
+		)
+
+	return frappe.db.count("Last Sales Price")
 
-	return {
-		"rate": flt(item.rate, 2),
-		"date": formatdate(invoice_date),
-		"invoice": item.parent
-	}
+
+# ============================================================
+# PRICE HISTORY
+# Ordered by (posting_date, invoice, idx) DESC; the same triple is the keyset
+# cursor for deeper pages. add_price_history_indexes patch adds the indexes.
+# ============================================================
+
+DEFAULT_HISTORY_LIMIT = 5
+MAX_HISTORY_LIMIT = 100
 
 
 @frappe.whitelist()
-def get_price_history(item_code, customer=None, limit=5):
+def get_price_history(item_code, customer=None, limit=DEFAULT_HISTORY_LIMIT):
 	"""
 	Narx tarixini ko'rsatish (ixtiyoriy)
 
 	Returns:
 		list: [{rate, date, invoice, customer}]
 	"""
+	return get_price_histories([item_code], customer=customer, limit=limit)[item_code]["history"]
 
-	sql = """
-		  SELECT si_item.rate, \
-				 si.posting_date as date,
-            si.name as invoice,
-            si.customer
-		  FROM `tabSales Invoice Item` si_item
-			  INNER JOIN `tabSales Invoice` si \
-		  ON si_item.parent = si.name
-		  WHERE si_item.item_code = %s
-			AND si.docstatus = 1
-			  {customer_filter}
-		  ORDER BY si.posting_date DESC
-			  LIMIT %s \
-		  """
+
+@frappe.whitelist()
+def get_price_histories(item_codes, customer=None, limit=DEFAULT_HISTORY_LIMIT):
+	"""
+	Oxirgi N narx — bir nechta item uchun bitta so'rovda (ROW_NUMBER window).
+
+	Args:
+		item_codes: list (or JSON list) of item codes
+		customer  : Faqat shu mijoz uchun (ixtiyoriy)
+		limit     : Har bir item uchun nechta yozuv
+
+	Returns:
+		dict: {item_code: {"history": [{rate, date, invoice, customer}],
+		                   "next_cursor": str | None}}
+	"""
+	item_codes = _parse_item_codes(item_codes)
+	limit = _clamp_limit(limit)
+	result = {item_code: {"history": [], "next_cursor": None} for item_code in item_codes}
+	if not item_codes:
+		return result
 
 	customer_filter = ""
-	args = [item_code]
+	values = {"item_codes": tuple(item_codes), "fetch": limit + 1}
+	if customer:
+		customer_filter = "AND si.customer = %(customer)s"
+		values["customer"] = customer
+
+	rows = frappe.db.sql(
+		"""
+		SELECT item_code, rate, date, invoice, customer, idx
+		FROM (
+			SELECT
+				si_item.item_code,
+				si_item.rate,
+				si.posting_date AS date,
+				si.name AS invoice,
+				si.customer,
+				si_item.idx,
+				ROW_NUMBER() OVER (
+					PARTITION BY si_item.item_code
+					ORDER BY si.posting_date DESC, si.name DESC, si_item.idx DESC
+				) AS rn
+			FROM `tabSales Invoice Item` si_item
+			INNER JOIN `tabSales Invoice` si ON si_item.parent = si.name
+			WHERE si_item.item_code IN %(item_codes)s
+				AND si_item.docstatus = 1
+				AND si.docstatus = 1
+				{customer_filter}
+		) ranked
+		WHERE rn <= %(fetch)s
+		ORDER BY item_code, rn
+		""".format(customer_filter=customer_filter),
+		values,
+		as_dict=True,
+	)
+
+	for row in rows:
+		entry = result[row.item_code]
+		if len(entry["history"]) == limit:
+			# limit+1-chi yozuv bor — keyingi sahifa mavjud
+			entry["next_cursor"] = _make_cursor(entry["history"][-1])
+			continue
+		entry["history"].append(row)
+
+	for entry in result.values():
+		entry["history"] = [_format_history_row(row) for row in entry["history"]]
+
+	return result
+
+
+@frappe.whitelist()
+def get_price_history_page(item_code, customer=None, limit=20, cursor=None):
+	"""
+	Chuqurroq narx tarixi — keyset pagination.
+
+	Args:
+		cursor: get_price_histories / oldingi sahifadagi next_cursor
+
+	Returns:
+		dict: {"history": [...], "next_cursor": str | None}
+	"""
+	limit = _clamp_limit(limit)
+	conditions = []
+	values = {"item_code": item_code, "fetch": limit + 1}
 
 	if customer:
-		customer_filter = "AND si.customer = %s"
-		args.append(customer)
+		conditions.append("AND si.customer = %(customer)s")
+		values["customer"] = customer
+
+	if cursor:
+		values["c_date"], values["c_invoice"], values["c_idx"] = _parse_cursor(cursor)
+		conditions.append("""
+			AND (
+				si.posting_date < %(c_date)s
+				OR (si.posting_date = %(c_date)s AND si.name < %(c_invoice)s)
+				OR (si.posting_date = %(c_date)s AND si.name = %(c_invoice)s AND si_item.idx < %(c_idx)s)
+			)
+		""")
+
+	rows = frappe.db.sql(
+		"""
+		SELECT si_item.item_code, si_item.rate, si.posting_date AS date,
+			si.name AS invoice, si.customer, si_item.idx
+		FROM `tabSales Invoice Item` si_item
+		INNER JOIN `tabSales Invoice` si ON si_item.parent = si.name
+		WHERE si_item.item_code = %(item_code)s
+			AND si_item.docstatus = 1
+			AND si.docstatus = 1
+			{conditions}
+		ORDER BY si.posting_date DESC, si.name DESC, si_item.idx DESC
+		LIMIT %(fetch)s
+		""".format(conditions=" ".join(conditions)),
+		values,
+		as_dict=True,
+	)
+
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		next_cursor = _make_cursor(rows[-1])
+
+	return {"history": [_format_history_row(row) for row in rows], "next_cursor": next_cursor}
+
+
+def _parse_item_codes(item_codes):
+	if isinstance(item_codes, str):
+		item_codes = frappe.parse_json(item_codes) if item_codes.startswith("[") else [item_codes]
+	# tartibni saqlagan holda takrorlarni olib tashlash
+	return list(dict.fromkeys(code for code in item_codes or [] if code))
+
+
+def _clamp_limit(limit):
+	return min(max(cint(limit) or DEFAULT_HISTORY_LIMIT, 1), MAX_HISTORY_LIMIT)
+
 
-	args.append(limit)
+def _make_cursor(row):
+	return "{0}|{1}|{2}".format(getdate(row.date).isoformat(), cint(row.idx), row.invoice)
 
-	sql = sql.format(customer_filter=customer_filter)
 
-	history = frappe.db.sql(sql, tuple(args), as_dict=True)
+def _parse_cursor(cursor):
+	try:
+		date, idx, invoice = cursor.split("|", 2)
+		return getdate(date), invoice, cint(idx)
+	except ValueError:
+		frappe.throw(_("Invalid price history cursor: {0}").format(cursor))
 
-	for record in history:
-		record.rate = flt(record.rate, 2)
-		record.date = formatdate(record.date)
 
-	return history
+def _format_history_row(row):
+	return frappe._dict({
+		"rate": flt(row.rate, 2),
+		"date": formatdate(row.date),
+		"invoice": row.invoice,
+		"customer": row.customer,
+	})
@@ -1,20 +1,22 @@
 import frappe
 from frappe import _
 
+from premierprint.utils.timeline import add_comment
+
 
 def on_submit(doc, method):
     """Purchase Receipt submit bo'lganda Purchase Invoice avtomatik yaratish va submit qilish.
     
     Faqat internal supplier (ichki taminotchi) uchun ishlaydi.
     """
-    # Faqat internal supplier uchun
-    if not doc.is_internal_supplier:
+    # Faqat internal supplier uchun, returnlarsiz
+    if not doc.is_internal_supplier or doc.is_return:
         return
     
     # Agar allaqachon Purchase Invoice mavjud bo'lsa, yaratmaymiz
     existing_pi = frappe.db.exists("Purchase Invoice", {
         "docstatus": ["<", 2],
-        "bill_no": doc.name
+        "custom_purchase_receipt_ref": doc.name
     })
     
     if existing_pi:
@@ -35,6 +37,7 @@ def on_submit(doc, method):
     pi.is_internal_supplier = doc.is_internal_supplier
     pi.represents_company = doc.represents_company
     pi.bill_no = doc.name  # Reference to Purchase Receipt
+    pi.custom_purchase_receipt_ref = doc.name
     pi.update_stock = 0  # Stock already updated by Purchase Receipt
     
     # Items qo'shish
@@ -78,6 +81,6 @@ def on_submit(doc, method):
     )
     
     # Comment qo'shish
-    doc.add_comment("Info", _("Purchase Invoice {0} created and submitted").format(
+    add_comment(doc, "Info", _("Purchase Invoice {0} created and submitted").format(
         f'<a href="/app/purchase-invoice/{pi.name}">{pi.name}</a>'
     ))
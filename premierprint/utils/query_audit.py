@@ -0,0 +1,220 @@
+"""
+Query Plan Audit
+================
+INDEX_PACK: composite indexes on the custom / reference fields premierprint
+filters on, column order matched to the query shapes in AUDITED_QUERIES
+(equality columns first, most selective first). Created by the patch
+premierprint.patches.add_custom_field_indexes.
+
+AUDITED_QUERIES: representative copies of the app's hot queries, each
+pointing at its source. verify_query_plans() runs EXPLAIN on every one and
+flags full table scans (type ALL) and full index scans (type index):
+
+	bench --site <site> verify-query-plans
+
+Keep both lists in sync when adding a query that filters on a new column.
+Known, accepted scan: Asosiypanel._find_linked_docs_by_reference searches
+`remarks LIKE '%name%'` as a last-resort fallback (not audited).
+"""
+
+import frappe
+from frappe.utils import cint
+
+# (doctype, columns, index_name)
+INDEX_PACK = (
+	# wip_ledger.get_wip_balance / get_production_data: WIP materials
+	("Stock Entry", ["custom_sales_order", "purpose", "docstatus"], "custom_sales_order_purpose_docstatus_index"),
+	("Stock Entry", ["custom_sales_order_item", "docstatus"], "custom_sales_order_item_docstatus_index"),
+	# asosiy_panel.get_all_costs_for_production / get_production_data: service costs
+	(
+		"Purchase Invoice Item",
+		["custom_sales_order_item", "custom_sales_order", "parent"],
+		"custom_sales_order_item_sales_order_parent_index",
+	),
+	# lcv_trigger / transport_lcv / lcv_backlog: Transport LCV of a Purchase Invoice
+	("Landed Cost Voucher", ["custom_purchase_invoice", "docstatus"], "custom_purchase_invoice_docstatus_index"),
+	# Asosiypanel._get_service_costs_for_production
+	(
+		"Asosiy panel",
+		["sales_order", "sales_order_item", "operation_type", "docstatus"],
+		"sales_order_item_operation_type_docstatus_index",
+	),
+	# Kassa.cancel_linked_entries
+	("Payment Entry", ["reference_no", "docstatus"], "reference_no_docstatus_index"),
+	("Journal Entry", ["cheque_no", "docstatus"], "cheque_no_docstatus_index"),
+)
+
+SAMPLE = "__premierprint_explain__"
+
+# (label, source, sql, params)
+AUDITED_QUERIES = (
+	(
+		"Production WIP balance",
+		"wip_ledger.get_wip_balance",
+		"""
+		SELECT sed.item_code, sed.uom, SUM(sed.qty)
+		FROM `tabStock Entry Detail` sed
+		INNER JOIN `tabStock Entry` se ON sed.parent = se.name
+		WHERE se.docstatus = 1
+			AND se.custom_sales_order = %(sales_order)s
+			AND (se.custom_sales_order_item = %(sales_order_item)s OR IFNULL(se.custom_sales_order_item, '') = '')
+			AND se.purpose IN ('Material Transfer', 'Repack')
+			AND (sed.t_warehouse = %(warehouse)s OR sed.s_warehouse = %(warehouse)s)
+		GROUP BY sed.item_code, sed.uom
+		""",
+		{"sales_order": SAMPLE, "sales_order_item": SAMPLE, "warehouse": SAMPLE},
+	),
+	(
+		"Production service costs",
+		"asosiy_panel.get_all_costs_for_production",
+		"""
+		SELECT pii.item_code, pii.amount, pi.conversion_rate
+		FROM `tabPurchase Invoice Item` pii
+		INNER JOIN `tabPurchase Invoice` pi ON pii.parent = pi.name
+		WHERE pi.docstatus = 1
+			AND pii.custom_sales_order = %(sales_order)s
+			AND pii.custom_sales_order_item = %(sales_order_item)s
+		""",
+		{"sales_order": SAMPLE, "sales_order_item": SAMPLE},
+	),
+	(
+		"Service cost panels",
+		"Asosiypanel._get_service_costs_for_production",
+		"""
+		SELECT name, total_amount
+		FROM `tabAsosiy panel`
+		WHERE docstatus = 1
+			AND operation_type = 'Услуги по заказу'
+			AND sales_order = %(sales_order)s
+			AND sales_order_item = %(sales_order_item)s
+		""",
+		{"sales_order": SAMPLE, "sales_order_item": SAMPLE},
+	),
+	(
+		"Transport LCV of a Purchase Invoice",
+		"lcv_trigger.on_submit / transport_lcv.create_transport_lcv",
+		"""
+		SELECT name FROM `tabLanded Cost Voucher`
+		WHERE custom_purchase_invoice = %(purchase_invoice)s AND docstatus = 1
+		""",
+		{"purchase_invoice": SAMPLE},
+	),
+	(
+		"Kassa Payment Entries",
+		"Kassa.cancel_linked_entries",
+		"SELECT name FROM `tabPayment Entry` WHERE reference_no = %(kassa)s AND docstatus = 1",
+		{"kassa": SAMPLE},
+	),
+	(
+		"Kassa Journal Entries",
+		"Kassa.cancel_linked_entries",
+		"SELECT name FROM `tabJournal Entry` WHERE cheque_no = %(kassa)s AND docstatus = 1",
+		{"kassa": SAMPLE},
+	),
+	(
+		"Inter-company Sales Invoice of a Delivery Note",
+		"invoicing.on_delivery_note_submit",
+		"""
+		SELECT name FROM `tabSales Invoice`
+		WHERE custom_delivery_note_ref = %(delivery_note)s AND docstatus < 2 AND IFNULL(return_against, '') = ''
+		""",
+		{"delivery_note": SAMPLE},
+	),
+	(
+		"Sales Order link search",
+		"stock_entry.get_sales_order_query",
+		"""
+		SELECT so.name FROM `tabSales Order` so
+		WHERE MATCH(so.name, so.customer_name, so.title) AGAINST (%(terms)s IN BOOLEAN MODE)
+			AND so.docstatus = 1
+		""",
+		{"terms": "+premier*"},
+	),
+	(
+		"Open PO selection",
+		"asosiy_panel.get_purchase_orders_for_selection",
+		"""
+		SELECT line.purchase_order, COUNT(*)
+		FROM `tabOpen Purchase Order Line` line
+		INNER JOIN `tabPurchase Order` po ON po.name = line.purchase_order
+		WHERE line.supplier = %(supplier)s AND line.company = %(company)s
+		GROUP BY line.purchase_order
+		ORDER BY line.transaction_date DESC
+		LIMIT 20
+		""",
+		{"supplier": SAMPLE, "company": SAMPLE},
+	),
+	(
+		"Price history",
+		"pricing.get_price_histories",
+		"""
+		SELECT si_item.item_code, si_item.rate
+		FROM `tabSales Invoice Item` si_item
+		INNER JOIN `tabSales Invoice` si ON si_item.parent = si.name
+		WHERE si_item.item_code IN %(item_codes)s
+			AND si_item.docstatus = 1
+			AND si.docstatus = 1
+			AND si.customer = %(customer)s
+		""",
+		{"item_codes": (SAMPLE,), "customer": SAMPLE},
+	),
+	(
+		"Material planning bins",
+		"material_planning._net_against_bins",
+		"""
+		SELECT item_code, warehouse, projected_qty FROM `tabBin`
+		WHERE item_code IN %(item_codes)s AND warehouse IN %(warehouses)s
+		""",
+		{"item_codes": (SAMPLE,), "warehouses": (SAMPLE,)},
+	),
+)
+
+SCAN_TYPES = {"ALL": "full table scan", "index": "full index scan"}
+
+
+def ensure_indexes():
+	"""Create every INDEX_PACK index whose columns exist on this site."""
+	created = []
+	for doctype, columns, index_name in INDEX_PACK:
+		if not all(frappe.db.has_column(doctype, column) for column in columns):
+			continue  # custom field not installed here
+		if frappe.db.has_index(f"tab{doctype}", index_name):
+			continue
+		frappe.db.add_index(doctype, columns, index_name=index_name)
+		created.append(f"{doctype}.{index_name}")
+	return created
+
+
+def verify_query_plans(min_rows=1000):
+	"""
+	EXPLAIN every AUDITED_QUERIES entry.
+
+	Args:
+		min_rows: Ignore scans the optimizer estimates below this row count
+		          (tiny tables are scanned even when an index exists)
+
+	Returns:
+		list[dict]: label, source, table, type, key, rows, issue (None when fine)
+	"""
+	report = []
+	for label, source, sql, params in AUDITED_QUERIES:
+		try:
+			plan = frappe.db.sql(f"EXPLAIN {sql}", params, as_dict=True)
+		except Exception as e:
+			report.append({"label": label, "source": source, "table": None, "type": None,
+				"key": None, "rows": None, "issue": f"EXPLAIN failed: {e}"})
+			continue
+
+		for step in plan:
+			scan = SCAN_TYPES.get(step.get("type"))
+			rows = cint(step.get("rows"))
+			report.append({
+				"label": label,
+				"source": source,
+				"table": step.get("table"),
+				"type": step.get("type"),
+				"key": step.get("key"),
+				"rows": rows,
+				"issue": scan if scan and rows >= cint(min_rows) else None,
+			})
+	return report
@@ -0,0 +1,120 @@
+"""
+Repost Impact Estimates
+=======================
+How much Repost Item Valuation work a backdated stock change causes: every
+Stock Ledger Entry of the same item/warehouse posted after the change is
+revalued. One grouped query per estimate.
+
+	estimate_voucher_impact(["MAT-STE-0001"])   # cancelling existing vouchers
+	estimate_posting_impact(                    # submitting a backdated document
+		[("PAPER-A4", "Stores - PP")], "2026-01-15"
+	)
+
+Result (see _summarize):
+	{"rows": 1520, "items": 12, "item_warehouses": 14, "estimated_seconds": 38.0,
+	 "details": [{"item_code", "warehouse", "sle_count"}, ...]}   # largest first
+"""
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, today
+
+SETTINGS_DOCTYPE = "Premier Print Settings"
+
+# Rough repost cost per later SLE (valuation + GL rebuild); overridable in settings
+ESTIMATED_MS_PER_SLE = 25
+DETAIL_LIMIT = 20
+
+
+def get_repost_settings():
+	"""Thresholds from Premier Print Settings (0 disables a threshold)."""
+	settings = frappe.db.get_value(
+		SETTINGS_DOCTYPE,
+		None,
+		["repost_confirm_threshold", "repost_background_threshold", "repost_ms_per_sle"],
+		as_dict=True,
+	) or frappe._dict()
+	return frappe._dict(
+		confirm_threshold=cint(settings.repost_confirm_threshold),
+		background_threshold=cint(settings.repost_background_threshold),
+		ms_per_sle=flt(settings.repost_ms_per_sle) or ESTIMATED_MS_PER_SLE,
+	)
+
+
+def estimate_posting_impact(item_warehouses, posting_date):
+	"""
+	Later SLEs revalued if stock moved on `posting_date` for the given pairs.
+
+	Args:
+		item_warehouses: Iterable of (item_code, warehouse)
+		posting_date   : Posting date of the document about to be submitted
+
+	Returns:
+		dict: _summarize() result plus confirm / background flags; None when
+		      the date is not in the past or nothing moves stock
+	"""
+	pairs = sorted({(item, warehouse) for item, warehouse in item_warehouses if item and warehouse})
+	if not pairs or not posting_date or getdate(posting_date) >= getdate(today()):
+		return None
+
+	settings = get_repost_settings()
+	rows = frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, COUNT(*) AS sle_count
+		FROM `tabStock Ledger Entry`
+		WHERE (item_code, warehouse) IN %(pairs)s
+			AND posting_datetime >= %(after)s
+			AND is_cancelled = 0
+		GROUP BY item_code, warehouse
+		""",
+		{"pairs": tuple(pairs), "after": add_days(getdate(posting_date), 1)},
+		as_dict=True,
+	)
+
+	impact = _summarize(rows, settings.ms_per_sle)
+	impact["requires_confirmation"] = bool(
+		settings.confirm_threshold and impact["rows"] >= settings.confirm_threshold
+	)
+	impact["run_in_background"] = bool(
+		settings.background_threshold and impact["rows"] >= settings.background_threshold
+	)
+	return impact
+
+
+def estimate_voucher_impact(voucher_nos):
+	"""Later SLEs revalued if the given submitted stock vouchers were cancelled."""
+	voucher_nos = [name for name in voucher_nos or [] if name]
+	if not voucher_nos:
+		return _summarize([])
+
+	ms_per_sle = get_repost_settings().ms_per_sle
+	rows = frappe.db.sql(
+		"""
+		SELECT later.item_code, later.warehouse, COUNT(*) AS sle_count
+		FROM `tabStock Ledger Entry` later
+		INNER JOIN (
+			SELECT item_code, warehouse, MIN(posting_datetime) AS posting_datetime
+			FROM `tabStock Ledger Entry`
+			WHERE voucher_no IN %(voucher_nos)s AND is_cancelled = 0
+			GROUP BY item_code, warehouse
+		) src ON src.item_code = later.item_code
+			AND src.warehouse = later.warehouse
+			AND later.posting_datetime > src.posting_datetime
+		WHERE later.is_cancelled = 0
+		GROUP BY later.item_code, later.warehouse
+		""",
+		{"voucher_nos": tuple(voucher_nos)},
+		as_dict=True,
+	)
+	return _summarize(rows, ms_per_sle)
+
+
+def _summarize(rows, ms_per_sle=ESTIMATED_MS_PER_SLE):
+	rows = sorted(rows, key=lambda row: row.sle_count, reverse=True)
+	total = sum(row.sle_count for row in rows)
+	return {
+		"rows": total,
+		"items": len({row.item_code for row in rows}),
+		"item_warehouses": len(rows),
+		"estimated_seconds": flt(total * flt(ms_per_sle) / 1000, 1),
+		"details": rows[:DETAIL_LIMIT],
+	}
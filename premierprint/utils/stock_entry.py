@@ -2,17 +2,32 @@
 
 This module provides:
 1. Query functions for Sales Order/Sales Order Item dropdown
-2. BOM material explosion logic
+   (FULLTEXT search + cached recent open orders)
+2. BOM material explosion logic (per-unit explosion cached per BOM + company)
 
 Used for: "Услуга по заказу" and "Расход по заказу" stock entry types.
 """
 
+import re
 from typing import Dict, List
 
 import frappe
 from frappe import _
 from frappe.utils import flt
 
+RECENT_SALES_ORDERS_CACHE_KEY = "premierprint:recent_sales_orders"
+RECENT_SALES_ORDERS_LIMIT = 100
+RECENT_SALES_ORDERS_TTL = 300  # status changes (Close, delivered) do not fire doc_events
+
+# Must match innodb_ft_min_token_size - shorter words are not in the index
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+BOM_EXPLOSION_CACHE_KEY = "premierprint:bom_explosion"
+BOM_EXPLOSION_TTL = 3600  # BOM Update Tool replaces sub-BOMs without firing doc_events
+
+# Item fields that end up in the cached explosion
+BOM_EXPLOSION_ITEM_FIELDS = ("stock_uom",)
+
 
 @frappe.whitelist()
 def get_sales_order_query(doctype: str, txt: str, searchfield: str, start: int, page_len: int, filters: Dict) -> List[tuple]:
@@ -23,8 +38,66 @@ def get_sales_order_query(doctype: str, txt: str, searchfield: str, start: int,
     Returns:
         List of tuples: [(name, customer_name, grand_total, transaction_date), ...]
     """
-    search_txt = f"%{txt}%"
+    start, page_len = int(start), int(page_len)
+
+    if not txt:
+        recent = get_recent_sales_orders()
+        if start + page_len <= len(recent):
+            return recent[start:start + page_len]
+        return _get_open_sales_orders(start=start, page_len=page_len)
 
+    terms = _fulltext_terms(txt)
+    if not terms:
+        # Only short words (e.g. "SO") - not in the FULLTEXT index
+        return _get_open_sales_orders(
+            "AND (so.name LIKE %(txt)s OR so.customer_name LIKE %(txt)s OR so.title LIKE %(txt)s)",
+            {"txt": f"%{txt}%"},
+            start,
+            page_len,
+        )
+
+    # FULLTEXT (so_search_fulltext) for words, PK prefix scan for typed IDs
+    return frappe.db.sql("""
+        SELECT name, customer_name, grand_total, transaction_date
+        FROM (
+            SELECT so.name, so.customer_name, so.grand_total, so.transaction_date, so.creation
+            FROM `tabSales Order` so
+            WHERE MATCH(so.name, so.customer_name, so.title) AGAINST (%(terms)s IN BOOLEAN MODE)
+                AND so.docstatus = 1
+                AND so.status NOT IN ('Closed', 'Cancelled')
+            UNION
+            SELECT so.name, so.customer_name, so.grand_total, so.transaction_date, so.creation
+            FROM `tabSales Order` so
+            WHERE so.name LIKE %(prefix)s
+                AND so.docstatus = 1
+                AND so.status NOT IN ('Closed', 'Cancelled')
+        ) matches
+        ORDER BY transaction_date DESC, creation DESC
+        LIMIT %(start)s, %(page_len)s
+    """, {
+        "terms": terms,
+        "prefix": f"{txt}%",
+        "start": start,
+        "page_len": page_len
+    })
+
+
+def get_recent_sales_orders() -> List[tuple]:
+    """Latest open Sales Orders for an empty link search (cached, short TTL)."""
+    cache = frappe.cache()
+    recent = cache.get_value(RECENT_SALES_ORDERS_CACHE_KEY)
+    if recent is None:
+        recent = [tuple(row) for row in _get_open_sales_orders(page_len=RECENT_SALES_ORDERS_LIMIT)]
+        cache.set_value(RECENT_SALES_ORDERS_CACHE_KEY, recent, expires_in_sec=RECENT_SALES_ORDERS_TTL)
+    return recent
+
+
+def clear_recent_sales_orders(doc=None, method=None, *args):
+    """doc_events hook: Sales Order submit / cancel / update after submit."""
+    frappe.cache().delete_value(RECENT_SALES_ORDERS_CACHE_KEY)
+
+
+def _get_open_sales_orders(condition: str = "", values: Dict = None, start: int = 0, page_len: int = 20) -> List[tuple]:
     return frappe.db.sql("""
         SELECT
             so.name,
@@ -36,17 +109,23 @@ def get_sales_order_query(doctype: str, txt: str, searchfield: str, start: int,
         WHERE
             so.docstatus = 1
             AND so.status NOT IN ('Closed', 'Cancelled')
-            AND (so.name LIKE %(txt)s OR so.customer_name LIKE %(txt)s OR so.title LIKE %(txt)s)
+            {condition}
         ORDER BY
             so.transaction_date DESC, so.creation DESC
         LIMIT %(start)s, %(page_len)s
-    """, {
-        "txt": search_txt,
+    """.format(condition=condition), {
+        **(values or {}),
         "start": int(start),
         "page_len": int(page_len)
     })
 
 
+def _fulltext_terms(txt: str) -> str:
+    """'SO-2026-0012 Mega' -> '+2026* +0012* +Mega*' (every word required, prefix match)."""
+    words = [word for word in re.findall(r"\w+", txt or "") if len(word) >= FULLTEXT_MIN_TOKEN_SIZE]
+    return " ".join(f"+{word}*" for word in words)
+
+
 @frappe.whitelist()
 def get_sales_order_items_query(doctype: str, txt: str, searchfield: str, start: int, page_len: int, filters: Dict) -> List[tuple]:
     """Custom query for Sales Order Item dropdown.
@@ -122,37 +201,110 @@ def get_bom_materials(sales_order_item: str = None, sales_order_item_id: str = N
     if not bom:
         frappe.throw(_("No BOM configured for Item {0}").format(soi.item_code))
 
-    # Explode BOM
-    from erpnext.manufacturing.doctype.bom.bom import get_bom_items_as_dict
+    company = frappe.db.get_value("Sales Order", soi.parent, "company")
+    bom_items = scale_bom_explosion(get_exploded_bom(bom, company), soi.qty)
 
-    bom_items = get_bom_items_as_dict(
-        bom=bom,
-        company=frappe.db.get_value("Sales Order", soi.parent, "company"),
-        qty=soi.qty,
-        fetch_exploded=1,
-        fetch_qty_in_stock_uom=False
-    )
+    # Item details - bitta so'rov bilan
+    item_details = {
+        row.name: row
+        for row in frappe.get_all(
+            "Item",
+            filters={"name": ["in", list(bom_items)]},
+            fields=["name", "item_name", "stock_uom", "description", "has_batch_no", "has_serial_no"],
+        )
+    } if bom_items else {}
 
     materials = []
     for item_code, item_data in bom_items.items():
-        item_details = frappe.db.get_value(
-            "Item",
-            item_code,
-            ["item_name", "stock_uom", "description", "has_batch_no", "has_serial_no"],
-            as_dict=1
-        )
+        details = item_details.get(item_code) or frappe._dict()
 
         materials.append({
             "item_code": item_code,
-            "item_name": item_details.item_name,
-            "qty": flt(item_data.qty),
-            "uom": item_data.stock_uom or item_details.stock_uom,
-            "stock_uom": item_details.stock_uom,
-            "conversion_factor": item_data.conversion_factor or 1.0,
-            "description": item_details.description or "",
-            "has_batch_no": item_details.has_batch_no or 0,
-            "has_serial_no": item_details.has_serial_no or 0,
+            "item_name": details.item_name or item_code,
+            "qty": flt(item_data["qty"]),
+            "uom": item_data["stock_uom"] or details.stock_uom,
+            "stock_uom": details.stock_uom,
+            "conversion_factor": item_data["conversion_factor"] or 1.0,
+            "description": details.description or "",
+            "has_batch_no": details.has_batch_no or 0,
+            "has_serial_no": details.has_serial_no or 0,
             "bom_no": bom,
         })
 
     return materials
+
+
+# ============================================================
+# BOM EXPLOSION CACHE
+# ============================================================
+
+def get_exploded_bom(bom: str, company: str) -> Dict[str, Dict]:
+    """Return the fully exploded raw materials needed for ONE unit of a BOM.
+
+    get_bom_items_as_dict(fetch_exploded=1) is linear in qty, so the per-unit
+    result is cached in a Redis hash (field = BOM, value = {company: items})
+    and scaled with scale_bom_explosion(). Cleared by clear_bom_explosion_cache;
+    the hash expires BOM_EXPLOSION_TTL after its first entry, so parent BOMs
+    whose sub-BOMs were replaced by BOM Update Tool are re-exploded.
+
+    Returns:
+        {item_code: {"qty", "stock_uom", "conversion_factor",
+                     "source_warehouse", "default_warehouse"}}
+    """
+    cache = frappe.cache()
+    per_company = cache.hget(BOM_EXPLOSION_CACHE_KEY, bom) or {}
+
+    if company not in per_company:
+        from erpnext.manufacturing.doctype.bom.bom import get_bom_items_as_dict
+
+        bom_items = get_bom_items_as_dict(
+            bom=bom,
+            company=company,
+            qty=1,
+            fetch_exploded=1,
+            fetch_qty_in_stock_uom=False
+        )
+
+        per_company[company] = {
+            item_code: {
+                "qty": flt(item_data.qty),
+                "stock_uom": item_data.stock_uom,
+                "conversion_factor": flt(item_data.conversion_factor) or 1.0,
+                "source_warehouse": item_data.get("source_warehouse"),
+                "default_warehouse": item_data.get("default_warehouse"),
+            }
+            for item_code, item_data in bom_items.items()
+        }
+        cache.hset(BOM_EXPLOSION_CACHE_KEY, bom, per_company)
+        key = cache.make_key(BOM_EXPLOSION_CACHE_KEY)
+        if cache.ttl(key) < 0:
+            cache.expire(key, BOM_EXPLOSION_TTL)
+
+    return per_company[company]
+
+
+def scale_bom_explosion(per_unit: Dict[str, Dict], qty: float) -> Dict[str, Dict]:
+    """Multiply a per-unit explosion by qty (returns copies, cache stays intact)."""
+    return {
+        item_code: dict(item_data, qty=flt(item_data["qty"]) * flt(qty))
+        for item_code, item_data in per_unit.items()
+    }
+
+
+def clear_bom_explosion_cache(doc=None, method=None, *args):
+    """doc_events hook: BOM submit/cancel drops that BOM, Item changes drop everything."""
+    cache = frappe.cache()
+
+    if doc is not None and doc.doctype == "BOM":
+        cache.hdel(BOM_EXPLOSION_CACHE_KEY, doc.name)
+        return
+
+    if (
+        doc is not None
+        and method == "on_update"
+        and not any(doc.has_value_changed(field) for field in BOM_EXPLOSION_ITEM_FIELDS)
+    ):
+        return
+
+    # Item rename / delete / UOM change - any BOM may contain it
+    cache.delete_value(BOM_EXPLOSION_CACHE_KEY)
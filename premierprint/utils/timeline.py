@@ -0,0 +1,85 @@
+"""
+Deferred Timeline Comments
+==========================
+Drop-in for `doc.add_comment("Info", text)` in document generators:
+
+	from premierprint.utils.timeline import add_comment
+	add_comment(self, "Info", _("Stock Entry {0} created").format(link))
+
+Comments are collected per transaction in frappe.local and written after the
+transaction commits, as one bulk insert in a short background job. A submit
+therefore does no Comment I/O, and a rolled back submit leaves no comments
+behind. Creation time and author are captured when the comment is added.
+
+Callers that roll back to a savepoint must use savepoint() / rollback_to()
+from here instead of frappe.db directly: Frappe has no hook for a partial
+rollback, so only these drop the comments buffered after the savepoint.
+"""
+
+import frappe
+from frappe.utils import get_fullname, now
+
+COMMENT_FIELDS = (
+	"name", "creation", "modified", "owner", "modified_by", "docstatus",
+	"comment_type", "reference_doctype", "reference_name", "content", "comment_email", "comment_by",
+)
+
+
+def add_comment(doc, comment_type="Info", text=None):
+	"""Buffer a timeline comment on `doc` until the current transaction commits."""
+	buffer = getattr(frappe.local, "timeline_buffer", None)
+	if buffer is None:
+		buffer = frappe.local.timeline_buffer = []
+		frappe.db.after_commit.add(flush)
+		frappe.db.after_rollback.add(discard)
+
+	user = frappe.session.user
+	timestamp = now()
+	buffer.append((
+		frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+		comment_type, doc.doctype, doc.name, text, user, get_fullname(user),
+	))
+
+
+def flush():
+	"""after_commit: hand the buffered comments to one background bulk insert."""
+	buffer = getattr(frappe.local, "timeline_buffer", None)
+	frappe.local.timeline_buffer = None
+	frappe.local.timeline_savepoints = None
+	if not buffer:
+		return
+
+	frappe.enqueue(
+		"premierprint.utils.timeline.write_comments",
+		queue="short",
+		comments=buffer,
+		now=frappe.flags.in_test,
+	)
+
+
+def discard():
+	"""after_rollback: the documents were never saved, neither are their comments."""
+	frappe.local.timeline_buffer = None
+	frappe.local.timeline_savepoints = None
+
+
+def savepoint(name):
+	"""frappe.db.savepoint() that remembers how many comments were buffered."""
+	frappe.db.savepoint(name)
+	marks = getattr(frappe.local, "timeline_savepoints", None)
+	if marks is None:
+		marks = frappe.local.timeline_savepoints = {}
+	marks[name] = len(getattr(frappe.local, "timeline_buffer", None) or [])
+
+
+def rollback_to(name):
+	"""Roll back to a savepoint() and drop the comments buffered since."""
+	frappe.db.rollback(save_point=name)
+	mark = (getattr(frappe.local, "timeline_savepoints", None) or {}).get(name)
+	buffer = getattr(frappe.local, "timeline_buffer", None)
+	if buffer is not None and mark is not None:
+		del buffer[mark:]
+
+
+def write_comments(comments):
+	frappe.db.bulk_insert("Comment", COMMENT_FIELDS, [tuple(row) for row in comments])